@@ -1,42 +1,119 @@
 from django.contrib import admin
-from .models import Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo
+from .models import (
+	Empresa, Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo, OrdenTrabajoArchivada, RegistroAuditoria, Tarea
+)
+from .presupuesto import PRESUPUESTO_ADMIN
+
+
+class RelacionadosMixin:
+	"""Carga junto al objeto las relaciones que usa su __str__ (listado, autocompletado y formularios)."""
+	relacionados = ()
+
+	def get_queryset(self, request):
+		return super().get_queryset(request).select_related(*self.relacionados)
+
+
+@admin.register(Empresa)
+class EmpresaAdmin(admin.ModelAdmin):
+	list_display = ('nombre', 'slug', 'activo', 'fecha_creacion')
+	list_filter = ('activo',)
+	search_fields = ('nombre', 'slug')
+	prepopulated_fields = {'slug': ('nombre',)}
+	filter_horizontal = ('usuarios',)
+	ordering = ('nombre',)
+	presupuesto = PRESUPUESTO_ADMIN
+
 
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
 	list_display = ('rut', 'razon_social', 'giro', 'telefono', 'activo')
-	list_filter = ('activo',)
+	list_filter = ('empresa', 'activo')
 	search_fields = ('rut', 'razon_social', 'giro')
 	ordering = ('razon_social',)
+	presupuesto = PRESUPUESTO_ADMIN
 
 
 @admin.register(Equipo)
-class EquipoAdmin(admin.ModelAdmin):
+class EquipoAdmin(RelacionadosMixin, admin.ModelAdmin):
 	list_display = ('codigo', 'nombre', 'cliente', 'tipo', 'marca', 'activo')
-	list_filter = ('tipo', 'activo', 'cliente')
+	list_filter = ('empresa', 'tipo', 'activo', 'cliente')
 	search_fields = ('codigo', 'nombre', 'numero_serie', 'marca', 'modelo')
 	ordering = ('codigo',)
+	autocomplete_fields = ('cliente',)
+	relacionados = ('cliente',)
+	presupuesto = PRESUPUESTO_ADMIN
 
 
 @admin.register(Tecnico)
-class TecnicoAdmin(admin.ModelAdmin):
+class TecnicoAdmin(RelacionadosMixin, admin.ModelAdmin):
 	list_display = ('rut', 'usuario', 'especialidad', 'telefono', 'activo')
-	list_filter = ('especialidad', 'activo')
+	list_filter = ('empresa', 'especialidad', 'activo')
 	search_fields = ('rut', 'usuario__username', 'usuario__first_name', 'usuario__last_name')
 	ordering = ('usuario__last_name',)
+	autocomplete_fields = ('usuario',)
+	relacionados = ('usuario',)
+	presupuesto = PRESUPUESTO_ADMIN
 
 
 @admin.register(PlanMantencion)
-class PlanMantencionAdmin(admin.ModelAdmin):
+class PlanMantencionAdmin(RelacionadosMixin, admin.ModelAdmin):
 	list_display = ('nombre', 'equipo', 'frecuencia', 'duracion_estimada', 'activo')
 	list_filter = ('frecuencia', 'activo')
 	search_fields = ('nombre', 'equipo__codigo', 'equipo__nombre')
 	ordering = ('equipo', 'nombre')
+	autocomplete_fields = ('equipo',)
+	relacionados = ('equipo__cliente',)
+	presupuesto = PRESUPUESTO_ADMIN
 
 
 @admin.register(OrdenTrabajo)
-class OrdenTrabajoAdmin(admin.ModelAdmin):
+class OrdenTrabajoAdmin(RelacionadosMixin, admin.ModelAdmin):
 	list_display = ('codigo', 'equipo', 'tecnico', 'estado', 'prioridad', 'fecha_solicitud')
-	list_filter = ('estado', 'prioridad', 'fecha_solicitud')
+	list_filter = ('empresa', 'estado', 'prioridad', 'fecha_solicitud')
 	search_fields = ('codigo', 'equipo__codigo', 'equipo__nombre', 'tecnico__usuario__username')
 	ordering = ('-fecha_solicitud',)
 	date_hierarchy = 'fecha_solicitud'
+	autocomplete_fields = ('equipo', 'tecnico', 'plan_mantencion')
+	relacionados = ('equipo__cliente', 'tecnico__usuario')
+	presupuesto = PRESUPUESTO_ADMIN
+
+
+@admin.register(OrdenTrabajoArchivada)
+class OrdenTrabajoArchivadaAdmin(RelacionadosMixin, admin.ModelAdmin):
+	list_display = ('codigo', 'equipo', 'tecnico', 'estado', 'prioridad', 'fecha_solicitud')
+	list_filter = ('estado', 'prioridad')
+	search_fields = ('codigo', 'equipo__codigo')
+	ordering = ('-fecha_solicitud',)
+	relacionados = ('equipo__cliente', 'tecnico__usuario')
+	presupuesto = PRESUPUESTO_ADMIN
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+	list_display = ('id', 'tipo', 'estado', 'progreso', 'intentos', 'creado_por', 'fecha_creacion')
+	list_filter = ('tipo', 'estado')
+	list_select_related = ('creado_por',)
+	ordering = ('-fecha_creacion',)
+	presupuesto = PRESUPUESTO_ADMIN
+
+
+@admin.register(RegistroAuditoria)
+class RegistroAuditoriaAdmin(admin.ModelAdmin):
+	list_display = ('fecha', 'modelo', 'objeto_id', 'accion', 'usuario')
+	list_filter = ('modelo', 'accion')
+	list_select_related = ('usuario',)
+	search_fields = ('objeto_id',)
+	ordering = ('-fecha',)
+	presupuesto = PRESUPUESTO_ADMIN
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+	def has_delete_permission(self, request, obj=None):
+		return False
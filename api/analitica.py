@@ -0,0 +1,190 @@
+"""
+Análisis de costos de órdenes de trabajo.
+
+Las columnas necesarias se leen por bloques desde la tabla activa y el archivo
+hacia arreglos de NumPy, y todas las métricas (distribución del error de
+estimación, percentiles por grupo y tendencia mensual) se calculan de forma
+vectorizada. Los resultados se guardan en caché por combinación de filtros.
+"""
+import hashlib
+import json
+from itertools import chain, islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .empresas import clave_cache
+from .models import Equipo, OrdenTrabajo, OrdenTrabajoArchivada, PlanMantencion
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+# Filtro de la API -> lookup del ORM
+FILTROS = {
+	'desde': 'fecha_solicitud__date__gte',
+	'hasta': 'fecha_solicitud__date__lte',
+	'cliente': 'equipo__cliente_id',
+	'tipo': 'equipo__tipo',
+	'tecnico': 'tecnico_id',
+	'frecuencia': 'plan_mantencion__frecuencia',
+}
+
+COLUMNAS = [
+	'costo_estimado', 'costo_real', 'equipo__tipo', 'plan_mantencion__frecuencia',
+	'tecnico_id', 'equipo__cliente_id', 'mes',
+]
+
+TIPOS = [choice[0] for choice in Equipo.TIPO_EQUIPO_CHOICES]
+FRECUENCIAS = list(dict.fromkeys(choice[0] for choice in PlanMantencion.FRECUENCIA_CHOICES))
+
+
+def _filtrar(queryset, filtros):
+	lookups = {FILTROS[nombre]: valor for nombre, valor in filtros.items() if nombre in FILTROS and valor}
+	# Solo se analizan órdenes con costo real registrado
+	return queryset.filter(costo_real__isnull=False, **lookups)
+
+
+def cargar_columnas(filtros, bloque=5000):
+	"""
+	Carga las columnas de costos en arreglos de NumPy leyendo por bloques.
+	Los arreglos se reservan una vez con el total de filas y cada bloque se
+	copia completo, sin materializar objetos del ORM.
+	"""
+	querysets = [
+		_filtrar(OrdenTrabajo.objects.all(), filtros),
+		_filtrar(OrdenTrabajoArchivada.objects.all(), filtros),
+	]
+	total = sum(qs.count() for qs in querysets)
+
+	datos = {
+		'estimado': np.empty(total, dtype=np.float64),
+		'real': np.empty(total, dtype=np.float64),
+		'tipo': np.empty(total, dtype=np.int8),
+		'frecuencia': np.empty(total, dtype=np.int8),
+		'tecnico': np.empty(total, dtype=np.int64),
+		'cliente': np.empty(total, dtype=np.int64),
+		'mes': np.empty(total, dtype=np.int32),
+	}
+	indice_tipo = {codigo: i for i, codigo in enumerate(TIPOS)}
+	indice_frecuencia = {codigo: i for i, codigo in enumerate(FRECUENCIAS)}
+
+	filas = chain.from_iterable(
+		qs.order_by().annotate(
+			# Mes correlativo calculado por la base de datos
+			mes=ExtractYear('fecha_solicitud') * 12 + ExtractMonth('fecha_solicitud') - 1
+		).values_list(*COLUMNAS).iterator(chunk_size=bloque)
+		for qs in querysets
+	)
+	i = 0
+	while i < total:
+		# Las filas insertadas después del conteo inicial se ignoran
+		lote = list(islice(filas, min(bloque, total - i)))
+		if not lote:
+			break
+		estimado, real, tipo, frecuencia, tecnico, cliente, mes = zip(*lote)
+		fin = i + len(lote)
+		datos['estimado'][i:fin] = np.array(estimado, dtype=np.float64)
+		datos['real'][i:fin] = np.array(real, dtype=np.float64)
+		datos['tipo'][i:fin] = [indice_tipo.get(codigo, -1) for codigo in tipo]
+		datos['frecuencia'][i:fin] = [indice_frecuencia.get(codigo, -1) for codigo in frecuencia]
+		datos['tecnico'][i:fin] = [-1 if t is None else t for t in tecnico]
+		datos['cliente'][i:fin] = cliente
+		datos['mes'][i:fin] = mes
+		i = fin
+
+	return {clave: arreglo[:i] for clave, arreglo in datos.items()}
+
+
+def _resumen(valores):
+	"""Estadísticos de un arreglo de errores porcentuales."""
+	if valores.size == 0:
+		return {'cantidad': 0}
+	percentiles = np.percentile(valores, PERCENTILES)
+	return {
+		'cantidad': int(valores.size),
+		'promedio': round(float(valores.mean()), 2),
+		'desviacion': round(float(valores.std()), 2),
+		'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+	}
+
+
+def _por_grupo(claves, valores, etiquetas=None):
+	"""
+	Resumen de ``valores`` agrupado por ``claves``. Ordena una sola vez por
+	(clave, valor) y recorre los grupos como cortes contiguos del arreglo.
+	"""
+	if valores.size == 0:
+		return []
+	orden = np.lexsort((valores, claves))
+	claves, valores = claves[orden], valores[orden]
+	cortes = np.flatnonzero(np.diff(claves)) + 1
+	inicios = np.concatenate(([0], cortes))
+	grupos = []
+	for clave, bloque in zip(claves[inicios], np.split(valores, cortes)):
+		clave = int(clave)
+		if etiquetas is not None:
+			clave = etiquetas[clave] if clave >= 0 else None
+		elif clave < 0:
+			clave = None
+		grupos.append({'grupo': clave, **_resumen(bloque)})
+	return grupos
+
+
+def _tendencia(datos):
+	"""Totales mensuales de costo estimado y real, y error porcentual promedio."""
+	if datos['mes'].size == 0:
+		return []
+	meses, inverso = np.unique(datos['mes'], return_inverse=True)
+	estimado = np.bincount(inverso, weights=datos['estimado'])
+	real = np.bincount(inverso, weights=datos['real'])
+	cantidad = np.bincount(inverso)
+	return [
+		{
+			'mes': f'{m // 12}-{m % 12 + 1:02d}',
+			'ordenes': int(n),
+			'costo_estimado': round(float(e), 2),
+			'costo_real': round(float(r), 2),
+			'error_pct': round(float((r - e) / e * 100), 2) if e else None,
+		}
+		for m, n, e, r in zip(meses, cantidad, estimado, real)
+	]
+
+
+def analizar_costos(filtros):
+	"""Calcula el análisis de precisión de costos para los filtros dados."""
+	datos = cargar_columnas(filtros)
+	con_estimado = datos['estimado'] > 0
+	# Error porcentual del costo real respecto del estimado
+	error = np.divide(
+		datos['real'] - datos['estimado'], datos['estimado'],
+		out=np.zeros_like(datos['estimado']), where=con_estimado,
+	) * 100
+	sub = {clave: arreglo[con_estimado] for clave, arreglo in datos.items()}
+	error = error[con_estimado]
+
+	return {
+		'ordenes': int(datos['estimado'].size),
+		'sin_estimado': int((~con_estimado).sum()),
+		'costo_estimado_total': round(float(datos['estimado'].sum()), 2),
+		'costo_real_total': round(float(datos['real'].sum()), 2),
+		'error_pct': _resumen(error),
+		'por_tipo_equipo': _por_grupo(sub['tipo'], error, TIPOS),
+		'por_frecuencia': _por_grupo(sub['frecuencia'], error, FRECUENCIAS),
+		'por_tecnico': _por_grupo(sub['tecnico'], error),
+		'por_cliente': _por_grupo(sub['cliente'], error),
+		'tendencia_mensual': _tendencia(datos),
+	}
+
+
+def analizar_costos_cacheado(filtros):
+	"""Igual que ``analizar_costos`` pero reutiliza el resultado por combinación de filtros."""
+	filtros = {nombre: str(valor) for nombre, valor in filtros.items() if nombre in FILTROS and valor}
+	firma = hashlib.sha1(json.dumps(filtros, sort_keys=True).encode()).hexdigest()
+	# Cada empresa tiene su propio espacio de claves
+	clave = clave_cache('analitica', 'costos', firma)
+	resultado = cache.get(clave)
+	if resultado is None:
+		resultado = analizar_costos(filtros)
+		cache.set(clave, resultado, getattr(settings, 'ANALITICA_CACHE_SEGUNDOS', 600))
+	return resultado
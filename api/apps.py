@@ -3,3 +3,21 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.models.signals import post_delete, post_init, post_save
+        from . import auditoria
+        from .eventos import publicar_orden, recordar_estado
+        from .models import OrdenTrabajo
+
+        post_init.connect(recordar_estado, sender=OrdenTrabajo, dispatch_uid='ordentrabajo_recordar_estado')
+        post_save.connect(publicar_orden, sender=OrdenTrabajo, dispatch_uid='ordentrabajo_publicar_evento')
+
+        for modelo in auditoria.MODELOS_AUDITADOS:
+            nombre = modelo._meta.model_name
+            post_init.connect(auditoria.recordar_valores, sender=modelo, dispatch_uid=f'{nombre}_auditoria_init')
+            post_save.connect(auditoria.registrar_guardado, sender=modelo, dispatch_uid=f'{nombre}_auditoria_guardado')
+            post_delete.connect(auditoria.registrar_eliminacion, sender=modelo, dispatch_uid=f'{nombre}_auditoria_eliminacion')
+        # Los registros pendientes se escriben después de enviar la respuesta
+        request_finished.connect(auditoria.vaciar_al_terminar, dispatch_uid='auditoria_vaciar')
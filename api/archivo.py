@@ -0,0 +1,96 @@
+"""
+Archivo de órdenes de trabajo cerradas.
+
+Las órdenes finalizadas o canceladas con más de ``ORDENES_ARCHIVO_DIAS`` días
+se mueven por lotes desde OrdenTrabajo a OrdenTrabajoArchivada, de modo que
+los listados, filtros y conteos habituales solo recorran la tabla activa.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .auditoria import registrar_masivo, sin_auditoria
+from .models import OrdenTrabajo, OrdenTrabajoArchivada
+
+ESTADOS_CERRADOS = ('FIN', 'CAN')
+
+# Campos copiados tal cual a la tabla de archivo (incluye el id original)
+CAMPOS_ARCHIVO = [field.attname for field in OrdenTrabajoArchivada._meta.concrete_fields]
+
+
+def ordenes_cerradas(dias=None):
+	"""Retorna las órdenes cerradas cuya fecha de cierre supera la antigüedad indicada."""
+	if dias is None:
+		dias = getattr(settings, 'ORDENES_ARCHIVO_DIAS', 180)
+	limite = timezone.now() - timedelta(days=dias)
+	return OrdenTrabajo.objects.filter(
+		Q(fecha_fin__lt=limite) | Q(fecha_fin__isnull=True, fecha_solicitud__lt=limite),
+		estado__in=ESTADOS_CERRADOS,
+	)
+
+
+def codigo_archivado():
+	"""Condición: la empresa ya tiene una orden archivada con el mismo código."""
+	return Exists(OrdenTrabajoArchivada.objects.filter(empresa_id=OuterRef('empresa_id'), codigo=OuterRef('codigo')))
+
+
+def ordenes_archivables(dias=None):
+	"""
+	Órdenes cerradas que se pueden archivar. Se omiten las que repiten el código
+	de una orden ya archivada: romperían la restricción única del archivo y,
+	como cada lote toma las de menor id, detendrían todo el proceso.
+	"""
+	return ordenes_cerradas(dias).filter(~codigo_archivado())
+
+
+def ordenes_en_conflicto(dias=None):
+	"""Órdenes cerradas que no se archivan porque su código ya está en el archivo."""
+	return ordenes_cerradas(dias).filter(codigo_archivado())
+
+
+def archivar_ordenes(dias=None, lote=None):
+	"""
+	Mueve las órdenes archivables a OrdenTrabajoArchivada en lotes.
+	Cada lote se copia y elimina dentro de su propia transacción, para no
+	bloquear la base de datos durante todo el proceso. Retorna el total movido.
+	"""
+	if lote is None:
+		lote = getattr(settings, 'ORDENES_ARCHIVO_LOTE', 500)
+
+	total = 0
+	while True:
+		with transaction.atomic():
+			ids = list(
+				ordenes_archivables(dias).order_by('pk').values_list('pk', flat=True)[:lote]
+			)
+			if not ids:
+				break
+			filas = list(OrdenTrabajo.objects.filter(pk__in=ids).values(*CAMPOS_ARCHIVO))
+			OrdenTrabajoArchivada.objects.bulk_create(
+				OrdenTrabajoArchivada(**fila) for fila in filas
+			)
+			# Archivar no es eliminar: en vez de un registro de eliminación con
+			# todos los campos se anota solo que la orden pasó al archivo
+			with sin_auditoria():
+				OrdenTrabajo.objects.filter(pk__in=ids).delete()
+			registrar_masivo(OrdenTrabajo, 'M', [
+				(fila['id'], fila['empresa_id'], {'archivada': [False, True]}) for fila in filas
+			])
+		total += len(ids)
+	return total
+
+
+def unir_con_archivo(activas, archivadas):
+	"""
+	Combina dos querysets ya filtrados (tabla activa y archivo) en un UNION ALL.
+	El ordenamiento se retira de cada parte y se aplica sobre el resultado
+	combinado, ya que SQLite no permite ORDER BY dentro de un UNION. También
+	se retira select_related, que cambiaría las columnas de una sola parte.
+	"""
+	orden = activas.query.order_by or OrdenTrabajo._meta.ordering
+	activas = activas.order_by().select_related(None)
+	archivadas = archivadas.order_by().select_related(None)
+	return activas.union(archivadas, all=True).order_by(*orden)
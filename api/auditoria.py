@@ -0,0 +1,223 @@
+"""
+Registro de auditoría de los cambios en los modelos del dominio.
+
+Al guardar o eliminar un Cliente, Equipo, Tecnico, PlanMantencion u
+OrdenTrabajo se anotan solo los campos que cambiaron respecto de los valores
+con que se cargó el objeto, junto con el usuario de la petición en curso.
+Los registros se acumulan en memoria y se insertan en bloque con un único
+bulk_create, ya sea al terminar cada petición (después de enviar la
+respuesta) o cuando el búfer llega a ``AUDITORIA_LOTE``. Por eso cada guardado
+solo agrega una comparación de campos y un append a una lista.
+
+Los cambios de transacciones revertidas no se registran. QuerySet.update()
+y bulk_update() no emiten señales: quien los use para cambios del dominio
+(la fusión de duplicados, el archivo de órdenes) los anota con
+``registrar_masivo``. Fuera de una petición el búfer se vacía al terminar
+cada tarea y al salir del proceso.
+"""
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cliente, Equipo, OrdenTrabajo, PlanMantencion, RegistroAuditoria, Tecnico
+
+logger = logging.getLogger(__name__)
+
+MODELOS_AUDITADOS = (Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo)
+
+# Marca los campos diferidos que no se cargaron
+SIN_CARGAR = object()
+
+_peticion = ContextVar('auditoria_peticion', default=None)
+_desactivada = ContextVar('auditoria_desactivada', default=False)
+_pendientes = []
+_lock = threading.Lock()
+_campos = {}
+
+
+def campos_auditados(modelo):
+	"""Pares (nombre, attname) de los campos editables del modelo, sin la clave primaria."""
+	if modelo not in _campos:
+		_campos[modelo] = [
+			(field.name, field.attname)
+			for field in modelo._meta.concrete_fields
+			if field.editable and not field.primary_key
+		]
+	return _campos[modelo]
+
+
+@contextmanager
+def sin_auditoria():
+	"""Desactiva el registro de auditoría dentro del bloque."""
+	token = _desactivada.set(True)
+	try:
+		yield
+	finally:
+		_desactivada.reset(token)
+
+
+def usuario_actual():
+	"""Id del usuario autenticado de la petición en curso, o None."""
+	peticion = _peticion.get()
+	usuario = getattr(peticion, 'user', None)
+	if usuario is not None and usuario.is_authenticated:
+		return usuario.pk
+	return None
+
+
+def valores(instance):
+	# Se lee de __dict__ para no forzar consultas por campos diferidos
+	datos = instance.__dict__
+	return {attname: datos.get(attname, SIN_CARGAR) for _, attname in campos_auditados(type(instance))}
+
+
+def recordar_valores(sender, instance, **kwargs):
+	"""Guarda los valores con que se cargó el objeto para calcular la diferencia al guardar."""
+	instance._valores_auditoria = valores(instance) if instance.pk else None
+
+
+def registrar_guardado(sender, instance, created, raw=False, **kwargs):
+	anteriores = getattr(instance, '_valores_auditoria', None)
+	actuales = valores(instance)
+	instance._valores_auditoria = actuales
+	if raw or _desactivada.get():
+		return
+
+	if created or anteriores is None:
+		cambios = {
+			nombre: [None, actuales[attname]]
+			for nombre, attname in campos_auditados(sender)
+			if actuales[attname] not in (None, '', SIN_CARGAR)
+		}
+	else:
+		cambios = {
+			nombre: [anteriores[attname], actuales[attname]]
+			for nombre, attname in campos_auditados(sender)
+			if SIN_CARGAR not in (anteriores[attname], actuales[attname])
+			and anteriores[attname] != actuales[attname]
+		}
+		if not cambios:
+			return
+	agregar(sender, instance, 'C' if created else 'M', cambios)
+
+
+def registrar_eliminacion(sender, instance, **kwargs):
+	if _desactivada.get():
+		return
+	actuales = valores(instance)
+	cambios = {
+		nombre: [actuales[attname], None]
+		for nombre, attname in campos_auditados(sender)
+		if actuales[attname] not in (None, '', SIN_CARGAR)
+	}
+	agregar(sender, instance, 'E', cambios)
+
+
+def agregar(modelo, instance, accion, cambios):
+	"""Encola un registro; se agrega al búfer solo si la transacción se confirma."""
+	registro = {
+		'empresa_id': instance.empresa_id,
+		'modelo': modelo._meta.model_name,
+		'objeto_id': instance.pk,
+		'accion': accion,
+		'cambios': cambios,
+		'usuario_id': usuario_actual(),
+		'fecha': timezone.now(),
+	}
+	transaction.on_commit(lambda: encolar(registro))
+
+
+def registrar_masivo(modelo, accion, filas):
+	"""
+	Encola los registros de un cambio hecho sin señales (QuerySet.update(),
+	bulk_update() o un borrado bajo ``sin_auditoria``). ``filas`` son tuplas
+	(objeto_id, empresa_id, cambios).
+	"""
+	if _desactivada.get():
+		return
+	usuario_id = usuario_actual()
+	fecha = timezone.now()
+	registros = [
+		{
+			'empresa_id': empresa_id,
+			'modelo': modelo._meta.model_name,
+			'objeto_id': objeto_id,
+			'accion': accion,
+			'cambios': cambios,
+			'usuario_id': usuario_id,
+			'fecha': fecha,
+		}
+		for objeto_id, empresa_id, cambios in filas
+	]
+	if registros:
+		transaction.on_commit(lambda: encolar(*registros))
+
+
+def encolar(*registros):
+	with _lock:
+		_pendientes.extend(registros)
+		lleno = len(_pendientes) >= getattr(settings, 'AUDITORIA_LOTE', 500)
+	if lleno:
+		vaciar()
+
+
+def vaciar():
+	"""Inserta en bloque los registros pendientes. Retorna cuántos se escribieron."""
+	global _pendientes
+	with _lock:
+		registros, _pendientes = _pendientes, []
+	if not registros:
+		return 0
+	try:
+		RegistroAuditoria.objects.bulk_create(
+			[RegistroAuditoria(**registro) for registro in registros],
+			batch_size=getattr(settings, 'AUDITORIA_LOTE', 500),
+		)
+	except Exception:
+		# La auditoría no debe romper la petición que ya respondió
+		logger.exception('No se pudieron escribir %s registros de auditoría', len(registros))
+		return 0
+	return len(registros)
+
+
+def vaciar_al_terminar(sender, **kwargs):
+	vaciar()
+
+
+# Procesos sin peticiones (comandos): se vacía al salir. Los procesos del pool
+# de tareas terminan sin pasar por atexit, por eso ejecutar_tarea vacía al final
+atexit.register(vaciar)
+
+
+class AuditoriaMiddleware:
+	"""Deja la petición en curso disponible para atribuir los cambios a su usuario."""
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		token = _peticion.set(request)
+		try:
+			return self.get_response(request)
+		finally:
+			_peticion.reset(token)
+
+	async def __acall__(self, request):
+		token = _peticion.set(request)
+		try:
+			return await self.get_response(request)
+		finally:
+			_peticion.reset(token)
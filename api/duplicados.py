@@ -0,0 +1,220 @@
+"""
+Detección y fusión de equipos duplicados.
+
+Las importaciones masivas generan equipos que solo difieren en mayúsculas,
+espacios o guiones en ``numero_serie``, ``marca`` o ``modelo``, y que la
+restricción ``unique`` no detecta. En vez de comparar todos los pares, cada
+equipo se agrupa por claves de bloqueo:
+
+- el número de serie normalizado (solo letras y dígitos, en minúsculas),
+- los dígitos del número de serie (``SN-12345`` y ``12345``).
+
+Solo se comparan los equipos de un mismo bloque, y nunca equipos de empresas
+distintas. Si un bloque supera la
+ventana, se ordena por marca y modelo y cada equipo se compara solo con los
+``ventana`` siguientes (vecindario ordenado). Así el total de comparaciones
+queda acotado por n × ventana por cada clave.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from .auditoria import registrar_masivo
+from .models import Equipo, OrdenTrabajo, OrdenTrabajoArchivada, PlanMantencion
+
+NO_ALFANUMERICO = re.compile(r'[^a-z0-9]')
+NO_DIGITO = re.compile(r'\D')
+
+# Peso de cada campo en el puntaje de similitud
+PESOS = {'serie': 0.5, 'marca': 0.25, 'modelo': 0.25}
+
+
+def normalizar(texto):
+	"""Minúsculas, sin tildes, espacios ni signos: ``'S/N-00 1'`` -> ``'sn001'``."""
+	texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+	return NO_ALFANUMERICO.sub('', texto.lower())
+
+
+def similitud(a, b):
+	"""Similitud entre 0 y 1 de dos textos ya normalizados."""
+	if a == b:
+		return 1.0
+	if not a or not b:
+		return 0.0
+	comparador = SequenceMatcher(None, a, b, autojunk=False)
+	if comparador.real_quick_ratio() < 0.5:
+		return 0.0
+	return comparador.ratio()
+
+
+def puntaje(a, b):
+	"""
+	Similitud ponderada de dos equipos normalizados. Si los dígitos del número
+	de serie no coinciden se asume que son unidades distintas (por ejemplo
+	series correlativas del mismo modelo).
+	"""
+	if a[2] != b[2]:
+		return 0.0
+	return (
+		PESOS['serie'] * similitud(a[1], b[1])
+		+ PESOS['marca'] * similitud(a[3], b[3])
+		+ PESOS['modelo'] * similitud(a[4], b[4])
+	)
+
+
+def cargar_equipos(queryset=None):
+	"""Retorna tuplas (pk, serie, dígitos de la serie, marca, modelo, empresa) normalizadas."""
+	queryset = Equipo.objects.all() if queryset is None else queryset
+	filas = queryset.order_by().values_list(
+		'pk', 'numero_serie', 'marca', 'modelo', 'empresa_id'
+	).iterator(chunk_size=5000)
+	return [
+		(pk, normalizar(serie), NO_DIGITO.sub('', serie or ''), normalizar(marca), normalizar(modelo), empresa)
+		for pk, serie, marca, modelo, empresa in filas
+	]
+
+
+def pares_candidatos(bloque, ventana):
+	"""Pares a comparar dentro de un bloque: todos si es chico, o por vecindario ordenado."""
+	if len(bloque) <= ventana + 1:
+		for i, a in enumerate(bloque):
+			for b in bloque[i + 1:]:
+				yield a, b
+		return
+	bloque = sorted(bloque, key=lambda equipo: (equipo[3], equipo[4], equipo[1]))
+	for i, a in enumerate(bloque):
+		for b in bloque[i + 1:i + 1 + ventana]:
+			yield a, b
+
+
+def buscar_duplicados(queryset=None, umbral=None, ventana=None):
+	"""
+	Busca equipos duplicados. Retorna un diccionario con la cantidad de equipos
+	y de comparaciones realizadas, y los grupos encontrados: en cada grupo se
+	propone conservar el equipo más antiguo (menor id).
+	"""
+	if umbral is None:
+		umbral = getattr(settings, 'DUPLICADOS_UMBRAL', 0.85)
+	if ventana is None:
+		ventana = getattr(settings, 'DUPLICADOS_VENTANA', 20)
+	equipos = cargar_equipos(queryset)
+
+	bloques = defaultdict(list)
+	for equipo in equipos:
+		if equipo[1]:
+			bloques[equipo[5], 's', equipo[1]].append(equipo)
+		# Pocos dígitos no bastan para sospechar (por ejemplo '1')
+		if len(equipo[2]) >= 4:
+			bloques[equipo[5], 'd', equipo[2]].append(equipo)
+
+	padre = {}
+
+	def raiz(pk):
+		padre.setdefault(pk, pk)
+		while padre[pk] != pk:
+			padre[pk] = padre[padre[pk]]
+			pk = padre[pk]
+		return pk
+
+	# Un par puede repetirse en ambos bloques; se compara dos veces en vez de
+	# guardar todos los pares vistos, que con n grande no cabría en memoria
+	comparaciones = 0
+	coincidencias = []
+	for bloque in bloques.values():
+		if len(bloque) < 2:
+			continue
+		for a, b in pares_candidatos(bloque, ventana):
+			comparaciones += 1
+			valor = puntaje(a, b)
+			if valor >= umbral:
+				coincidencias.append((a[0], b[0], valor))
+				padre[raiz(a[0])] = raiz(b[0])
+
+	grupos = defaultdict(list)
+	for pk in padre:
+		grupos[raiz(pk)].append(pk)
+	minimos = {}
+	for a, _, valor in coincidencias:
+		minimos[raiz(a)] = min(valor, minimos.get(raiz(a), 1.0))
+	resultado = [
+		{'conservar': min(miembros), 'duplicados': sorted(miembros)[1:], 'puntaje': round(minimos[clave], 3)}
+		for clave, miembros in grupos.items() if len(miembros) > 1
+	]
+	resultado.sort(key=lambda grupo: grupo['conservar'])
+	return {'equipos': len(equipos), 'comparaciones': comparaciones, 'grupos': resultado}
+
+
+def mover(queryset, campo, destino):
+	"""
+	Apunta ``campo`` de las filas del queryset a ``destino`` con un UPDATE.
+	Como el UPDATE no emite señales, cada fila movida se anota en la auditoría.
+	"""
+	attname = queryset.model._meta.get_field(campo).attname
+	filas = list(queryset.values_list('pk', 'empresa_id', attname))
+	registrar_masivo(queryset.model, 'M', [
+		(pk, empresa_id, {campo: [anterior, destino]}) for pk, empresa_id, anterior in filas
+	])
+	return queryset.update(**{attname: destino})
+
+
+def fusionar_planes(conservar, ids):
+	"""
+	Funde los planes que chocarían por nombre al mover los de ``ids`` a
+	``conservar``. Se conserva el plan del equipo que se mantiene o, si no
+	tiene, el más antiguo. Retorna la cantidad de planes eliminados.
+	"""
+	planes = PlanMantencion.objects.filter(equipo_id__in=ids | {conservar}).order_by(
+		Case(When(equipo_id=conservar, then=Value(0)), default=Value(1)), 'pk'
+	).values_list('pk', 'nombre')
+	sobrevivientes, repetidos = {}, {}
+	for pk, nombre in planes:
+		if nombre in sobrevivientes:
+			repetidos.setdefault(sobrevivientes[nombre], []).append(pk)
+		else:
+			sobrevivientes[nombre] = pk
+	for plan, otros in repetidos.items():
+		mover(OrdenTrabajo.objects.filter(plan_mantencion_id__in=otros), 'plan_mantencion', plan)
+		OrdenTrabajoArchivada.objects.filter(plan_mantencion_id__in=otros).update(plan_mantencion_id=plan)
+	eliminar = [pk for otros in repetidos.values() for pk in otros]
+	if eliminar:
+		PlanMantencion.objects.filter(pk__in=eliminar).delete()
+	return len(eliminar)
+
+
+def fusionar_equipos(conservar, duplicados):
+	"""
+	Fusiona los equipos ``duplicados`` en ``conservar`` en una sola transacción:
+	mueve sus órdenes (activas y archivadas) y planes de mantención con un
+	UPDATE por tabla, anotando en la auditoría las órdenes y planes movidos, y
+	luego elimina los duplicados. Retorna los totales movidos.
+	Los planes con el mismo nombre (únicos por equipo) se funden en uno: sus
+	órdenes pasan al plan que se conserva y el plan repetido se elimina.
+	"""
+	ids = set(duplicados) - {conservar}
+	if not ids:
+		raise ValueError('Debe indicar al menos un equipo duplicado distinto del que se conserva.')
+	with transaction.atomic():
+		empresas = dict(
+			Equipo.objects.select_for_update().filter(pk__in=ids | {conservar}).values_list('pk', 'empresa_id')
+		)
+		faltantes = (ids | {conservar}) - set(empresas)
+		if faltantes:
+			raise Equipo.DoesNotExist(f'Equipos inexistentes: {sorted(faltantes)}')
+		if len(set(empresas.values())) > 1:
+			raise ValueError('No se pueden fusionar equipos de empresas distintas.')
+
+		planes_fusionados = fusionar_planes(conservar, ids)
+		resultado = {
+			'ordenes': mover(OrdenTrabajo.objects.filter(equipo_id__in=ids), 'equipo', conservar),
+			'ordenes_archivadas': OrdenTrabajoArchivada.objects.filter(equipo_id__in=ids).update(equipo_id=conservar),
+			'planes': mover(PlanMantencion.objects.filter(equipo_id__in=ids), 'equipo', conservar),
+			'planes_fusionados': planes_fusionados,
+		}
+		Equipo.objects.filter(pk__in=ids).delete()
+	resultado['eliminados'] = len(ids)
+	return resultado
@@ -0,0 +1,176 @@
+"""
+Separación de datos por empresa (multi-tenant).
+
+Cada registro del dominio pertenece a una Empresa. La empresa de una petición
+se toma, en este orden, de:
+
+1. el claim ``EMPRESA_CLAIM`` del token JWT, si el usuario aún pertenece a
+   esa empresa y está activa (si no, ninguna),
+2. la primera empresa activa a la que pertenece el usuario (si todas sus
+   empresas están inactivas, ninguna),
+3. la empresa ``EMPRESA_POR_DEFECTO``, solo para usuarios sin empresas. Así
+   una instalación con una sola empresa sigue funcionando sin configurar
+   nada. Con ``None`` los usuarios sin empresa no acceden a datos.
+
+La empresa activa vive en una ContextVar. Con ella los managers filtran sus
+consultas, los objetos nuevos reciben su empresa y las claves de caché
+quedan separadas por empresa. Sin empresa activa (comandos, shell, admin)
+las consultas abarcan todas las empresas.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Case, Exists, Q, Value, When
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework.permissions import SAFE_METHODS
+
+# Empresa de una petición que no pudo resolver ninguna: no ve ningún registro
+SIN_EMPRESA = 0
+
+_empresa = ContextVar('empresa_activa', default=None)
+
+
+def empresa_activa():
+	"""Id de la empresa activa, SIN_EMPRESA, o None si no hay ninguna."""
+	return _empresa.get()
+
+
+@contextmanager
+def usar_empresa(empresa_id):
+	"""Activa la empresa dentro del bloque (por ejemplo, al ejecutar una tarea)."""
+	token = _empresa.set(empresa_id)
+	try:
+		yield
+	finally:
+		_empresa.reset(token)
+
+
+def empresa_por_defecto_id():
+	"""Id de la empresa EMPRESA_POR_DEFECTO (se crea si no existe), o None."""
+	slug = getattr(settings, 'EMPRESA_POR_DEFECTO', 'principal')
+	if not slug:
+		return None
+	from .models import Empresa
+	empresa, _ = Empresa.objects.get_or_create(slug=slug, defaults={'nombre': slug.capitalize()})
+	return empresa.pk
+
+
+def empresa_actual_id():
+	"""Valor por defecto del campo ``empresa``: la empresa activa o la por defecto."""
+	empresa = _empresa.get()
+	if empresa is None:
+		return empresa_por_defecto_id()
+	return empresa or None
+
+
+def claim_vigente(usuario, empresa, slug):
+	"""
+	Indica si la empresa del token sigue valiendo: debe estar activa y el
+	usuario debe pertenecer a ella, o ser la por defecto y el usuario no
+	pertenecer a ninguna. Los tokens emitidos antes de quitar al usuario o de
+	desactivar la empresa dejan de servir sin esperar a que expiren.
+	"""
+	if usuario is None or not usuario.is_authenticated:
+		return False
+	from .models import Empresa
+	condicion = Q(usuarios=usuario)
+	if slug:
+		condicion |= Q(slug=slug, sin_empresas=True)
+	return Empresa.objects.filter(pk=empresa, activo=True).annotate(
+		sin_empresas=~Exists(Empresa.usuarios.through.objects.filter(user_id=usuario.pk))
+	).filter(condicion).exists()
+
+
+def resolver_empresa(request):
+	"""
+	Id de la empresa de la petición, o None si no se puede determinar. Un
+	usuario cuyas empresas están todas inactivas no recibe la por defecto.
+	"""
+	token = getattr(request, 'auth', None)
+	usuario = getattr(request, 'user', None)
+	slug = getattr(settings, 'EMPRESA_POR_DEFECTO', 'principal')
+	if token is not None and hasattr(token, 'get'):
+		empresa = token.get(getattr(settings, 'EMPRESA_CLAIM', 'empresa'))
+		if empresa is not None:
+			try:
+				empresa = int(empresa)
+			except (TypeError, ValueError):
+				raise AuthenticationFailed('El token tiene una empresa inválida.')
+			return empresa if claim_vigente(usuario, empresa, slug) else None
+	if usuario is not None and usuario.is_authenticated:
+		from .models import Empresa
+		# Una sola consulta: primero las empresas activas del usuario, luego las
+		# inactivas y al final la por defecto, que solo vale si no pertenece a ninguna
+		condicion = Q(usuarios=usuario)
+		if slug:
+			condicion |= Q(slug=slug)
+		fila = Empresa.objects.filter(condicion).annotate(
+			miembro=Case(When(usuarios=usuario, then=Value(True)), default=Value(False))
+		).order_by(
+			Case(When(usuarios=usuario, activo=True, then=Value(0)), When(usuarios=usuario, then=Value(1)), default=Value(2)),
+			'pk'
+		).values_list('pk', 'activo', 'miembro').first()
+		if fila is not None:
+			empresa, activo, miembro = fila
+			if miembro:
+				return empresa if activo else None
+			return empresa
+	return empresa_por_defecto_id()
+
+
+def clave_cache(*partes):
+	"""Clave de caché dentro del espacio de nombres de la empresa activa."""
+	empresa = _empresa.get()
+	return ':'.join(['empresa', 'todas' if empresa is None else str(empresa), *map(str, partes)])
+
+
+class EmpresaQuerySet(models.QuerySet):
+	def de_empresa(self, empresa_id):
+		if not empresa_id:
+			return self.none()
+		return self.filter(empresa_id=empresa_id)
+
+
+class EmpresaManager(models.Manager.from_queryset(EmpresaQuerySet)):
+	"""Manager que limita las consultas a la empresa activa, si la hay."""
+
+	def get_queryset(self):
+		queryset = super().get_queryset()
+		empresa = _empresa.get()
+		if empresa is None:
+			return queryset
+		return queryset.de_empresa(empresa)
+
+
+class EmpresaMixin:
+	"""
+	Mixin para ViewSets: resuelve la empresa de la petición, la deja activa
+	mientras se atiende y limita el queryset a ella. Debe ir primero en la
+	lista de clases base.
+	"""
+	campo_empresa = 'empresa'
+
+	def dispatch(self, request, *args, **kwargs):
+		# Hasta autenticar, la petición no ve datos de ninguna empresa
+		token = _empresa.set(SIN_EMPRESA)
+		try:
+			return super().dispatch(request, *args, **kwargs)
+		finally:
+			_empresa.reset(token)
+
+	def initial(self, request, *args, **kwargs):
+		self.empresa_id = resolver_empresa(request)
+		_empresa.set(self.empresa_id or SIN_EMPRESA)
+		# Un anónimo sin empresa por defecto solo lee listados vacíos
+		if not self.empresa_id and (request.user.is_authenticated or request.method not in SAFE_METHODS):
+			raise PermissionDenied('El usuario no pertenece a ninguna empresa activa.')
+		super().initial(request, *args, **kwargs)
+
+	def get_queryset(self):
+		# El queryset de la clase se creó sin empresa activa: se filtra explícitamente
+		queryset = super().get_queryset()
+		if not getattr(self, 'empresa_id', None):
+			return queryset.none()
+		return queryset.filter(**{self.campo_empresa: self.empresa_id})
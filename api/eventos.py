@@ -0,0 +1,197 @@
+"""
+Eventos de órdenes de trabajo para clientes suscritos (Server-Sent Events).
+
+Cada creación, actualización o cambio de estado de una OrdenTrabajo se publica
+en un broker en memoria del proceso. Las suscripciones filtran por técnico,
+equipo, cliente o estado, tienen una cola acotada (si el cliente no consume a
+tiempo se le pide reconectar) y pueden retomar el flujo desde el último id
+recibido gracias a un historial circular.
+
+El broker se elige con ``EVENTOS_BROKER``; ``BrokerLocal`` solo reparte eventos
+dentro del proceso, por lo que con varios workers debe reemplazarse por uno
+que comparta los eventos entre procesos.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Equipo
+
+CAMPOS_FILTRO = ('tecnico', 'equipo', 'cliente', 'estado')
+
+
+class Suscripcion:
+	"""Cola de eventos de un cliente conectado, atada a su event loop."""
+
+	def __init__(self, filtros, maximo):
+		self.loop = asyncio.get_running_loop()
+		self.cola = asyncio.Queue(maxsize=maximo)
+		self.filtros = filtros
+		self.desbordada = False
+
+	def acepta(self, evento):
+		return all(str(evento.get(campo)) in valores for campo, valores in self.filtros.items())
+
+	def entregar(self, evento):
+		"""Encola un evento; se ejecuta siempre dentro del loop de la suscripción."""
+		if self.desbordada:
+			return
+		try:
+			self.cola.put_nowait(evento)
+		except asyncio.QueueFull:
+			# El cliente no alcanza a consumir: se descarta su cola y se le pide reconectar
+			self.desbordada = True
+			while not self.cola.empty():
+				self.cola.get_nowait()
+			self.cola.put_nowait(None)
+
+
+class BrokerLocal:
+	"""Pub/sub en memoria del proceso con historial para retomar desde un id."""
+
+	def __init__(self, historial=None, cola_maxima=None):
+		self._lock = threading.Lock()
+		self._ultimo_id = 0
+		self._historial = deque(maxlen=historial or getattr(settings, 'EVENTOS_HISTORIAL', 1000))
+		self._cola_maxima = cola_maxima or getattr(settings, 'EVENTOS_COLA_MAXIMA', 100)
+		self._suscripciones = set()
+
+	def publicar(self, datos):
+		"""Publica un evento y lo reparte a las suscripciones que lo aceptan."""
+		with self._lock:
+			self._ultimo_id += 1
+			evento = {'id': self._ultimo_id, **datos}
+			self._historial.append(evento)
+			suscripciones = list(self._suscripciones)
+		for suscripcion in suscripciones:
+			if suscripcion.acepta(evento):
+				try:
+					suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+				except RuntimeError:
+					# El loop del cliente ya se cerró
+					self.cancelar(suscripcion)
+		return evento
+
+	def suscribir(self, filtros, desde=None):
+		"""
+		Registra una suscripción (debe llamarse dentro de un event loop).
+		Retorna la suscripción y los eventos pendientes posteriores a ``desde``,
+		o None si esos eventos ya salieron del historial y hay que resincronizar.
+		Un ``desde`` mayor que el último id viene de antes de reiniciar el
+		proceso (los ids parten de nuevo en 1): también hay que resincronizar.
+		"""
+		suscripcion = Suscripcion(filtros, self._cola_maxima)
+		with self._lock:
+			self._suscripciones.add(suscripcion)
+			if desde is None:
+				return suscripcion, []
+			if desde > self._ultimo_id or (self._historial and desde < self._historial[0]['id'] - 1):
+				return suscripcion, None
+			pendientes = [e for e in self._historial if e['id'] > desde and suscripcion.acepta(e)]
+		return suscripcion, pendientes
+
+	def cancelar(self, suscripcion):
+		with self._lock:
+			self._suscripciones.discard(suscripcion)
+
+	@property
+	def ultimo_id(self):
+		return self._ultimo_id
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def obtener_broker():
+	"""Retorna la instancia única del broker configurado en EVENTOS_BROKER."""
+	global _broker
+	if _broker is None:
+		with _broker_lock:
+			if _broker is None:
+				_broker = import_string(getattr(settings, 'EVENTOS_BROKER', 'api.eventos.BrokerLocal'))()
+	return _broker
+
+
+def formatear_sse(evento, tipo=None):
+	"""Serializa un evento en el formato de Server-Sent Events."""
+	lineas = []
+	if 'id' in evento:
+		lineas.append(f"id: {evento['id']}")
+	lineas.append(f"event: {tipo or evento['tipo']}")
+	lineas.append(f"data: {json.dumps(evento, ensure_ascii=False)}")
+	return '\n'.join(lineas) + '\n\n'
+
+
+async def flujo_sse(broker, filtros, desde=None):
+	"""
+	Genera el flujo SSE de una suscripción: primero los eventos pendientes y
+	luego los nuevos, con comentarios periódicos para mantener viva la conexión.
+	Si la suscripción se desborda o el historial ya no cubre el id pedido, envía
+	un evento 'reiniciar' y cierra para que el cliente recargue y reconecte.
+	"""
+	keepalive = getattr(settings, 'EVENTOS_KEEPALIVE_SEGUNDOS', 15)
+	# La suscripción se crea aquí para quedar atada al loop que consume el flujo
+	suscripcion, pendientes = broker.suscribir(filtros, desde)
+	try:
+		yield 'retry: 3000\n\n'
+		if pendientes is None:
+			yield formatear_sse({'id': broker.ultimo_id, 'motivo': 'historial'}, 'reiniciar')
+			return
+		for evento in pendientes:
+			yield formatear_sse(evento)
+		while True:
+			try:
+				evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=keepalive)
+			except asyncio.TimeoutError:
+				yield ': ping\n\n'
+				continue
+			if evento is None:
+				yield formatear_sse({'motivo': 'desborde'}, 'reiniciar')
+				return
+			yield formatear_sse(evento)
+	finally:
+		broker.cancelar(suscripcion)
+
+
+def recordar_estado(sender, instance, **kwargs):
+	"""Guarda el estado con que se cargó la orden para detectar transiciones."""
+	# Se lee de __dict__ para no forzar una consulta si el campo fue diferido
+	instance._estado_original = instance.__dict__.get('estado') if instance.pk else None
+
+
+def cliente_de(sender, instance):
+	"""Cliente de la orden, sin consultar si su equipo ya está cargado (las vistas lo cargan)."""
+	if sender.equipo.is_cached(instance) and instance.equipo is not None:
+		return instance.equipo.cliente_id
+	return Equipo.objects.values_list('cliente_id', flat=True).get(pk=instance.equipo_id)
+
+
+def publicar_orden(sender, instance, created, **kwargs):
+	"""Publica el evento de la orden guardada una vez confirmada la transacción."""
+	anterior = getattr(instance, '_estado_original', None)
+	if created:
+		tipo = 'creada'
+	elif anterior is not None and anterior != instance.estado:
+		tipo = 'cambio_estado'
+	else:
+		tipo = 'actualizada'
+	instance._estado_original = instance.estado
+
+	datos = {
+		'tipo': tipo,
+		'orden': instance.pk,
+		'empresa': instance.empresa_id,
+		'codigo': instance.codigo,
+		'estado': instance.estado,
+		'estado_anterior': anterior if tipo == 'cambio_estado' else None,
+		'tecnico': instance.tecnico_id,
+		'equipo': instance.equipo_id,
+		'cliente': cliente_de(sender, instance),
+	}
+	transaction.on_commit(lambda: obtener_broker().publicar(datos))
@@ -0,0 +1,399 @@
+"""
+Generador de datos sintéticos para pruebas de volumen.
+
+Crea clientes, equipos de todos los tipos, técnicos (con su User), planes de
+mantención y órdenes de trabajo con distribuciones realistas: las órdenes
+antiguas están casi todas finalizadas, las recientes pendientes o en proceso,
+los costos reales se desvían del estimado y unos pocos técnicos concentran
+más trabajo. Todo se inserta con bulk_create por lotes, sin señales de
+auditoría ni eventos.
+
+Los datos quedan determinados por la especificación: la misma semilla,
+cantidades y ``fecha_base`` producen exactamente los mismos registros. Por eso
+la especificación (unos pocos cientos de bytes en JSON) sirve de fixture
+compacto para reproducir un conjunto de millones de filas.
+"""
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cliente, Empresa, Equipo, OrdenTrabajo, PlanMantencion, Tecnico
+from .rut import calcular_dv
+
+ESPECIFICACION_POR_DEFECTO = {
+	'empresa': 'demo',
+	'prefijo': 'GEN',
+	'semilla': 1,
+	'fecha_base': None,  # Hoy si no se indica
+	'dias': 730,  # Antigüedad máxima de las órdenes
+	'clientes': 100,
+	'equipos_por_cliente': 10,
+	'tecnicos': 50,
+	'planes_por_equipo': 2,
+	'ordenes': 100000,
+}
+
+# Algunas opciones de los modelos repiten la clave; se usan las claves distintas
+TIPOS = list(dict(Equipo.TIPO_EQUIPO_CHOICES))
+ESPECIALIDADES = list(dict(Tecnico.ESPECIALIDAD_CHOICES))
+FRECUENCIAS = list(dict(PlanMantencion.FRECUENCIA_CHOICES))
+PRIORIDADES = list(dict(OrdenTrabajo.PRIORIDAD_CHOICES))
+
+MEDIANOCHE = hora(0)
+
+PESOS_TIPO = [40, 20, 15, 15, 10]
+PESOS_PRIORIDAD = [25, 45, 22, 8]
+# Días hasta la fecha programada según la prioridad
+PLAZO_PRIORIDAD = {'BAJ': 30, 'MED': 14, 'ALT': 5, 'URG': 1}
+# Distribución de estados según la antigüedad de la orden (días, pesos PEN/PRO/FIN/CAN)
+ESTADOS = ['PEN', 'PRO', 'FIN', 'CAN']
+ESTADOS_POR_EDAD = [(14, [55, 30, 10, 5]), (60, [15, 25, 50, 10]), (None, [2, 3, 85, 10])]
+
+MARCAS = {
+	'MAQ': [('Atlas Copco', ['GA-11', 'GA-30', 'ZR-90']), ('Caterpillar', ['C7', 'C15']), ('Komatsu', ['PC200', 'WA470'])],
+	'EQU': [('Siemens', ['S7-1200', 'S7-1500']), ('ABB', ['ACS580', 'ACS880']), ('Schneider', ['M241', 'ATV320'])],
+	'SIS': [('Carrier', ['30XA', '19XR']), ('Trane', ['RTAC', 'CVHE']), ('Grundfos', ['CR-32', 'NB-65'])],
+	'VEH': [('Toyota', ['Hilux', '8FGU25']), ('Hyster', ['H2.5FT', 'S50FT']), ('Mercedes-Benz', ['Actros', 'Sprinter'])],
+	'OTR': [('Genérico', ['STD', 'PRO']), ('Lincoln Electric', ['Power Wave']), ('Kaeser', ['SK-25'])],
+}
+NOMBRES_EQUIPO = {
+	'MAQ': ['Compresor', 'Excavadora', 'Cargador frontal', 'Torno CNC', 'Prensa hidráulica'],
+	'EQU': ['PLC', 'Variador de frecuencia', 'Tablero eléctrico', 'UPS'],
+	'SIS': ['Chiller', 'Sistema de bombeo', 'Sistema HVAC', 'Caldera'],
+	'VEH': ['Camioneta', 'Grúa horquilla', 'Camión tolva', 'Furgón'],
+	'OTR': ['Soldadora', 'Generador', 'Montacargas'],
+}
+# Costo base de una mantención por tipo de equipo
+COSTO_TIPO = {'MAQ': 450000, 'EQU': 180000, 'SIS': 320000, 'VEH': 250000, 'OTR': 120000}
+CIUDADES = [
+	('Santiago', -33.45, -70.66, 50), ('Valparaíso', -33.05, -71.61, 10), ('Concepción', -36.82, -73.05, 10),
+	('Antofagasta', -23.65, -70.40, 12), ('Temuco', -38.74, -72.60, 6), ('Puerto Montt', -41.47, -72.94, 6),
+	('Calama', -22.46, -68.93, 6),
+]
+NOMBRES = ['Juan', 'María', 'Pedro', 'Camila', 'Diego', 'Valentina', 'José', 'Francisca', 'Luis', 'Catalina']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda']
+RUBROS = ['Minería', 'Agroindustria', 'Manufactura', 'Logística', 'Retail', 'Construcción', 'Energía', 'Salud']
+SOCIEDADES = ['S.A.', 'SpA', 'Ltda.']
+TRABAJOS = [
+	'Cambio de filtros y lubricación', 'Revisión general', 'Reparación de falla', 'Calibración',
+	'Cambio de rodamientos', 'Inspección de seguridad', 'Limpieza y ajuste', 'Reemplazo de correas',
+]
+
+# RUT de empresas y de personas en rangos distintos. Cada prefijo usa un tramo
+# de RUT_TRAMO números dentro de cada rango, elegido por un hash del prefijo
+RUT_CLIENTES = 76000000
+RUT_TECNICOS = 10000000
+RUT_TRAMO = 100000
+RUT_TRAMOS = 200
+
+
+def especificacion(**valores):
+	"""Completa la especificación con los valores por defecto y valida las cantidades."""
+	desconocidos = set(valores) - set(ESPECIFICACION_POR_DEFECTO)
+	if desconocidos:
+		raise ValueError(f'Claves desconocidas en la especificación: {sorted(desconocidos)}')
+	spec = {**ESPECIFICACION_POR_DEFECTO, **{k: v for k, v in valores.items() if v is not None}}
+	if spec['fecha_base'] is None:
+		spec['fecha_base'] = timezone.localdate().isoformat()
+	date.fromisoformat(spec['fecha_base'])
+	for clave in ('dias', 'clientes', 'equipos_por_cliente', 'tecnicos', 'planes_por_equipo', 'ordenes'):
+		if not isinstance(spec[clave], int) or spec[clave] < 0:
+			raise ValueError(f'{clave} debe ser un entero no negativo.')
+	if spec['ordenes'] and not spec['clientes'] * spec['equipos_por_cliente']:
+		raise ValueError('Para generar órdenes se necesita al menos un equipo.')
+	for clave in ('clientes', 'tecnicos'):
+		if spec[clave] > RUT_TRAMO:
+			raise ValueError(f'{clave} no puede superar {RUT_TRAMO}.')
+	if spec['planes_por_equipo'] > len(FRECUENCIAS):
+		raise ValueError(f'planes_por_equipo no puede superar {len(FRECUENCIAS)}.')
+	return spec
+
+
+def rut(numero):
+	return f'{numero}-{calcular_dv(numero)}'
+
+
+@contextmanager
+def fechas_manuales(*campos):
+	"""
+	Desactiva auto_now_add en los campos dentro del bloque para que bulk_create
+	respete las fechas generadas en vez de usar la hora actual.
+	"""
+	originales = [campo.auto_now_add for campo in campos]
+	for campo in campos:
+		campo.auto_now_add = False
+	try:
+		yield
+	finally:
+		for campo, original in zip(campos, originales):
+			campo.auto_now_add = original
+
+
+class Generador:
+	"""Genera el conjunto de datos de una especificación en su empresa."""
+
+	def __init__(self, spec, lote=5000, informar=None):
+		self.spec = spec
+		self.lote = lote
+		self.informar = informar or (lambda mensaje: None)
+		self.rng = random.Random(spec['semilla'])
+		base = date.fromisoformat(spec['fecha_base'])
+		self.zona = timezone.get_current_timezone()
+		self.ahora = datetime(base.year, base.month, base.day, 18, tzinfo=self.zona)
+		self.totales = {}
+
+	def insertar(self, modelo, filas):
+		"""bulk_create por lotes, cada lote en su transacción. Retorna la cantidad."""
+		inicio = time.perf_counter()
+		total = 0
+		pendientes = []
+		for fila in filas:
+			pendientes.append(fila)
+			if len(pendientes) == self.lote:
+				total += self._escribir(modelo, pendientes)
+				pendientes = []
+		if pendientes:
+			total += self._escribir(modelo, pendientes)
+		segundos = time.perf_counter() - inicio
+		self.totales[modelo._meta.model_name] = total
+		self.informar(f'{total:>10} {modelo._meta.verbose_name_plural} en {segundos:.1f} s ({total / max(segundos, 1e-9):,.0f} filas/s)')
+		return total
+
+	def _escribir(self, modelo, filas):
+		with transaction.atomic():
+			modelo.objects.bulk_create(filas, batch_size=self.lote)
+		return len(filas)
+
+	def ids(self, modelo, **filtros):
+		return list(modelo.objects.filter(empresa=self.empresa, **filtros).order_by('pk').values_list('pk', flat=True))
+
+	def generar(self):
+		spec = self.spec
+		self.empresa, _ = Empresa.objects.get_or_create(
+			slug=spec['empresa'], defaults={'nombre': spec['empresa'].capitalize()}
+		)
+		prefijo = spec['prefijo']
+		if Equipo.objects.filter(empresa=self.empresa, codigo__startswith=f'{prefijo}-').exists():
+			raise ValueError(
+				f'La empresa {self.empresa.slug} ya tiene datos generados con el prefijo {prefijo}; '
+				'use otra empresa u otro prefijo.'
+			)
+		# El tramo de RUT depende del prefijo (de forma estable entre ejecuciones)
+		# para que dos prefijos no choquen en la misma empresa
+		self.tramo = int.from_bytes(hashlib.sha256(prefijo.encode()).digest()[:8], 'big') % RUT_TRAMOS
+		self.rut_clientes = RUT_CLIENTES + self.tramo * RUT_TRAMO
+		self.rut_tecnicos = RUT_TECNICOS + self.tramo * RUT_TRAMO
+		# Dos prefijos pueden caer en el mismo tramo: se avisa antes de insertar
+		if Cliente.objects.filter(
+			empresa=self.empresa, rut_numero__range=(self.rut_clientes, self.rut_clientes + RUT_TRAMO - 1)
+		).exists() or Tecnico.objects.filter(
+			empresa=self.empresa, rut_numero__range=(self.rut_tecnicos, self.rut_tecnicos + RUT_TRAMO - 1)
+		).exists():
+			raise ValueError(
+				f'Los RUT del prefijo {prefijo} ya están en uso en la empresa {self.empresa.slug}; use otro prefijo.'
+			)
+
+		with fechas_manuales(Cliente._meta.get_field('fecha_registro'), OrdenTrabajo._meta.get_field('fecha_solicitud')):
+			self.insertar(Cliente, self.clientes())
+			clientes = self.ids(Cliente, rut_numero__gte=self.rut_clientes, rut_numero__lt=self.rut_clientes + spec['clientes'])
+			self.insertar(Equipo, self.equipos(clientes))
+			equipos = Equipo.objects.filter(empresa=self.empresa, codigo__startswith=f'{prefijo}-EQ-').order_by('pk')
+			equipos = list(equipos.values_list('pk', 'tipo'))
+			self.generar_tecnicos()
+			tecnicos = self.ids(Tecnico, usuario__username__startswith=self.usuario_prefijo)
+			self.insertar(PlanMantencion, self.planes(equipos))
+			planes = {}
+			for pk, equipo_id, duracion in PlanMantencion.objects.filter(
+				empresa=self.empresa, equipo_id__in=[pk for pk, _ in equipos]
+			).order_by('pk').values_list('pk', 'equipo_id', 'duracion_estimada').iterator(chunk_size=self.lote):
+				planes.setdefault(equipo_id, []).append((pk, duracion))
+			self.insertar(OrdenTrabajo, self.ordenes(equipos, tecnicos, planes))
+		return self.totales
+
+	def clientes(self):
+		rng = self.rng
+		ciudades = [ciudad[:3] for ciudad in CIUDADES]
+		pesos = [ciudad[3] for ciudad in CIUDADES]
+		for i in range(self.spec['clientes']):
+			ciudad, lat, lon = rng.choices(ciudades, pesos)[0]
+			rubro = rng.choice(RUBROS)
+			con_ubicacion = rng.random() < 0.8
+			yield Cliente(
+				empresa=self.empresa,
+				rut=rut(self.rut_clientes + i),
+				rut_numero=self.rut_clientes + i,
+				razon_social=f'{rng.choice(APELLIDOS)} {rubro} {i + 1} {rng.choice(SOCIEDADES)}',
+				giro=rubro,
+				direccion=f'Av. {rng.choice(APELLIDOS)} {rng.randint(100, 9999)}, {ciudad}',
+				latitud=round(lat + rng.uniform(-0.15, 0.15), 6) if con_ubicacion else None,
+				longitud=round(lon + rng.uniform(-0.15, 0.15), 6) if con_ubicacion else None,
+				telefono=f'+569{rng.randint(10000000, 99999999)}',
+				email=f'contacto{i + 1}@{rubro.lower()}.example.com',
+				fecha_registro=self.ahora - timedelta(days=rng.randint(0, 10 * 365)),
+				activo=rng.random() < 0.95,
+			)
+
+	def equipos(self, clientes):
+		rng = self.rng
+		base = self.ahora.date()
+		coordenadas = {
+			pk: (lat, lon) for pk, lat, lon in Cliente.objects.filter(pk__in=clientes).values_list('pk', 'latitud', 'longitud')
+		}
+		numero = 0
+		for cliente in clientes:
+			for _ in range(self.spec['equipos_por_cliente']):
+				# Los primeros equipos recorren todos los tipos; el resto sigue los pesos
+				tipo = TIPOS[numero] if numero < len(TIPOS) else rng.choices(TIPOS, PESOS_TIPO)[0]
+				marca, modelos = rng.choice(MARCAS[tipo])
+				lat, lon = coordenadas[cliente]
+				propia = lat is not None and rng.random() < 0.5
+				yield Equipo(
+					empresa=self.empresa,
+					cliente_id=cliente,
+					codigo=f"{self.spec['prefijo']}-EQ-{numero:07d}",
+					nombre=rng.choice(NOMBRES_EQUIPO[tipo]),
+					tipo=tipo,
+					marca=marca,
+					modelo=rng.choice(modelos),
+					# El tramo evita que la misma semilla repita series con otro prefijo
+					numero_serie=f'{marca[:3].upper()}-{rng.randint(100000, 999999)}-{self.tramo:03d}{numero}',
+					fecha_instalacion=base - timedelta(days=rng.randint(30, 15 * 365)),
+					ubicacion=f'Planta {rng.randint(1, 5)}, sector {rng.choice("ABCDEF")}',
+					latitud=round(lat + rng.uniform(-0.01, 0.01), 6) if propia else None,
+					longitud=round(lon + rng.uniform(-0.01, 0.01), 6) if propia else None,
+					ficha_tecnica=f'Potencia {rng.randint(1, 500)} kW' if rng.random() < 0.3 else '',
+					activo=rng.random() < 0.95,
+				)
+				numero += 1
+
+	def generar_tecnicos(self):
+		rng = self.rng
+		n = self.spec['tecnicos']
+		self.usuario_prefijo = f"{self.spec['prefijo'].lower()}-{self.empresa.slug}-tec-"
+		# Un hash por usuario sería lo más lento de toda la generación: se usa una clave inutilizable
+		clave = make_password(None)
+		nombres = [(rng.choice(NOMBRES), rng.choice(APELLIDOS)) for _ in range(n)]
+		self.insertar(User, (
+			User(
+				username=f'{self.usuario_prefijo}{i}', first_name=nombre, last_name=apellido,
+				email=f'{self.usuario_prefijo}{i}@example.com', password=clave,
+			)
+			for i, (nombre, apellido) in enumerate(nombres)
+		))
+		usuarios = list(
+			User.objects.filter(username__startswith=self.usuario_prefijo).order_by('pk').values_list('pk', flat=True)
+		)
+		Empresa.usuarios.through.objects.bulk_create(
+			[Empresa.usuarios.through(empresa_id=self.empresa.pk, user_id=usuario) for usuario in usuarios],
+			batch_size=self.lote,
+		)
+		base = self.ahora.date()
+		self.insertar(Tecnico, (
+			Tecnico(
+				empresa=self.empresa,
+				usuario_id=usuario,
+				rut=rut(self.rut_tecnicos + i),
+				rut_numero=self.rut_tecnicos + i,
+				especialidad=rng.choice(ESPECIALIDADES),
+				telefono=f'+569{rng.randint(10000000, 99999999)}',
+				fecha_contratacion=base - timedelta(days=rng.randint(0, 20 * 365)),
+				activo=rng.random() < 0.9,
+			)
+			for i, usuario in enumerate(usuarios)
+		))
+
+	def planes(self, equipos):
+		rng = self.rng
+		duraciones = {'DIA': 1, 'SEM': 2, 'MEN': 4, 'BIM': 6, 'TRI': 8, 'ANU': 24}
+		for pk, tipo in equipos:
+			for frecuencia in rng.sample(FRECUENCIAS, self.spec['planes_por_equipo']):
+				etiqueta = dict(PlanMantencion.FRECUENCIA_CHOICES)[frecuencia]
+				yield PlanMantencion(
+					empresa=self.empresa,
+					equipo_id=pk,
+					nombre=f'Mantención {etiqueta.lower()}',
+					descripcion=f'Mantención preventiva {etiqueta.lower()} de {dict(Equipo.TIPO_EQUIPO_CHOICES)[tipo].lower()}',
+					frecuencia=frecuencia,
+					duracion_estimada=max(1, round(duraciones.get(frecuencia, 4) * rng.uniform(0.5, 1.5))),
+					procedimiento='1. Bloqueo y etiquetado. 2. Inspección. 3. Ajustes. 4. Prueba de funcionamiento.',
+					activo=rng.random() < 0.9,
+				)
+
+	def ordenes(self, equipos, tecnicos, planes):
+		rng = self.rng
+		spec = self.spec
+		# Unos pocos técnicos concentran buena parte de las órdenes (pesos tipo Zipf)
+		pesos_tecnico = list(_acumular(1 / (i + 1) ** 0.8 for i in range(len(tecnicos))))
+		pesos_estado = [(limite, list(_acumular(pesos))) for limite, pesos in ESTADOS_POR_EDAD]
+		pesos_prioridad = list(_acumular(PESOS_PRIORIDAD))
+		for i in range(spec['ordenes']):
+			equipo, tipo = equipos[rng.randrange(len(equipos))]
+			# Más órdenes recientes que antiguas
+			edad = spec['dias'] * rng.random() ** 1.5
+			solicitud = self.ahora - timedelta(days=edad, seconds=rng.randrange(36000))
+			for limite, pesos in pesos_estado:
+				if limite is None or edad < limite:
+					estado = rng.choices(ESTADOS, cum_weights=pesos)[0]
+					break
+			prioridad = rng.choices(PRIORIDADES, cum_weights=pesos_prioridad)[0]
+			programada = solicitud.date() + timedelta(days=rng.randint(0, PLAZO_PRIORIDAD[prioridad]))
+			plan, duracion = None, rng.uniform(1, 8)
+			if planes.get(equipo) and rng.random() < 0.4:
+				plan, duracion = rng.choice(planes[equipo])
+			tecnico = None
+			if tecnicos and (estado != 'PEN' or rng.random() < 0.5):
+				tecnico = tecnicos[rng.choices(range(len(tecnicos)), cum_weights=pesos_tecnico)[0]]
+
+			inicio = fin = costo_real = None
+			if estado in ('PRO', 'FIN'):
+				inicio = datetime.combine(programada, MEDIANOCHE, tzinfo=self.zona) + timedelta(hours=rng.uniform(8, 17))
+				# Una orden iniciada o finalizada no puede tener fechas futuras
+				inicio = max(solicitud, min(inicio, self.ahora))
+			if estado == 'FIN':
+				fin = min(inicio + timedelta(hours=duracion * rng.lognormvariate(0, 0.3)), self.ahora)
+			estimado = COSTO_TIPO[tipo] * rng.lognormvariate(0, 0.5) * (1.5 if prioridad == 'URG' else 1)
+			if estado == 'FIN':
+				# Los costos reales tienden a superar lo estimado
+				costo_real = estimado * rng.lognormvariate(0.05, 0.25)
+			yield OrdenTrabajo(
+				empresa=self.empresa,
+				equipo_id=equipo,
+				tecnico_id=tecnico,
+				plan_mantencion_id=plan,
+				codigo=f"{spec['prefijo']}-OT-{i:08d}",
+				descripcion=rng.choice(TRABAJOS),
+				fecha_solicitud=solicitud,
+				fecha_programada=programada,
+				fecha_inicio=inicio,
+				fecha_fin=fin,
+				estado=estado,
+				prioridad=prioridad,
+				observaciones='Cancelada por el cliente' if estado == 'CAN' else '',
+				costo_estimado=_monto(estimado),
+				costo_real=_monto(costo_real) if costo_real is not None else None,
+			)
+
+
+def _acumular(valores):
+	total = 0
+	for valor in valores:
+		total += valor
+		yield total
+
+
+def _monto(valor):
+	# DecimalField(max_digits=10, decimal_places=2)
+	return Decimal(min(round(valor), 99999999)).quantize(Decimal('0.01'))
+
+
+def generar(spec, lote=5000, informar=None):
+	"""Genera los datos de la especificación. Retorna las filas creadas por modelo."""
+	return Generador(spec, lote=lote, informar=informar).generar()
@@ -0,0 +1,188 @@
+"""
+Búsqueda por cercanía y agrupación de órdenes en rutas.
+
+Las coordenadas de equipos y clientes son opcionales. Un equipo sin
+coordenadas se ubica en las de su cliente. Las consultas por radio primero
+acotan un rectángulo de latitud/longitud, que usa el índice
+(latitud, longitud), y después filtran por la distancia real (haversine)
+calculada en la base de datos.
+
+Para las rutas, las órdenes se reparten en una grilla de celdas del tamaño
+del radio. Cada punto solo se compara con las 9 celdas vecinas, así que
+agrupar n órdenes cuesta O(n) en vez de comparar todos los pares.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Coalesce, Cos, Least, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+	"""Distancia en km entre dos puntos sobre la superficie terrestre."""
+	dlat = math.radians(lat2 - lat1)
+	dlon = math.radians(lon2 - lon1)
+	a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+	return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parsear_cerca(cerca, radio=None):
+	"""
+	Interpreta ``cerca=lat,lon`` y ``radio`` (km). Retorna (lat, lon, radio);
+	lanza ValueError si los valores no son válidos.
+	"""
+	try:
+		lat, lon = (float(parte) for parte in cerca.split(','))
+	except ValueError:
+		raise ValueError('cerca debe tener el formato lat,lon.')
+	if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+		raise ValueError('Coordenadas fuera de rango.')
+	return lat, lon, parsear_radio(radio)
+
+
+def parsear_radio(radio=None):
+	"""Radio en km (CERCANIA_RADIO_KM si no se indica); lanza ValueError si no es válido."""
+	maximo = getattr(settings, 'CERCANIA_RADIO_MAXIMO_KM', 500)
+	if radio in (None, ''):
+		radio = getattr(settings, 'CERCANIA_RADIO_KM', 10)
+	try:
+		radio = float(radio)
+	except ValueError:
+		raise ValueError('radio debe ser un número de kilómetros.')
+	if not 0 < radio <= maximo:
+		raise ValueError(f'radio debe estar entre 0 y {maximo} km.')
+	return radio
+
+
+def rectangulo(lat, lon, radio_km):
+	"""
+	Rectángulo (lat_min, lat_max, lon_min, lon_max) que contiene el círculo.
+	Los límites de longitud son None cerca de los polos o del antimeridiano,
+	donde el rectángulo no se puede expresar con un solo rango.
+	"""
+	dlat = radio_km / KM_POR_GRADO
+	lat_min, lat_max = lat - dlat, lat + dlat
+	if lat_min <= -90 or lat_max >= 90:
+		return max(lat_min, -90), min(lat_max, 90), None, None
+	dlon = dlat / math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+	if lon - dlon < -180 or lon + dlon > 180:
+		return lat_min, lat_max, None, None
+	return lat_min, lat_max, lon - dlon, lon + dlon
+
+
+def expresion_distancia(campo_lat, campo_lon, lat, lon):
+	"""Expresión ORM con la distancia haversine en km al punto (lat, lon)."""
+	phi = math.radians(lat)
+	a = (
+		Power(Sin((Radians(campo_lat) - phi) / 2), 2)
+		+ math.cos(phi) * Cos(Radians(campo_lat)) * Power(Sin((Radians(campo_lon) - math.radians(lon)) / 2), 2)
+	)
+	return 2 * RADIO_TIERRA_KM * ASin(Sqrt(Least(a, 1.0)), output_field=FloatField())
+
+
+def filtrar_cercanos(queryset, campos, lat, lon, radio_km):
+	"""
+	Filtra el queryset a los registros a menos de ``radio_km`` del punto y
+	anota ``distancia_km``. ``campos`` es una lista de pares (latitud, longitud)
+	en orden de preferencia: se usa el primer par con coordenadas.
+	"""
+	lat_min, lat_max, lon_min, lon_max = rectangulo(lat, lon, radio_km)
+	condicion = Q()
+	sin_anteriores = Q()
+	for campo_lat, campo_lon in campos:
+		caja = Q(**{f'{campo_lat}__range': (lat_min, lat_max)})
+		if lon_min is not None:
+			caja &= Q(**{f'{campo_lon}__range': (lon_min, lon_max)})
+		condicion |= sin_anteriores & caja
+		sin_anteriores &= Q(**{f'{campo_lat}__isnull': True})
+
+	if len(campos) == 1:
+		campo_lat, campo_lon = F(campos[0][0]), F(campos[0][1])
+	else:
+		campo_lat = Coalesce(*(F(c[0]) for c in campos), output_field=FloatField())
+		campo_lon = Coalesce(*(F(c[1]) for c in campos), output_field=FloatField())
+	return queryset.filter(condicion).annotate(
+		distancia_km=expresion_distancia(campo_lat, campo_lon, lat, lon)
+	).filter(distancia_km__lte=radio_km)
+
+
+class FiltroCercania:
+	"""
+	Filter backend para ``?cerca=lat,lon&radio=km``. La vista declara en
+	``campos_cercania`` los pares de campos con las coordenadas. Si no se pide
+	otro orden, los resultados se ordenan del más cercano al más lejano.
+	"""
+
+	def filter_queryset(self, request, queryset, view):
+		cerca = request.query_params.get('cerca')
+		if not cerca:
+			return queryset
+		try:
+			lat, lon, radio = parsear_cerca(cerca, request.query_params.get('radio'))
+		except ValueError as exc:
+			raise ValidationError({'cerca': str(exc)})
+		queryset = filtrar_cercanos(queryset, view.campos_cercania, lat, lon, radio)
+		if not request.query_params.get(api_settings.ORDERING_PARAM):
+			queryset = queryset.order_by('distancia_km')
+		return queryset
+
+
+def agrupar_por_cercania(puntos, radio_km):
+	"""
+	Agrupa puntos ``(clave, lat, lon)`` de modo que cada punto quede a menos de
+	``radio_km`` de al menos otro punto de su grupo (enlace simple). Retorna una
+	lista de grupos, cada uno una lista de puntos.
+	"""
+	if not puntos:
+		return []
+	# Proyección equirectangular con la latitud más extrema: las distancias
+	# proyectadas nunca superan las reales, así que dos puntos a menos del
+	# radio quedan siempre en celdas vecinas
+	cos_lat = max(math.cos(math.radians(max(abs(p[1]) for p in puntos))), 1e-6)
+	celdas = defaultdict(list)
+	posicion = []
+	for indice, (_, lat, lon) in enumerate(puntos):
+		celda = (int(math.floor(lat * KM_POR_GRADO / radio_km)), int(math.floor(lon * KM_POR_GRADO * cos_lat / radio_km)))
+		celdas[celda].append(indice)
+		posicion.append(celda)
+
+	padre = list(range(len(puntos)))
+
+	def raiz(i):
+		while padre[i] != i:
+			padre[i] = padre[padre[i]]
+			i = padre[i]
+		return i
+
+	for indice, (fila, columna) in enumerate(posicion):
+		_, lat, lon = puntos[indice]
+		for df in (-1, 0, 1):
+			for dc in (-1, 0, 1):
+				for otro in celdas.get((fila + df, columna + dc), ()):
+					if otro <= indice or raiz(otro) == raiz(indice):
+						continue
+					if haversine_km(lat, lon, puntos[otro][1], puntos[otro][2]) <= radio_km:
+						padre[raiz(otro)] = raiz(indice)
+
+	grupos = defaultdict(list)
+	for indice, punto in enumerate(puntos):
+		grupos[raiz(indice)].append(punto)
+	return list(grupos.values())
+
+
+def ordenar_recorrido(puntos):
+	"""Ordena los puntos de un grupo por vecino más cercano desde el primero."""
+	pendientes = list(puntos[1:])
+	recorrido = [puntos[0]]
+	while pendientes:
+		_, lat, lon = recorrido[-1]
+		siguiente = min(pendientes, key=lambda p: haversine_km(lat, lon, p[1], p[2]))
+		pendientes.remove(siguiente)
+		recorrido.append(siguiente)
+	return recorrido
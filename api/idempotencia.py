@@ -0,0 +1,160 @@
+"""
+Soporte para el encabezado Idempotency-Key en las peticiones de escritura.
+
+La primera petición con una clave la reserva (fila en estado 'PRO') y, al
+terminar, guarda el código y el cuerpo de su respuesta. Los reintentos con la
+misma clave reciben esa respuesta sin volver a ejecutar la vista; si llegan
+mientras la primera sigue en curso, esperan a que termine en vez de competir.
+Una reserva en curso por más de ``IDEMPOTENCIA_BLOQUEO_SEGUNDOS`` se da por
+abandonada (el worker murió a mitad de la petición) y se puede tomar de nuevo.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .empresas import empresa_activa
+from .models import ClaveIdempotencia
+
+ENCABEZADO = 'Idempotency-Key'
+
+
+def calcular_huella(request):
+	"""
+	Hash de la empresa, el método, la ruta y el cuerpo, para detectar claves
+	reutilizadas con otro contenido (o en otra empresa).
+	"""
+	contenido = json.dumps(request.data, sort_keys=True, default=str, cls=JSONEncoder)
+	return hashlib.sha256(f'{empresa_activa()} {request.method} {request.path}\n{contenido}'.encode()).hexdigest()
+
+
+def buscar_clave(usuario, clave):
+	"""Retorna el registro vigente de la clave, o None."""
+	registro = ClaveIdempotencia.objects.filter(usuario=usuario, clave=clave).first()
+	if registro is None:
+		return None
+	ahora = timezone.now()
+	if registro.expira <= ahora:
+		# Una clave vencida se puede reutilizar
+		registro.delete()
+		return None
+	bloqueo = timedelta(seconds=getattr(settings, 'IDEMPOTENCIA_BLOQUEO_SEGUNDOS', 120))
+	if registro.estado == 'PRO' and registro.fecha_creacion <= ahora - bloqueo:
+		# Reserva abandonada; el filtro por estado evita borrar una que justo terminó
+		ClaveIdempotencia.objects.filter(pk=registro.pk, estado='PRO').delete()
+		return None
+	return registro
+
+
+def reservar_clave(usuario, clave, huella):
+	"""
+	Reserva la clave para esta petición. Retorna (registro, es_nueva); si la
+	clave ya existe y está en curso, espera hasta IDEMPOTENCIA_ESPERA_SEGUNDOS
+	a que la primera petición termine.
+	"""
+	# Camino rápido de los reintentos: una sola lectura
+	registro = buscar_clave(usuario, clave)
+	if registro is None:
+		try:
+			with transaction.atomic():
+				registro = ClaveIdempotencia.objects.create(
+					usuario=usuario, clave=clave, huella=huella,
+					expira=timezone.now() + timedelta(hours=getattr(settings, 'IDEMPOTENCIA_HORAS', 24)),
+				)
+			return registro, True
+		except IntegrityError:
+			# Otra petición con la misma clave la reservó primero
+			registro = buscar_clave(usuario, clave)
+
+	limite = time.monotonic() + getattr(settings, 'IDEMPOTENCIA_ESPERA_SEGUNDOS', 10)
+	while True:
+		if registro is None:
+			# La primera petición falló y liberó la clave: se reintenta la reserva
+			return reservar_clave(usuario, clave, huella)
+		if registro.estado == 'FIN' or registro.huella != huella or time.monotonic() >= limite:
+			return registro, False
+		time.sleep(0.05)
+		registro = buscar_clave(usuario, clave)
+
+
+class IdempotenciaMixin:
+	"""
+	Mixin para ViewSets: aplica Idempotency-Key a todos los métodos de escritura
+	(create, update, partial_update, destroy y acciones POST/PUT/PATCH/DELETE).
+	"""
+
+	def initial(self, request, *args, **kwargs):
+		super().initial(request, *args, **kwargs)
+		self.clave_idempotencia = None
+		clave = request.headers.get(ENCABEZADO)
+		if not clave or request.method in SAFE_METHODS or not request.user.is_authenticated:
+			return
+		if len(clave) > 255:
+			self.reemplazar_handler(request, Response(
+				{'error': f'{ENCABEZADO} no puede superar 255 caracteres.'},
+				status=status.HTTP_400_BAD_REQUEST
+			))
+			return
+
+		huella = calcular_huella(request)
+		registro, es_nueva = reservar_clave(request.user, clave, huella)
+		if es_nueva:
+			self.clave_idempotencia = registro
+		elif registro.huella != huella:
+			self.reemplazar_handler(request, Response(
+				{'error': f'La {ENCABEZADO} ya se usó con una petición distinta.'},
+				status=status.HTTP_422_UNPROCESSABLE_ENTITY
+			))
+		elif registro.estado != 'FIN':
+			self.reemplazar_handler(request, Response(
+				{'error': 'Una petición con la misma clave sigue en curso.'},
+				status=status.HTTP_409_CONFLICT
+			))
+		else:
+			cuerpo = json.loads(registro.cuerpo_respuesta) if registro.cuerpo_respuesta else None
+			respuesta = Response(cuerpo, status=registro.codigo_respuesta)
+			respuesta['Idempotent-Replayed'] = 'true'
+			self.reemplazar_handler(request, respuesta)
+
+	def reemplazar_handler(self, request, respuesta):
+		"""Hace que la petición responda ``respuesta`` sin ejecutar la vista."""
+		setattr(self, request.method.lower(), lambda *args, **kwargs: respuesta)
+
+	def liberar_clave(self):
+		"""Elimina la reserva para que el cliente pueda reintentar con la misma clave."""
+		registro = getattr(self, 'clave_idempotencia', None)
+		if registro is not None:
+			self.clave_idempotencia = None
+			registro.delete()
+
+	def handle_exception(self, exc):
+		try:
+			return super().handle_exception(exc)
+		except Exception:
+			self.liberar_clave()
+			raise
+
+	def finalize_response(self, request, response, *args, **kwargs):
+		registro = getattr(self, 'clave_idempotencia', None)
+		if registro is not None:
+			if response.status_code >= 500:
+				# Los errores del servidor no se memorizan
+				self.liberar_clave()
+			else:
+				self.clave_idempotencia = None
+				cuerpo = ''
+				if getattr(response, 'data', None) is not None:
+					cuerpo = json.dumps(response.data, cls=JSONEncoder)
+				# Si la reserva se dio por abandonada mientras tanto, ya no es de esta petición
+				ClaveIdempotencia.objects.filter(pk=registro.pk, estado='PRO').update(
+					estado='FIN', codigo_respuesta=response.status_code, cuerpo_respuesta=cuerpo
+				)
+		return super().finalize_response(request, response, *args, **kwargs)
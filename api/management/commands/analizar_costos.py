@@ -0,0 +1,18 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.analitica import FILTROS, analizar_costos
+
+
+class Command(BaseCommand):
+    help = 'Analiza la precisión de los costos estimados de las órdenes de trabajo.'
+
+    def add_arguments(self, parser):
+        for nombre in FILTROS:
+            parser.add_argument(f'--{nombre}', default=None, help=f'Filtro opcional por {nombre}.')
+
+    def handle(self, *args, **options):
+        filtros = {nombre: options[nombre] for nombre in FILTROS}
+        resultado = analizar_costos(filtros)
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
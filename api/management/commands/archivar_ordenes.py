@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.archivo import archivar_ordenes, ordenes_archivables, ordenes_en_conflicto
+
+
+class Command(BaseCommand):
+    help = 'Mueve las órdenes de trabajo cerradas (FIN/CAN) antiguas a la tabla de archivo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Antigüedad mínima en días (por defecto ORDENES_ARCHIVO_DIAS).')
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Órdenes por transacción (por defecto ORDENES_ARCHIVO_LOTE).')
+        parser.add_argument('--simular', action='store_true',
+                            help='Solo informa cuántas órdenes se archivarían.')
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            total = ordenes_archivables(options['dias']).count()
+            self.stdout.write(f'{total} órdenes serían archivadas.')
+        else:
+            total = archivar_ordenes(dias=options['dias'], lote=options['lote'])
+            self.stdout.write(self.style.SUCCESS(f'{total} órdenes archivadas.'))
+
+        codigos = list(ordenes_en_conflicto(options['dias']).order_by('pk').values_list('codigo', flat=True)[:20])
+        if codigos:
+            self.stderr.write(self.style.WARNING(
+                'Órdenes omitidas porque su código ya existe en el archivo: ' + ', '.join(codigos)
+            ))
@@ -0,0 +1,95 @@
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import auditoria
+from api.models import Cliente, Equipo, OrdenTrabajo, RegistroAuditoria
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo del registro de auditoría en el camino de escritura: '
+        'guardados sin auditoría, con auditoría en bloque y con una fila por guardado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--guardados', type=int, default=2000, help='Guardados por medición.')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Mediciones por variante (se usa la mediana).')
+
+    def handle(self, *args, **options):
+        n = options['guardados']
+        auditoria.vaciar()
+        with auditoria.sin_auditoria():
+            cliente = Cliente.objects.create(
+                rut='1-9', razon_social='Benchmark Auditoría', giro='-', direccion='-',
+                telefono='-', email='benchmark@example.com'
+            )
+            equipo = Equipo.objects.create(
+                cliente=cliente, codigo='BENCH-AUDITORIA', nombre='-', marca='-', modelo='-',
+                numero_serie='BENCH-AUDITORIA', fecha_instalacion=date.today(), ubicacion='-'
+            )
+            orden = OrdenTrabajo.objects.create(
+                equipo=equipo, codigo='BENCH-AUDITORIA', descripcion='-', fecha_programada=date.today()
+            )
+        try:
+            resultados = {'base': [], 'bloque': [], 'fila': []}
+            for _ in range(options['repeticiones']):
+                with auditoria.sin_auditoria():
+                    resultados['base'].append(self.medir(orden, n))
+                resultados['bloque'].append(self.medir(orden, n, vaciar=True))
+                # Referencia: una fila de auditoría insertada en cada guardado
+                original = auditoria.encolar
+                auditoria.encolar = lambda registro: RegistroAuditoria.objects.create(**registro)
+                try:
+                    resultados['fila'].append(self.medir(orden, n))
+                finally:
+                    auditoria.encolar = original
+        finally:
+            RegistroAuditoria.objects.filter(modelo='ordentrabajo', objeto_id=orden.pk).delete()
+            with auditoria.sin_auditoria():
+                orden.delete()
+                equipo.delete()
+                cliente.delete()
+
+        base = statistics.median(segundos for segundos, _ in resultados['base'])
+        self.stdout.write(f'{n} guardados de OrdenTrabajo (estado y costo_real cambian en cada uno)')
+        for nombre, clave in [
+            ('Sin auditoría', 'base'),
+            ('Auditoría en bloque', 'bloque'),
+            ('Una fila por guardado', 'fila'),
+        ]:
+            segundos = statistics.median(s for s, _ in resultados[clave])
+            consultas = resultados[clave][-1][1]
+            self.stdout.write(
+                f'  {nombre:<24} {segundos / n * 1e6:8.1f} µs/guardado '
+                f'({(segundos / base - 1) * 100:+6.1f}%)  {consultas / n:5.2f} consultas/guardado'
+            )
+
+    @contextmanager
+    def contar_consultas(self, contador):
+        def envoltura(execute, sql, params, many, context):
+            contador[0] += 1
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(envoltura):
+            yield
+
+    def medir(self, orden, n, vaciar=False):
+        """
+        Retorna (segundos, consultas) de n guardados alternando estado y costo.
+        Con ``vaciar`` incluye la escritura en bloque de los registros pendientes.
+        """
+        estados = ['PRO', 'PEN']
+        contador = [0]
+        inicio = time.perf_counter()
+        with self.contar_consultas(contador):
+            for i in range(n):
+                orden.estado = estados[i % 2]
+                orden.costo_real = i
+                orden.save()
+            if vaciar:
+                auditoria.vaciar()
+        return time.perf_counter() - inicio, contador[0]
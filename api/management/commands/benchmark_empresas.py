@@ -0,0 +1,115 @@
+import gc
+import statistics
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import auditoria
+from api.models import Cliente, Empresa, Equipo, OrdenTrabajo
+from api.views import EquipoViewSet, OrdenTrabajoViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la latencia de los listados de una empresa chica antes y después de cargar '
+        'una empresa grande en la misma base. Todo se hace en una transacción que se revierte.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ordenes', type=int, default=200000, help='Órdenes de la empresa grande.')
+        parser.add_argument('--repeticiones', type=int, default=50, help='Peticiones por medición.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), auditoria.sin_auditoria():
+                self.medir_todo(options['ordenes'], options['repeticiones'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def medir_todo(self, n, repeticiones):
+        chica = self.crear_empresa('bench-chica', equipos=20, ordenes=200)
+        usuario = User.objects.create_user(username='bench-empresas')
+        chica.usuarios.add(usuario)
+        vistas = [
+            ('/api/equipos/', EquipoViewSet.as_view({'get': 'list'})),
+            ('/api/ordenes/', OrdenTrabajoViewSet.as_view({'get': 'list'})),
+            ('/api/ordenes/?estado=PEN', OrdenTrabajoViewSet.as_view({'get': 'list'})),
+        ]
+
+        antes = {url: self.medir(vista, url, usuario, repeticiones) for url, vista in vistas}
+        inicio = time.perf_counter()
+        self.crear_empresa('bench-grande', equipos=max(n // 10, 1), ordenes=n)
+        self.stdout.write(f'Empresa grande: {n} órdenes cargadas en {time.perf_counter() - inicio:.1f} s')
+        with connection.cursor() as cursor:
+            if connection.vendor in ('sqlite', 'postgresql'):
+                cursor.execute('ANALYZE')
+        despues = {url: self.medir(vista, url, usuario, repeticiones) for url, vista in vistas}
+
+        self.stdout.write('Listados de la empresa chica (200 órdenes), ms por petición (mínimo / mediana)')
+        for url, _ in vistas:
+            (min_antes, med_antes), (min_despues, med_despues) = antes[url], despues[url]
+            self.stdout.write(
+                f'  {url:<28} antes {min_antes * 1000:6.2f} / {med_antes * 1000:6.2f}  '
+                f'después {min_despues * 1000:6.2f} / {med_despues * 1000:6.2f}  '
+                f'({(min_despues / min_antes - 1) * 100:+6.1f}%)'
+            )
+
+        # Los planes muestran que la empresa chica solo recorre sus filas en los índices por empresa
+        self.stdout.write('Planes de consulta')
+        for queryset in [
+            Equipo.objects.filter(empresa=chica).order_by('codigo')[:20],
+            OrdenTrabajo.objects.filter(empresa=chica).order_by('-fecha_solicitud')[:20],
+            OrdenTrabajo.objects.filter(empresa=chica, estado='PEN').order_by('-fecha_solicitud')[:20],
+        ]:
+            self.stdout.write('  ' + queryset.explain().replace('\n', '\n  '))
+
+    def crear_empresa(self, slug, equipos, ordenes):
+        empresa = Empresa.objects.create(nombre=slug, slug=slug)
+        cliente = Cliente.objects.create(
+            empresa=empresa, rut='1-9', razon_social=slug, giro='-', direccion='-', telefono='-',
+            email=f'{slug}@example.com'
+        )
+        Equipo.objects.bulk_create([
+            Equipo(
+                empresa=empresa, cliente=cliente, codigo=f'{slug}-{i}', nombre='-', marca='-', modelo='-',
+                numero_serie=f'{slug}-{i}', fecha_instalacion=date(2020, 1, 1), ubicacion='-'
+            )
+            for i in range(equipos)
+        ], batch_size=5000)
+        ids = list(Equipo.objects.filter(empresa=empresa).values_list('pk', flat=True))
+        estados = ['PEN', 'PRO', 'FIN', 'CAN']
+        for inicio in range(0, ordenes, 5000):
+            OrdenTrabajo.objects.bulk_create([
+                OrdenTrabajo(
+                    empresa=empresa, equipo_id=ids[i % len(ids)], codigo=f'{slug}-{i}', descripcion='-',
+                    fecha_programada=date(2030, 1, 1), estado=estados[i % 4]
+                )
+                for i in range(inicio, min(inicio + 5000, ordenes))
+            ])
+        return empresa
+
+    def medir(self, vista, url, usuario, repeticiones):
+        fabrica = APIRequestFactory()
+        tiempos = []
+        gc.collect()
+        # Las primeras peticiones calientan cachés de Python y de la base; no se cuentan
+        for i in range(repeticiones + 5):
+            request = fabrica.get(url, SERVER_NAME='localhost')
+            force_authenticate(request, user=usuario)
+            inicio = time.perf_counter()
+            response = vista(request)
+            response.render()
+            assert response.status_code == 200, response.data
+            if i >= 5:
+                tiempos.append(time.perf_counter() - inicio)
+        # El mínimo es el menos sensible al ruido de otros procesos
+        return min(tiempos), statistics.median(tiempos)
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.duplicados import buscar_duplicados, fusionar_equipos
+
+
+class Command(BaseCommand):
+    help = 'Busca equipos duplicados por número de serie, marca y modelo, y opcionalmente los fusiona.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--umbral', type=float, default=None,
+                            help='Similitud mínima entre 0 y 1 (por defecto DUPLICADOS_UMBRAL).')
+        parser.add_argument('--ventana', type=int, default=None,
+                            help='Vecinos comparados en los bloques grandes (por defecto DUPLICADOS_VENTANA).')
+        parser.add_argument('--fusionar', action='store_true',
+                            help='Fusiona cada grupo en su equipo más antiguo.')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado completo en JSON.')
+
+    def handle(self, *args, **options):
+        resultado = buscar_duplicados(umbral=options['umbral'], ventana=options['ventana'])
+        if options['json']:
+            self.stdout.write(json.dumps(resultado, indent=2))
+        else:
+            self.stdout.write(
+                f"{resultado['equipos']} equipos, {resultado['comparaciones']} comparaciones, "
+                f"{len(resultado['grupos'])} grupos de duplicados."
+            )
+            for grupo in resultado['grupos']:
+                self.stdout.write(f"  {grupo['conservar']} <- {grupo['duplicados']} (similitud {grupo['puntaje']})")
+
+        if options['fusionar']:
+            eliminados = 0
+            for grupo in resultado['grupos']:
+                # Cada grupo se fusiona en su propia transacción
+                eliminados += fusionar_equipos(grupo['conservar'], grupo['duplicados'])['eliminados']
+            self.stdout.write(self.style.SUCCESS(f'{eliminados} equipos duplicados fusionados.'))
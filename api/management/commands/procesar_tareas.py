@@ -0,0 +1,95 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+
+
+def _iniciar_proceso():
+    # Los procesos se crean con 'spawn': parten limpios, sin heredar
+    # conexiones abiertas, y abren las suyas al configurar Django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano encoladas en la base de datos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2,
+                            help='Procesos del pool (0 ejecuta en el proceso actual).')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando no hay tareas pendientes.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Termina cuando no quedan tareas pendientes.')
+
+    def handle(self, *args, **options):
+        if options['procesos'] <= 0:
+            self._procesar_local(options)
+        else:
+            self._procesar_pool(options)
+
+    def _procesar_local(self, options):
+        from api.tareas import ejecutar_tarea, tomar_siguiente
+
+        while True:
+            tarea_id = tomar_siguiente()
+            if tarea_id is None:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+            estado = ejecutar_tarea(tarea_id)
+            self.stdout.write(f'Tarea {tarea_id}: {estado}')
+
+    def _procesar_pool(self, options):
+        # Si un proceso del pool muere (por ejemplo, por falta de memoria) el
+        # pool queda inutilizable: se devuelven sus tareas a la cola y se crea otro
+        while True:
+            try:
+                return self._atender_pool(options)
+            except BrokenProcessPool as exc:
+                self.stderr.write(f'El pool de procesos se detuvo ({exc}); se crea uno nuevo.')
+
+    def _atender_pool(self, options):
+        # api.tareas importa modelos, por lo que este módulo no puede importarlo
+        # al cargarse en un proceso hijo antes de django.setup()
+        from api.tareas import ejecutar_tarea, liberar, tomar_siguiente
+
+        en_curso = {}
+        pool = ProcessPoolExecutor(
+            max_workers=options['procesos'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_iniciar_proceso,
+        )
+        try:
+            with pool:
+                while True:
+                    while len(en_curso) < options['procesos']:
+                        tarea_id = tomar_siguiente()
+                        if tarea_id is None:
+                            break
+                        en_curso[pool.submit(ejecutar_tarea, tarea_id)] = tarea_id
+
+                    if not en_curso:
+                        if options['una_vez']:
+                            return
+                        time.sleep(options['intervalo'])
+                        continue
+
+                    terminadas, _ = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                    for futuro in terminadas:
+                        tarea_id = en_curso.pop(futuro)
+                        try:
+                            estado = futuro.result()
+                        except BrokenProcessPool:
+                            en_curso[futuro] = tarea_id
+                            raise
+                        except Exception as exc:
+                            self.stderr.write(f'Tarea {tarea_id}: error en el worker ({exc})')
+                        else:
+                            self.stdout.write(f'Tarea {tarea_id}: {estado}')
+        except BrokenProcessPool:
+            liberar(list(en_curso.values()))
+            raise
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ClaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves Idempotency-Key vencidas.'
+
+    def handle(self, *args, **options):
+        eliminadas, _ = ClaveIdempotencia.objects.filter(expira__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'{eliminadas} claves vencidas eliminadas.'))
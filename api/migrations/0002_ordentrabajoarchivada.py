@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 12:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrdenTrabajoArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=50, unique=True, verbose_name='Código de Orden')),
+                ('descripcion', models.TextField(verbose_name='Descripción del Trabajo')),
+                ('fecha_solicitud', models.DateTimeField(verbose_name='Fecha de Solicitud')),
+                ('fecha_programada', models.DateField(verbose_name='Fecha Programada')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Inicio Real')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Fin Real')),
+                ('estado', models.CharField(choices=[('PEN', 'Pendiente'), ('PRO', 'En Proceso'), ('FIN', 'Finalizada'), ('CAN', 'Cancelada')], default='FIN', max_length=3, verbose_name='Estado')),
+                ('prioridad', models.CharField(choices=[('BAJ', 'Baja'), ('MED', 'Media'), ('ALT', 'Alta'), ('URG', 'Urgente')], default='MED', max_length=3, verbose_name='Prioridad')),
+                ('observaciones', models.TextField(blank=True, verbose_name='Observaciones')),
+                ('costo_estimado', models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Costo Estimado')),
+                ('costo_real', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Costo Real')),
+                ('equipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ordenes_archivadas', to='api.equipo', verbose_name='Equipo')),
+                ('plan_mantencion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes_archivadas', to='api.planmantencion', verbose_name='Plan de Mantención Asociado')),
+                ('tecnico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes_archivadas', to='api.tecnico', verbose_name='Técnico Asignado')),
+            ],
+            options={
+                'verbose_name': 'Orden de Trabajo Archivada',
+                'verbose_name_plural': 'Órdenes de Trabajo Archivadas',
+                'ordering': ['-fecha_solicitud'],
+            },
+        ),
+    ]
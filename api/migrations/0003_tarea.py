@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-19 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_ordentrabajoarchivada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo de Tarea')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('PEN', 'Pendiente'), ('EJE', 'En Ejecución'), ('FIN', 'Finalizada'), ('ERR', 'Fallida')], default='PEN', max_length=3, verbose_name='Estado')),
+                ('progreso', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('resultado', models.JSONField(blank=True, null=True, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, verbose_name='Último Error')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos Realizados')),
+                ('max_intentos', models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de Intentos')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('disponible_desde', models.DateTimeField(verbose_name='Disponible Desde')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Inicio')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Fin')),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tareas', to=settings.AUTH_USER_MODEL, verbose_name='Creada por')),
+            ],
+            options={
+                'verbose_name': 'Tarea',
+                'verbose_name_plural': 'Tareas',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='tarea_pendiente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+from api.rut import rut_a_numero
+
+
+def calcular_rut_numero(apps, schema_editor):
+    # Los modelos históricos no tienen el save() que calcula rut_numero
+    for nombre in ('Cliente', 'Tecnico'):
+        modelo = apps.get_model('api', nombre)
+        pendientes = []
+        for registro in modelo.objects.only('id', 'rut').iterator(chunk_size=1000):
+            registro.rut_numero = rut_a_numero(registro.rut)
+            pendientes.append(registro)
+            if len(pendientes) == 1000:
+                modelo.objects.bulk_update(pendientes, ['rut_numero'])
+                pendientes = []
+        modelo.objects.bulk_update(pendientes, ['rut_numero'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_tarea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='rut_numero',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Número de RUT'),
+        ),
+        migrations.AddField(
+            model_name='tecnico',
+            name='rut_numero',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='Número de RUT'),
+        ),
+        migrations.RunPython(calcular_rut_numero, migrations.RunPython.noop),
+    ]
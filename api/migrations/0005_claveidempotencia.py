@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_rut_numero'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255, verbose_name='Clave')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella de la Petición')),
+                ('estado', models.CharField(choices=[('PRO', 'En Proceso'), ('FIN', 'Completada')], default='PRO', max_length=3, verbose_name='Estado')),
+                ('codigo_respuesta', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Código HTTP')),
+                ('cuerpo_respuesta', models.TextField(blank=True, verbose_name='Cuerpo de la Respuesta')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('expira', models.DateTimeField(db_index=True, verbose_name='Fecha de Expiración')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='clave_idempotencia_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-19 12:48
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_secuencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Latitud'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Longitud'),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='latitud',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Latitud'),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='longitud',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Longitud'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['latitud', 'longitud'], name='cliente_coordenadas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['latitud', 'longitud'], name='equipo_coordenadas_idx'),
+        ),
+    ]
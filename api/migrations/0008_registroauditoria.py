@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 12:53
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_coordenadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=30, verbose_name='Modelo')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID del Objeto')),
+                ('accion', models.CharField(choices=[('C', 'Creación'), ('M', 'Modificación'), ('E', 'Eliminación')], max_length=1, verbose_name='Acción')),
+                ('cambios', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Cambios')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha del Cambio')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='registros_auditoria', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Registro de Auditoría',
+                'verbose_name_plural': 'Registros de Auditoría',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='auditoria_objeto_idx'), models.Index(fields=['fecha'], name='auditoria_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,213 @@
+# Generated by Django 6.0 on 2026-10-19 13:05
+
+import api.empresas
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def crear_empresa_por_defecto(apps, schema_editor):
+    # Los registros existentes pasan a la empresa por defecto al agregar el campo
+    slug = getattr(settings, 'EMPRESA_POR_DEFECTO', 'principal')
+    if slug:
+        apps.get_model('api', 'Empresa').objects.get_or_create(slug=slug, defaults={'nombre': slug.capitalize()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_registroauditoria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Empresa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200, verbose_name='Nombre')),
+                ('slug', models.SlugField(unique=True, verbose_name='Identificador')),
+                ('activo', models.BooleanField(default=True, verbose_name='Activo')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Empresa',
+                'verbose_name_plural': 'Empresas',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.RunPython(crear_empresa_por_defecto, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='cliente',
+            name='cliente_coordenadas_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipo',
+            name='equipo_coordenadas_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='registroauditoria',
+            name='auditoria_objeto_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='registroauditoria',
+            name='auditoria_fecha_idx',
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='rut',
+            field=models.CharField(max_length=12, verbose_name='RUT'),
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='rut_numero',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Número de RUT'),
+        ),
+        migrations.AlterField(
+            model_name='equipo',
+            name='codigo',
+            field=models.CharField(max_length=50, verbose_name='Código del Equipo'),
+        ),
+        migrations.AlterField(
+            model_name='equipo',
+            name='numero_serie',
+            field=models.CharField(max_length=100, verbose_name='Número de Serie'),
+        ),
+        migrations.AlterField(
+            model_name='ordentrabajo',
+            name='codigo',
+            field=models.CharField(max_length=50, verbose_name='Código de Orden'),
+        ),
+        migrations.AlterField(
+            model_name='ordentrabajoarchivada',
+            name='codigo',
+            field=models.CharField(max_length=50, verbose_name='Código de Orden'),
+        ),
+        migrations.AlterField(
+            model_name='tecnico',
+            name='rut',
+            field=models.CharField(max_length=12, verbose_name='RUT'),
+        ),
+        migrations.AlterField(
+            model_name='tecnico',
+            name='rut_numero',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Número de RUT'),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='usuarios',
+            field=models.ManyToManyField(blank=True, related_name='empresas', to=settings.AUTH_USER_MODEL, verbose_name='Usuarios'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='clientes', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='equipos', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='ordenes_trabajo', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajoarchivada',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='ordenes_archivadas', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='planmantencion',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='planes_mantencion', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='registroauditoria',
+            name='empresa',
+            field=models.ForeignKey(db_constraint=False, default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.DO_NOTHING, related_name='registros_auditoria', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='tarea',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='tareas', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddField(
+            model_name='tecnico',
+            name='empresa',
+            field=models.ForeignKey(default=api.empresas.empresa_actual_id, on_delete=django.db.models.deletion.PROTECT, related_name='tecnicos', to='api.empresa', verbose_name='Empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'rut_numero'], name='cliente_rut_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'razon_social'], name='cliente_razon_social_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'latitud', 'longitud'], name='cliente_coordenadas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['empresa', 'latitud', 'longitud'], name='equipo_coordenadas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['empresa', 'fecha_solicitud'], name='orden_fecha_solicitud_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['empresa', 'estado'], name='orden_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajoarchivada',
+            index=models.Index(fields=['empresa', 'fecha_solicitud'], name='archivada_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planmantencion',
+            index=models.Index(fields=['empresa', 'nombre'], name='plan_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroauditoria',
+            index=models.Index(fields=['empresa', 'modelo', 'objeto_id', 'fecha'], name='auditoria_objeto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroauditoria',
+            index=models.Index(fields=['empresa', 'fecha'], name='auditoria_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tarea',
+            index=models.Index(fields=['empresa', 'fecha_creacion'], name='tarea_empresa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tecnico',
+            index=models.Index(fields=['empresa', 'rut_numero'], name='tecnico_rut_numero_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.UniqueConstraint(fields=('empresa', 'rut'), name='cliente_rut_por_empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipo',
+            constraint=models.UniqueConstraint(fields=('empresa', 'codigo'), name='equipo_codigo_por_empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipo',
+            constraint=models.UniqueConstraint(fields=('empresa', 'numero_serie'), name='equipo_serie_por_empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='ordentrabajo',
+            constraint=models.UniqueConstraint(fields=('empresa', 'codigo'), name='orden_codigo_por_empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='ordentrabajoarchivada',
+            constraint=models.UniqueConstraint(fields=('empresa', 'codigo'), name='archivada_codigo_por_empresa'),
+        ),
+        migrations.AddConstraint(
+            model_name='tecnico',
+            constraint=models.UniqueConstraint(fields=('empresa', 'rut'), name='tecnico_rut_por_empresa'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_empresas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='fecha_latido',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último Latido'),
+        ),
+    ]
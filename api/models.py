@@ -1,26 +1,83 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
+from .empresas import EmpresaManager, empresa_actual_id
+from .rut import rut_a_numero
+
+class Empresa(models.Model):
+	"""Modelo para las empresas contratantes (tenants). Cada una ve solo sus propios datos."""
+	nombre = models.CharField(max_length=200, verbose_name="Nombre")
+	slug = models.SlugField(max_length=50, unique=True, verbose_name="Identificador")
+	usuarios = models.ManyToManyField(User, blank=True, related_name='empresas', verbose_name="Usuarios")
+	activo = models.BooleanField(default=True, verbose_name="Activo")
+	fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+
+	class Meta:
+		verbose_name = "Empresa"
+		verbose_name_plural = "Empresas"
+		ordering = ['nombre']
+
+	def __str__(self):
+		return self.nombre
+
 
 class Cliente(models.Model):
 	"""Modelo para gestionar empresas clientes."""
-	rut = models.CharField(max_length=12, unique=True, verbose_name="RUT")
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='clientes',
+		verbose_name="Empresa"
+	)
+	rut = models.CharField(max_length=12, verbose_name="RUT")
+	# Número del RUT sin formato ni dígito verificador, para búsquedas exactas indexadas
+	rut_numero = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Número de RUT")
 	razon_social = models.CharField(max_length=200, verbose_name="Razón Social")
 	giro = models.CharField(max_length=200, verbose_name="Giro Comercial")
 	direccion = models.CharField(max_length=300, verbose_name="Dirección")
+	latitud = models.FloatField(
+		null=True, 
+		blank=True,
+		validators=[MinValueValidator(-90), MaxValueValidator(90)],
+		verbose_name="Latitud"
+	)
+	longitud = models.FloatField(
+		null=True, 
+		blank=True,
+		validators=[MinValueValidator(-180), MaxValueValidator(180)],
+		verbose_name="Longitud"
+	)
 	telefono = models.CharField(max_length=20, verbose_name="Teléfono")
 	email = models.EmailField(verbose_name="Correo Electrónico")
 	fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Registro")
 	activo = models.BooleanField(default=True, verbose_name="Activo")
 
+	objects = EmpresaManager()
+
 	class Meta:
 		verbose_name = "Cliente"
 		verbose_name_plural = "Clientes"
 		ordering = ['razon_social']
+		# Todos los índices empiezan por la empresa: cada consulta de la API filtra por ella
+		constraints = [
+			models.UniqueConstraint(fields=['empresa', 'rut'], name='cliente_rut_por_empresa'),
+		]
+		indexes = [
+			models.Index(fields=['empresa', 'rut_numero'], name='cliente_rut_numero_idx'),
+			models.Index(fields=['empresa', 'razon_social'], name='cliente_razon_social_idx'),
+			# Búsquedas por cercanía: primero se acota por un rectángulo de coordenadas
+			models.Index(fields=['empresa', 'latitud', 'longitud'], name='cliente_coordenadas_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.razon_social} ({self.rut})"
 
+	def save(self, *args, **kwargs):
+		self.rut_numero = rut_a_numero(self.rut)
+		super().save(*args, **kwargs)
+
 
 class Equipo(models.Model):
 	"""Modelo para gestionar equipos vinculados a clientes."""
@@ -32,13 +89,20 @@ class Equipo(models.Model):
 		('OTR', 'Otro'),
 	]
 
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='equipos',
+		verbose_name="Empresa"
+	)
 	cliente = models.ForeignKey(
 		Cliente, 
 		on_delete=models.CASCADE, 
 		related_name='equipos',
 		verbose_name="Cliente Dueño"
 	)
-	codigo = models.CharField(max_length=50, unique=True, verbose_name="Código del Equipo")
+	codigo = models.CharField(max_length=50, verbose_name="Código del Equipo")
 	nombre = models.CharField(max_length=200, verbose_name="Nombre del Equipo")
 	tipo = models.CharField(
 		max_length=3, 
@@ -48,16 +112,37 @@ class Equipo(models.Model):
 	)
 	marca = models.CharField(max_length=100, verbose_name="Marca")
 	modelo = models.CharField(max_length=100, verbose_name="Modelo")
-	numero_serie = models.CharField(max_length=100, unique=True, verbose_name="Número de Serie")
+	numero_serie = models.CharField(max_length=100, verbose_name="Número de Serie")
 	fecha_instalacion = models.DateField(verbose_name="Fecha de Instalación")
 	ubicacion = models.CharField(max_length=300, verbose_name="Ubicación Física")
+	latitud = models.FloatField(
+		null=True, 
+		blank=True,
+		validators=[MinValueValidator(-90), MaxValueValidator(90)],
+		verbose_name="Latitud"
+	)
+	longitud = models.FloatField(
+		null=True, 
+		blank=True,
+		validators=[MinValueValidator(-180), MaxValueValidator(180)],
+		verbose_name="Longitud"
+	)
 	ficha_tecnica = models.TextField(blank=True, verbose_name="Ficha Técnica")
 	activo = models.BooleanField(default=True, verbose_name="Activo")
 
+	objects = EmpresaManager()
+
 	class Meta:
 		verbose_name = "Equipo"
 		verbose_name_plural = "Equipos"
 		ordering = ['codigo']
+		constraints = [
+			models.UniqueConstraint(fields=['empresa', 'codigo'], name='equipo_codigo_por_empresa'),
+			models.UniqueConstraint(fields=['empresa', 'numero_serie'], name='equipo_serie_por_empresa'),
+		]
+		indexes = [
+			models.Index(fields=['empresa', 'latitud', 'longitud'], name='equipo_coordenadas_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.codigo} - {self.nombre} ({self.cliente.razon_social})"
@@ -73,13 +158,21 @@ class Tecnico(models.Model):
 		('GEN', 'General'),
 	]
 
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='tecnicos',
+		verbose_name="Empresa"
+	)
 	usuario = models.OneToOneField(
 		User, 
 		on_delete=models.CASCADE, 
 		related_name='tecnico',
 		verbose_name="Usuario Asociado"
 	)
-	rut = models.CharField(max_length=12, unique=True, verbose_name="RUT")
+	rut = models.CharField(max_length=12, verbose_name="RUT")
+	rut_numero = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Número de RUT")
 	especialidad = models.CharField(
 		max_length=3, 
 		choices=ESPECIALIDAD_CHOICES, 
@@ -90,14 +183,26 @@ class Tecnico(models.Model):
 	fecha_contratacion = models.DateField(verbose_name="Fecha de Contratación")
 	activo = models.BooleanField(default=True, verbose_name="Activo")
 
+	objects = EmpresaManager()
+
 	class Meta:
 		verbose_name = "Técnico"
 		verbose_name_plural = "Técnicos"
 		ordering = ['usuario__last_name']
+		constraints = [
+			models.UniqueConstraint(fields=['empresa', 'rut'], name='tecnico_rut_por_empresa'),
+		]
+		indexes = [
+			models.Index(fields=['empresa', 'rut_numero'], name='tecnico_rut_numero_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.usuario.get_full_name()} ({self.especialidad})"
 
+	def save(self, *args, **kwargs):
+		self.rut_numero = rut_a_numero(self.rut)
+		super().save(*args, **kwargs)
+
 
 class PlanMantencion(models.Model):
 	"""Modelo para gestionar planes preventivos de mantención asociados a equipos."""
@@ -111,6 +216,13 @@ class PlanMantencion(models.Model):
 		('ANU', 'Anual'),
 	]
 
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='planes_mantencion',
+		verbose_name="Empresa"
+	)
 	equipo = models.ForeignKey(
 		Equipo, 
 		on_delete=models.CASCADE, 
@@ -132,11 +244,16 @@ class PlanMantencion(models.Model):
 	procedimiento = models.TextField(verbose_name="Procedimiento a Seguir")
 	activo = models.BooleanField(default=True, verbose_name="Activo")
 
+	objects = EmpresaManager()
+
 	class Meta:
 		verbose_name = "Plan de Mantención"
 		verbose_name_plural = "Planes de Mantención"
 		ordering = ['equipo', 'nombre']
 		unique_together = ['equipo', 'nombre']
+		indexes = [
+			models.Index(fields=['empresa', 'nombre'], name='plan_nombre_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.nombre} - {self.equipo.codigo}"
@@ -158,6 +275,13 @@ class OrdenTrabajo(models.Model):
 		('URG', 'Urgente'),
 	]
 
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='ordenes_trabajo',
+		verbose_name="Empresa"
+	)
 	equipo = models.ForeignKey(
 		Equipo, 
 		on_delete=models.CASCADE, 
@@ -180,7 +304,7 @@ class OrdenTrabajo(models.Model):
 		related_name='ordenes_trabajo',
 		verbose_name="Plan de Mantención Asociado"
 	)
-	codigo = models.CharField(max_length=50, unique=True, verbose_name="Código de Orden")
+	codigo = models.CharField(max_length=50, verbose_name="Código de Orden")
 	descripcion = models.TextField(verbose_name="Descripción del Trabajo")
 	fecha_solicitud = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Solicitud")
 	fecha_programada = models.DateField(verbose_name="Fecha Programada")
@@ -213,10 +337,282 @@ class OrdenTrabajo(models.Model):
 		verbose_name="Costo Real"
 	)
 
+	objects = EmpresaManager()
+
 	class Meta:
 		verbose_name = "Orden de Trabajo"
 		verbose_name_plural = "Órdenes de Trabajo"
 		ordering = ['-fecha_solicitud']
+		constraints = [
+			models.UniqueConstraint(fields=['empresa', 'codigo'], name='orden_codigo_por_empresa'),
+		]
+		indexes = [
+			models.Index(fields=['empresa', 'fecha_solicitud'], name='orden_fecha_solicitud_idx'),
+			models.Index(fields=['empresa', 'estado'], name='orden_estado_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.codigo} - {self.equipo.codigo} ({self.estado})"
+
+
+class OrdenTrabajoArchivada(models.Model):
+	"""
+	Modelo para órdenes de trabajo cerradas (FIN/CAN) movidas fuera de la tabla activa.
+	Mantiene los mismos campos y en el mismo orden que OrdenTrabajo, de modo que
+	ambas tablas puedan combinarse con UNION al consultar el archivo.
+	"""
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='ordenes_archivadas',
+		verbose_name="Empresa"
+	)
+	equipo = models.ForeignKey(
+		Equipo, 
+		on_delete=models.CASCADE, 
+		related_name='ordenes_archivadas',
+		verbose_name="Equipo"
+	)
+	tecnico = models.ForeignKey(
+		Tecnico, 
+		on_delete=models.SET_NULL, 
+		null=True, 
+		blank=True,
+		related_name='ordenes_archivadas',
+		verbose_name="Técnico Asignado"
+	)
+	plan_mantencion = models.ForeignKey(
+		PlanMantencion, 
+		on_delete=models.SET_NULL, 
+		null=True, 
+		blank=True,
+		related_name='ordenes_archivadas',
+		verbose_name="Plan de Mantención Asociado"
+	)
+	codigo = models.CharField(max_length=50, verbose_name="Código de Orden")
+	descripcion = models.TextField(verbose_name="Descripción del Trabajo")
+	# Se copia desde la orden original, por eso no usa auto_now_add
+	fecha_solicitud = models.DateTimeField(verbose_name="Fecha de Solicitud")
+	fecha_programada = models.DateField(verbose_name="Fecha Programada")
+	fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Inicio Real")
+	fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Fin Real")
+	estado = models.CharField(
+		max_length=3, 
+		choices=OrdenTrabajo.ESTADO_CHOICES, 
+		default='FIN',
+		verbose_name="Estado"
+	)
+	prioridad = models.CharField(
+		max_length=3, 
+		choices=OrdenTrabajo.PRIORIDAD_CHOICES, 
+		default='MED',
+		verbose_name="Prioridad"
+	)
+	observaciones = models.TextField(blank=True, verbose_name="Observaciones")
+	costo_estimado = models.DecimalField(
+		max_digits=10, 
+		decimal_places=2, 
+		default=0.00,
+		verbose_name="Costo Estimado"
+	)
+	costo_real = models.DecimalField(
+		max_digits=10, 
+		decimal_places=2, 
+		null=True, 
+		blank=True,
+		verbose_name="Costo Real"
+	)
+
+	objects = EmpresaManager()
+
+	class Meta:
+		verbose_name = "Orden de Trabajo Archivada"
+		verbose_name_plural = "Órdenes de Trabajo Archivadas"
+		ordering = ['-fecha_solicitud']
+		constraints = [
+			models.UniqueConstraint(fields=['empresa', 'codigo'], name='archivada_codigo_por_empresa'),
+		]
+		indexes = [
+			models.Index(fields=['empresa', 'fecha_solicitud'], name='archivada_fecha_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.codigo} - {self.equipo.codigo} ({self.estado}, archivada)"
+
+
+class Tarea(models.Model):
+	"""Modelo para tareas pesadas ejecutadas en segundo plano por el worker local."""
+	ESTADO_CHOICES = [
+		('PEN', 'Pendiente'),
+		('EJE', 'En Ejecución'),
+		('FIN', 'Finalizada'),
+		('ERR', 'Fallida'),
+	]
+
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.PROTECT, 
+		default=empresa_actual_id,
+		related_name='tareas',
+		verbose_name="Empresa"
+	)
+	tipo = models.CharField(max_length=50, verbose_name="Tipo de Tarea")
+	parametros = models.JSONField(default=dict, blank=True, verbose_name="Parámetros")
+	estado = models.CharField(
+		max_length=3, 
+		choices=ESTADO_CHOICES, 
+		default='PEN',
+		verbose_name="Estado"
+	)
+	progreso = models.PositiveSmallIntegerField(default=0, verbose_name="Progreso (%)")
+	resultado = models.JSONField(null=True, blank=True, verbose_name="Resultado")
+	error = models.TextField(blank=True, verbose_name="Último Error")
+	intentos = models.PositiveSmallIntegerField(default=0, verbose_name="Intentos Realizados")
+	max_intentos = models.PositiveSmallIntegerField(default=3, verbose_name="Máximo de Intentos")
+	creado_por = models.ForeignKey(
+		User, 
+		on_delete=models.SET_NULL, 
+		null=True, 
+		blank=True,
+		related_name='tareas',
+		verbose_name="Creada por"
+	)
+	fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+	disponible_desde = models.DateTimeField(verbose_name="Disponible Desde")
+	fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Inicio")
+	# Lo renueva el worker al reportar progreso; si vence, otro worker retoma la tarea
+	fecha_latido = models.DateTimeField(null=True, blank=True, verbose_name="Último Latido")
+	fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Fin")
+
+	objects = EmpresaManager()
+
+	class Meta:
+		verbose_name = "Tarea"
+		verbose_name_plural = "Tareas"
+		ordering = ['-fecha_creacion']
+		indexes = [
+			# El worker busca siempre tareas pendientes ya disponibles
+			models.Index(fields=['estado', 'disponible_desde'], name='tarea_pendiente_idx'),
+			models.Index(fields=['empresa', 'fecha_creacion'], name='tarea_empresa_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.tipo} #{self.pk} ({self.estado})"
+
+
+class ClaveIdempotencia(models.Model):
+	"""
+	Modelo para las claves Idempotency-Key de las peticiones de escritura.
+	Guarda la respuesta de la primera petición para devolverla en los reintentos.
+	"""
+	ESTADO_CHOICES = [
+		('PRO', 'En Proceso'),
+		('FIN', 'Completada'),
+	]
+
+	clave = models.CharField(max_length=255, verbose_name="Clave")
+	usuario = models.ForeignKey(
+		User, 
+		on_delete=models.CASCADE, 
+		related_name='claves_idempotencia',
+		verbose_name="Usuario"
+	)
+	huella = models.CharField(max_length=64, verbose_name="Huella de la Petición")
+	estado = models.CharField(
+		max_length=3, 
+		choices=ESTADO_CHOICES, 
+		default='PRO',
+		verbose_name="Estado"
+	)
+	codigo_respuesta = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Código HTTP")
+	cuerpo_respuesta = models.TextField(blank=True, verbose_name="Cuerpo de la Respuesta")
+	fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+	expira = models.DateTimeField(db_index=True, verbose_name="Fecha de Expiración")
+
+	class Meta:
+		verbose_name = "Clave de Idempotencia"
+		verbose_name_plural = "Claves de Idempotencia"
+		constraints = [
+			models.UniqueConstraint(fields=['usuario', 'clave'], name='clave_idempotencia_unica'),
+		]
+
+	def __str__(self):
+		return f"{self.clave} ({self.estado})"
+
+
+class Secuencia(models.Model):
+	"""
+	Modelo para las secuencias numéricas de los códigos generados por el servidor.
+	Cada prefijo (por ejemplo 'OT-2026-') tiene su propia secuencia.
+	"""
+	nombre = models.CharField(max_length=100, unique=True, verbose_name="Nombre")
+	siguiente = models.PositiveBigIntegerField(default=1, verbose_name="Siguiente Número Libre")
+
+	class Meta:
+		verbose_name = "Secuencia"
+		verbose_name_plural = "Secuencias"
+		ordering = ['nombre']
+
+	def __str__(self):
+		return f"{self.nombre} ({self.siguiente})"
+
+
+class RegistroAuditoria(models.Model):
+	"""
+	Modelo para el registro de auditoría de los modelos del dominio.
+	Cada fila guarda solo los campos que cambiaron; las filas no se modifican ni se eliminan.
+	"""
+	ACCION_CHOICES = [
+		('C', 'Creación'),
+		('M', 'Modificación'),
+		('E', 'Eliminación'),
+	]
+
+	# Sin restricción de clave foránea, igual que usuario: el historial no se altera
+	empresa = models.ForeignKey(
+		Empresa, 
+		on_delete=models.DO_NOTHING, 
+		default=empresa_actual_id,
+		db_constraint=False,
+		related_name='registros_auditoria',
+		verbose_name="Empresa"
+	)
+	modelo = models.CharField(max_length=30, verbose_name="Modelo")
+	objeto_id = models.PositiveBigIntegerField(verbose_name="ID del Objeto")
+	accion = models.CharField(max_length=1, choices=ACCION_CHOICES, verbose_name="Acción")
+	# {campo: [valor anterior, valor nuevo]}
+	cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Cambios")
+	# Sin restricción de clave foránea: eliminar el usuario no debe alterar el historial
+	usuario = models.ForeignKey(
+		User, 
+		on_delete=models.DO_NOTHING, 
+		null=True, 
+		blank=True,
+		db_constraint=False,
+		related_name='registros_auditoria',
+		verbose_name="Usuario"
+	)
+	fecha = models.DateTimeField(verbose_name="Fecha del Cambio")
+
+	objects = EmpresaManager()
+
+	class Meta:
+		verbose_name = "Registro de Auditoría"
+		verbose_name_plural = "Registros de Auditoría"
+		ordering = ['-fecha', '-id']
+		indexes = [
+			models.Index(fields=['empresa', 'modelo', 'objeto_id', 'fecha'], name='auditoria_objeto_idx'),
+			models.Index(fields=['empresa', 'fecha'], name='auditoria_fecha_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.modelo} {self.objeto_id} - {self.get_accion_display()}"
+
+	def save(self, *args, **kwargs):
+		if not self._state.adding:
+			raise ValueError("Los registros de auditoría no se pueden modificar.")
+		super().save(*args, **kwargs)
+
+	def delete(self, *args, **kwargs):
+		raise ValueError("Los registros de auditoría no se pueden eliminar.")
@@ -0,0 +1,295 @@
+"""
+Presupuestos de consultas y tiempo por endpoint.
+
+Cada acción de los ViewSets declara en ``presupuesto`` cuántas consultas SQL
+y cuántos milisegundos puede usar (``{'list': (5, 300), ...}``); cada
+ModelAdmin hace lo mismo con sus páginas (``changelist``, ``change``, ``add``,
+``delete``, ``history``). El resto de las vistas usa ``PRESUPUESTO_POR_DEFECTO``.
+
+``PresupuestoMiddleware`` mide cada petición con un execute_wrapper sobre las
+conexiones, tanto bajo WSGI como bajo ASGI (en el hilo donde corren las
+consultas de la petición). Si la petición excede su presupuesto, o repite la misma consulta
+más de ``PRESUPUESTO_REPETICIONES`` veces (el síntoma típico de un N+1), se
+registra una advertencia con las consultas y el lugar del código que las
+ejecutó. En modo estricto (``PRESUPUESTO_ESTRICTO``, pensado para CI) se
+lanza PresupuestoExcedido, lo que hace fallar el test o la petición.
+
+En los tests, ``@verificar_presupuesto`` activa la medición en modo estricto
+dentro del test (aunque DEBUG sea False) y puede además acotar el total del
+bloque. Con ``PRESUPUESTO_PERFILES`` y el encabezado ``X-Perfil`` se guarda un
+perfil cProfile (``.prof``, legible por snakeviz o flameprof) de la petición.
+"""
+import cProfile
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter, namedtuple
+from contextlib import ContextDecorator, ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+Presupuesto = namedtuple('Presupuesto', ['consultas', 'ms'])
+
+# Presupuestos base (consultas, ms) de las acciones de un ViewSet. Incluyen la
+# sesión o el token, la empresa activa, la idempotencia y la auditoría
+PRESUPUESTO_LECTURA = {
+	'list': (8, 400),
+	'retrieve': (8, 200),
+}
+
+PRESUPUESTO_CRUD = {
+	**PRESUPUESTO_LECTURA,
+	'create': (12, 300),
+	'update': (14, 300),
+	'partial_update': (14, 300),
+	'destroy': (14, 300),
+	'historial': (8, 200),
+}
+
+# Presupuestos de las páginas de un ModelAdmin
+PRESUPUESTO_ADMIN = {
+	'changelist': (12, 600),
+	'add': (10, 500),
+	'change': (12, 500),
+	'delete': (20, 500),
+	'history': (8, 300),
+}
+
+# Sentencias de control de transacción: no son trabajo de la vista
+CONTROL_TRANSACCION = re.compile(r'^\s*(BEGIN|SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+ESTE_ARCHIVO = __file__.rsplit('.', 1)[0]
+DJANGO_DB = os.path.join('django', 'db', '')
+
+_forzado = ContextVar('presupuesto_forzado', default=None)
+
+
+class PresupuestoExcedido(AssertionError):
+	"""Una petición excedió su presupuesto en modo estricto."""
+
+
+def configuracion():
+	"""(activo, estricto) según los settings, o lo que fuerce @verificar_presupuesto."""
+	forzado = _forzado.get()
+	if forzado is not None:
+		return True, forzado
+	activo = getattr(settings, 'PRESUPUESTO_ACTIVO', None)
+	if activo is None:
+		# El runner de tests desactiva DEBUG: ahí solo mide @verificar_presupuesto o el modo CI
+		activo = settings.DEBUG
+	return activo, getattr(settings, 'PRESUPUESTO_ESTRICTO', False)
+
+
+def pila():
+	"""
+	Marcos que llevaron a la consulta: los últimos del proyecto y los más
+	internos fuera del ORM (por ejemplo, el campo del serializer que la pidió).
+	"""
+	base = str(settings.BASE_DIR)
+	marcos = [
+		marco for marco in traceback.extract_stack()[:-2]
+		if not marco.filename.startswith(ESTE_ARCHIVO) and DJANGO_DB not in marco.filename
+	]
+	proyecto = [marco for marco in marcos if marco.filename.startswith(base) and 'site-packages' not in marco.filename]
+	seleccion = [marco for marco in marcos if marco in proyecto[-3:] or marco in marcos[-5:]]
+	return ''.join(traceback.format_list(seleccion))
+
+
+class Medicion:
+	"""
+	Context manager que cuenta las consultas de todas las conexiones, su
+	tiempo y el tiempo total del bloque. Guarda la pila de las primeras
+	ejecuciones de cada consulta distinta para señalar las repetidas.
+	"""
+
+	def __init__(self, perfil=False):
+		self.consultas = []
+		self.repeticiones = Counter()
+		self.pilas = {}
+		self.ms = 0.0
+		self.perfil = cProfile.Profile() if perfil else None
+
+	def __call__(self, execute, sql, params, many, context):
+		if CONTROL_TRANSACCION.match(sql):
+			return execute(sql, params, many, context)
+		inicio = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			ms = (time.perf_counter() - inicio) * 1000
+			self.consultas.append((sql, ms))
+			self.repeticiones[sql] += 1
+			if self.repeticiones[sql] <= 2:
+				self.pilas.setdefault(sql, []).append(pila())
+
+	def __enter__(self):
+		self._pila = ExitStack()
+		for conexion in connections.all():
+			self._pila.enter_context(conexion.execute_wrapper(self))
+		self._inicio = time.perf_counter()
+		if self.perfil is not None:
+			self.perfil.enable()
+		return self
+
+	def __exit__(self, *exc):
+		if self.perfil is not None:
+			self.perfil.disable()
+		self.ms = (time.perf_counter() - self._inicio) * 1000
+		self._pila.close()
+		return False
+
+	def repetidas(self, maximo):
+		return {sql: n for sql, n in self.repeticiones.items() if n > maximo}
+
+	def problemas(self, presupuesto):
+		"""Lista de descripciones de lo que excede el presupuesto (vacía si cumple)."""
+		problemas = []
+		factor = getattr(settings, 'PRESUPUESTO_FACTOR_MS', 1)
+		if presupuesto.consultas is not None and len(self.consultas) > presupuesto.consultas:
+			problemas.append(f'{len(self.consultas)} consultas (presupuesto {presupuesto.consultas})')
+		if presupuesto.ms is not None and self.ms > presupuesto.ms * factor:
+			problemas.append(f'{self.ms:.0f} ms (presupuesto {presupuesto.ms * factor:.0f} ms)')
+		maximo = getattr(settings, 'PRESUPUESTO_REPETICIONES', 3)
+		for sql, n in self.repetidas(maximo).items():
+			problemas.append(f'consulta repetida {n} veces: {sql[:200]}')
+		return problemas
+
+	def detalle(self):
+		"""Consultas ejecutadas y la pila de las repetidas, para el log."""
+		lineas = [f'  {ms:7.2f} ms  {sql[:300]}' for sql, ms in self.consultas]
+		maximo = getattr(settings, 'PRESUPUESTO_REPETICIONES', 3)
+		for sql in self.repetidas(maximo):
+			lineas.append(f'Repetida {self.repeticiones[sql]} veces: {sql[:300]}')
+			lineas.extend(self.pilas[sql][:1])
+		return '\n'.join(lineas)
+
+	def guardar_perfil(self, nombre):
+		"""Escribe el perfil en PRESUPUESTO_PERFILES. Retorna la ruta, o None."""
+		directorio = getattr(settings, 'PRESUPUESTO_PERFILES', None)
+		if self.perfil is None or not directorio:
+			return None
+		Path(directorio).mkdir(parents=True, exist_ok=True)
+		ruta = Path(directorio) / f'{re.sub(r"[^A-Za-z0-9_.-]", "_", nombre)}-{time.time_ns()}.prof'
+		self.perfil.dump_stats(ruta)
+		return ruta
+
+
+def presupuesto_de(request):
+	"""
+	(nombre, Presupuesto) de la vista que atendió la petición: la acción del
+	ViewSet, la página del ModelAdmin, o el presupuesto por defecto.
+	"""
+	por_defecto = Presupuesto(*getattr(settings, 'PRESUPUESTO_POR_DEFECTO', (20, 1000)))
+	match = getattr(request, 'resolver_match', None)
+	if match is None:
+		return request.path, por_defecto
+	vista = match.func
+	clase = getattr(vista, 'cls', None)
+	acciones = getattr(vista, 'actions', None)
+	if clase is not None and acciones:
+		accion = acciones.get(request.method.lower(), request.method.lower())
+		declarado = getattr(clase, 'presupuesto', {}).get(accion)
+		return f'{clase.__name__}.{accion}', Presupuesto(*declarado) if declarado else por_defecto
+	model_admin = getattr(vista, 'model_admin', None)
+	if model_admin is not None:
+		pagina = (match.url_name or '').rsplit('_', 1)[-1]
+		declarado = getattr(model_admin, 'presupuesto', {}).get(pagina)
+		return f'{type(model_admin).__name__}.{pagina}', Presupuesto(*declarado) if declarado else por_defecto
+	return match.view_name or request.path, por_defecto
+
+
+def informar(nombre, medicion, problemas, estricto):
+	"""Registra los problemas con el detalle de las consultas; en modo estricto además falla."""
+	if not problemas:
+		return
+	mensaje = f'{nombre} excedió su presupuesto: ' + '; '.join(problemas)
+	logger.warning('%s\n%s', mensaje, medicion.detalle())
+	if estricto:
+		raise PresupuestoExcedido(f'{mensaje}\n{medicion.detalle()}')
+
+
+class PresupuestoMiddleware:
+	"""Mide las consultas y el tiempo de cada petición y los compara con su presupuesto."""
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		activo, estricto = configuracion()
+		if not activo:
+			return self.get_response(request)
+		with Medicion(perfil=self.con_perfil(request)) as medicion:
+			response = self.get_response(request)
+		return self.evaluar(request, response, medicion, estricto)
+
+	async def __acall__(self, request):
+		activo, estricto = configuracion()
+		if not activo:
+			return await self.get_response(request)
+		# Bajo ASGI las vistas síncronas y el ORM corren en el hilo de
+		# sync_to_async de la petición (thread_sensitive), no en el del event
+		# loop: la medición se instala y se retira en ese hilo
+		medicion = Medicion(perfil=self.con_perfil(request))
+		await sync_to_async(medicion.__enter__)()
+		try:
+			response = await self.get_response(request)
+		finally:
+			await sync_to_async(medicion.__exit__)(None, None, None)
+		return self.evaluar(request, response, medicion, estricto)
+
+	def con_perfil(self, request):
+		return bool(getattr(settings, 'PRESUPUESTO_PERFILES', None) and request.headers.get('X-Perfil'))
+
+	def evaluar(self, request, response, medicion, estricto):
+		"""Agrega los encabezados de la medición y la compara con el presupuesto de la vista."""
+		if isinstance(response, StreamingHttpResponse):
+			# El cuerpo se genera después de salir de la vista: no hay nada que medir
+			return response
+		nombre, presupuesto = presupuesto_de(request)
+		ruta = medicion.guardar_perfil(nombre)
+		if ruta is not None:
+			response['X-Perfil'] = ruta.name
+		response['X-Consultas'] = str(len(medicion.consultas))
+		informar(nombre, medicion, medicion.problemas(presupuesto), estricto)
+		return response
+
+
+class verificar_presupuesto(ContextDecorator):
+	"""
+	Decorador (o context manager) para tests: dentro del bloque cada petición
+	se compara con el presupuesto de su vista en modo estricto. Con
+	``consultas`` o ``ms`` además se acota el total del bloque, que puede
+	perfilarse con ``perfil`` (nombre del archivo en PRESUPUESTO_PERFILES).
+	"""
+
+	def __init__(self, consultas=None, ms=None, perfil=None):
+		self.presupuesto = Presupuesto(consultas, ms)
+		self.perfil = perfil
+
+	def __enter__(self):
+		self._token = _forzado.set(True)
+		self.medicion = Medicion(perfil=bool(self.perfil)).__enter__()
+		return self.medicion
+
+	def __exit__(self, tipo, *exc):
+		self.medicion.__exit__(tipo, *exc)
+		_forzado.reset(self._token)
+		if self.perfil:
+			self.medicion.guardar_perfil(self.perfil)
+		if tipo is None and (self.presupuesto.consultas is not None or self.presupuesto.ms is not None):
+			informar('bloque verificado', self.medicion, self.medicion.problemas(self.presupuesto), True)
+		return False
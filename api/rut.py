@@ -0,0 +1,45 @@
+"""
+Utilidades para el RUT chileno.
+
+Un mismo RUT puede escribirse como ``11.111.111-1``, ``11111111-1`` o
+``111111111``. Estas funciones lo reducen a su número entero y dígito
+verificador, que es lo que se indexa en la base de datos.
+"""
+
+
+def calcular_dv(numero):
+	"""Calcula el dígito verificador (módulo 11) de un número de RUT."""
+	suma = 0
+	factor = 2
+	while numero:
+		numero, digito = divmod(numero, 10)
+		suma += digito * factor
+		factor = 2 if factor == 7 else factor + 1
+	resto = 11 - suma % 11
+	if resto == 11:
+		return '0'
+	if resto == 10:
+		return 'K'
+	return str(resto)
+
+
+def separar_rut(valor):
+	"""
+	Separa un RUT en (número, dígito verificador) ignorando puntos, guiones y
+	espacios. Lanza ValueError si el formato o el dígito verificador no son válidos.
+	"""
+	limpio = str(valor).replace('.', '').replace('-', '').replace(' ', '').upper()
+	if len(limpio) < 2 or not limpio[:-1].isdigit():
+		raise ValueError('Formato de RUT inválido.')
+	numero, dv = int(limpio[:-1]), limpio[-1]
+	if numero == 0 or dv != calcular_dv(numero):
+		raise ValueError('Dígito verificador de RUT inválido.')
+	return numero, dv
+
+
+def rut_a_numero(valor):
+	"""Retorna el número de un RUT válido, o None si no es válido."""
+	try:
+		return separar_rut(valor)[0]
+	except ValueError:
+		return None
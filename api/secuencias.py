@@ -0,0 +1,69 @@
+"""
+Generación de códigos en el servidor con secuencias reservadas por bloques.
+
+Cada proceso reserva un bloque de números de una secuencia en una sola
+transacción (un UPDATE siguiente = siguiente + N) y luego los entrega desde
+memoria, sin volver a la base de datos hasta agotarlo. Como el UPDATE es
+atómico, dos procesos nunca reciben números del mismo bloque. Los números de
+un bloque no usado se pierden al reiniciar el proceso, así que los códigos
+pueden tener huecos pero nunca repetirse.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Secuencia
+
+FORMATOS_POR_DEFECTO = {
+	'orden': {'prefijo': 'OT-{anio}-', 'digitos': 6},
+	'equipo': {'prefijo': 'EQ-{cliente}-', 'digitos': 5},
+}
+
+_bloques = {}
+_lock = threading.Lock()
+
+
+def reservar_bloque(nombre, tamanio):
+	"""Reserva ``tamanio`` números de la secuencia y retorna el primero."""
+	with transaction.atomic():
+		secuencia = Secuencia.objects.filter(nombre=nombre)
+		if not secuencia.update(siguiente=F('siguiente') + tamanio):
+			# Primera reserva de este prefijo
+			Secuencia.objects.get_or_create(nombre=nombre)
+			secuencia.update(siguiente=F('siguiente') + tamanio)
+		siguiente = secuencia.values_list('siguiente', flat=True).get()
+	return siguiente - tamanio
+
+
+def siguiente_numero(nombre):
+	"""Entrega el siguiente número de la secuencia desde el bloque reservado en memoria."""
+	if transaction.get_connection().in_atomic_block:
+		# Dentro de otra transacción la reserva se confirmaría (o desharía) junto
+		# con ella, así que no se guarda un bloque en memoria: se toma un solo número
+		return reservar_bloque(nombre, 1)
+
+	with _lock:
+		bloque = _bloques.get(nombre)
+		# Un bloque heredado al forkear pertenece al proceso padre
+		if bloque is None or bloque['pid'] != os.getpid() or bloque['actual'] >= bloque['limite']:
+			tamanio = getattr(settings, 'SECUENCIA_BLOQUE', 50)
+			inicio = reservar_bloque(nombre, tamanio)
+			bloque = {'pid': os.getpid(), 'actual': inicio, 'limite': inicio + tamanio}
+			_bloques[nombre] = bloque
+		numero = bloque['actual']
+		bloque['actual'] += 1
+	return numero
+
+
+def generar_codigo(tipo, **contexto):
+	"""
+	Genera un código nuevo para ``tipo`` ('orden' o 'equipo') según CODIGOS_FORMATO.
+	El prefijo admite {anio} y {cliente}, y cada prefijo distinto usa su propia secuencia.
+	"""
+	formato = {**FORMATOS_POR_DEFECTO, **getattr(settings, 'CODIGOS_FORMATO', {})}[tipo]
+	prefijo = formato['prefijo'].format(anio=timezone.now().year, **contexto)
+	return f"{prefijo}{siguiente_numero(prefijo):0{formato['digitos']}d}"
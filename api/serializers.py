@@ -1,28 +1,129 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo
+from django.db import IntegrityError, transaction
+from .empresas import empresa_por_defecto_id
+from .models import Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo, OrdenTrabajoArchivada, RegistroAuditoria, Tarea
+from .rut import separar_rut
+from .secuencias import generar_codigo
+from .throttling import CLAIM_CLIENTE
+
+
+def validar_rut(serializer, value):
+    """
+    Valida el dígito verificador y detecta RUT duplicados aunque estén
+    escritos con otro formato. Retorna el RUT en formato NNNNNNNN-D.
+    """
+    try:
+        numero, dv = separar_rut(value)
+    except ValueError as exc:
+        raise serializers.ValidationError(str(exc))
+
+    duplicados = serializer.Meta.model.objects.filter(rut_numero=numero)
+    if serializer.instance is not None:
+        duplicados = duplicados.exclude(pk=serializer.instance.pk)
+    if duplicados.exists():
+        raise serializers.ValidationError('Ya existe un registro con este RUT.')
+    return f'{numero}-{dv}'
+
+
+def validar_unico(serializer, campo, value, archivo=None):
+    """
+    Valida que el valor no se repita dentro de la empresa activa: la
+    restricción única es por empresa, así que el manager ya acota la consulta.
+    Con ``archivo`` también se revisa la tabla de archivo del modelo.
+    """
+    duplicados = serializer.Meta.model.objects.filter(**{campo: value})
+    if serializer.instance is not None:
+        duplicados = duplicados.exclude(pk=serializer.instance.pk)
+    if duplicados.exists():
+        raise serializers.ValidationError(f'Ya existe un registro con este {campo}.')
+    if archivo is not None and archivo.objects.filter(**{campo: value}).exists():
+        raise serializers.ValidationError(f'Ya existe un registro archivado con este {campo}.')
+    return value
+
+
+def validar_coordenadas(serializer, data):
+    """Exige que latitud y longitud se informen juntas."""
+    instancia = serializer.instance
+    latitud = data.get('latitud', getattr(instancia, 'latitud', None))
+    longitud = data.get('longitud', getattr(instancia, 'longitud', None))
+    if (latitud is None) != (longitud is None):
+        raise serializers.ValidationError('Latitud y longitud deben informarse juntas.')
+    return data
 
 
 class ClienteSerializer(serializers.ModelSerializer):
     """Serializer para el modelo Cliente."""
     class Meta:
         model = Cliente
-        fields = ['id', 'rut', 'razon_social', 'giro', 'direccion', 'telefono', 'email', 'fecha_registro', 'activo']
+        fields = [
+            'id', 'rut', 'razon_social', 'giro', 'direccion', 'latitud', 'longitud',
+            'telefono', 'email', 'fecha_registro', 'activo'
+        ]
         read_only_fields = ['id', 'fecha_registro']
 
+    def validate_rut(self, value):
+        return validar_rut(self, value)
 
-class EquipoSerializer(serializers.ModelSerializer):
+    def validate(self, data):
+        return validar_coordenadas(self, data)
+
+
+class CodigoGeneradoMixin:
+    """
+    Genera el código en el servidor cuando el cliente no lo envía.
+    Si el código generado choca con uno ingresado a mano, se toma el siguiente.
+    """
+    tipo_codigo = None
+    intentos_codigo = 5
+
+    def contexto_codigo(self, validated_data):
+        return {}
+
+    def create(self, validated_data):
+        if validated_data.get('codigo'):
+            return super().create(validated_data)
+        for intento in range(self.intentos_codigo):
+            validated_data['codigo'] = generar_codigo(self.tipo_codigo, **self.contexto_codigo(validated_data))
+            try:
+                with transaction.atomic():
+                    return super().create(validated_data)
+            except IntegrityError:
+                if intento == self.intentos_codigo - 1:
+                    raise
+
+
+class EquipoSerializer(CodigoGeneradoMixin, serializers.ModelSerializer):
     """Serializer para el modelo Equipo."""
     cliente_nombre = serializers.CharField(source='cliente.razon_social', read_only=True)
+    # Solo presente al filtrar con ?cerca=
+    distancia_km = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Equipo
         fields = [
             'id', 'cliente', 'cliente_nombre', 'codigo', 'nombre', 'tipo', 
             'marca', 'modelo', 'numero_serie', 'fecha_instalacion', 
-            'ubicacion', 'ficha_tecnica', 'activo'
+            'ubicacion', 'latitud', 'longitud', 'distancia_km', 'ficha_tecnica', 'activo'
         ]
         read_only_fields = ['id']
+        extra_kwargs = {'codigo': {'required': False}}
+
+    tipo_codigo = 'equipo'
+
+    def validate_codigo(self, value):
+        return validar_unico(self, 'codigo', value) if value else value
+
+    def validate_numero_serie(self, value):
+        return validar_unico(self, 'numero_serie', value)
+
+    def validate(self, data):
+        return validar_coordenadas(self, data)
+
+    def contexto_codigo(self, validated_data):
+        return {'cliente': validated_data['cliente'].pk}
 
 
 class TecnicoSerializer(serializers.ModelSerializer):
@@ -38,6 +139,9 @@ class TecnicoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
 
+    def validate_rut(self, value):
+        return validar_rut(self, value)
+
 
 class PlanMantencionSerializer(serializers.ModelSerializer):
     """Serializer para el modelo PlanMantencion."""
@@ -52,11 +156,13 @@ class PlanMantencionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class OrdenTrabajoSerializer(serializers.ModelSerializer):
+class OrdenTrabajoSerializer(CodigoGeneradoMixin, serializers.ModelSerializer):
     """Serializer para el modelo OrdenTrabajo."""
     equipo_codigo = serializers.CharField(source='equipo.codigo', read_only=True)
     tecnico_nombre = serializers.CharField(source='tecnico.usuario.get_full_name', read_only=True)
     plan_nombre = serializers.CharField(source='plan_mantencion.nombre', read_only=True)
+    # Solo presente al filtrar con ?cerca=
+    distancia_km = serializers.FloatField(read_only=True)
     
     class Meta:
         model = OrdenTrabajo
@@ -64,9 +170,17 @@ class OrdenTrabajoSerializer(serializers.ModelSerializer):
             'id', 'equipo', 'equipo_codigo', 'tecnico', 'tecnico_nombre', 
             'plan_mantencion', 'plan_nombre', 'codigo', 'descripcion', 
             'fecha_solicitud', 'fecha_programada', 'fecha_inicio', 'fecha_fin', 
-            'estado', 'prioridad', 'observaciones', 'costo_estimado', 'costo_real'
+            'estado', 'prioridad', 'observaciones', 'costo_estimado', 'costo_real',
+            'distancia_km'
         ]
         read_only_fields = ['id', 'fecha_solicitud']
+        extra_kwargs = {'codigo': {'required': False}}
+
+    tipo_codigo = 'orden'
+
+    def validate_codigo(self, value):
+        # Al archivar la orden conserva su código: no puede repetirse en ninguna de las dos tablas
+        return validar_unico(self, 'codigo', value, archivo=OrdenTrabajoArchivada) if value else value
 
     def validate(self, data):
         
@@ -101,3 +215,59 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id']
+
+
+class TareaSerializer(serializers.ModelSerializer):
+    """Serializer para consultar el estado de una tarea en segundo plano."""
+    class Meta:
+        model = Tarea
+        fields = [
+            'id', 'tipo', 'parametros', 'estado', 'progreso', 'resultado', 'error',
+            'intentos', 'max_intentos', 'fecha_creacion', 'fecha_inicio', 'fecha_fin'
+        ]
+        read_only_fields = fields
+
+
+class RegistroAuditoriaSerializer(serializers.ModelSerializer):
+    """Serializer para consultar el registro de auditoría."""
+    class Meta:
+        model = RegistroAuditoria
+        fields = ['id', 'modelo', 'objeto_id', 'accion', 'cambios', 'usuario', 'fecha']
+        read_only_fields = fields
+
+
+class TokenEmpresaSerializer(TokenObtainPairSerializer):
+    """
+    Obtiene el par de tokens JWT con la empresa del usuario en un claim.
+    Con ``empresa`` (slug) elige una de sus empresas; si no, se usa la primera.
+    Con ``client_id`` el token identifica a la integración que lo usa, que
+    comparte un límite de tasa entre todos sus usuarios.
+    """
+    empresa = serializers.SlugField(required=False, write_only=True)
+    client_id = serializers.SlugField(required=False, write_only=True, max_length=100)
+
+    def validate(self, attrs):
+        slug = attrs.pop('empresa', None)
+        cliente = attrs.pop('client_id', None)
+        data = super().validate(attrs)
+        empresas = self.user.empresas.filter(activo=True).order_by('pk')
+        if slug:
+            empresa = empresas.filter(slug=slug).values_list('pk', flat=True).first()
+            if empresa is None:
+                raise serializers.ValidationError({'empresa': 'El usuario no pertenece a esta empresa.'})
+        else:
+            empresa = empresas.values_list('pk', flat=True).first()
+            if empresa is None:
+                # La empresa por defecto es solo para usuarios que no pertenecen a ninguna
+                if self.user.empresas.exists():
+                    raise serializers.ValidationError({'empresa': 'Las empresas del usuario están inactivas.'})
+                empresa = empresa_por_defecto_id()
+
+        refresh = self.get_token(self.user)
+        refresh[getattr(settings, 'EMPRESA_CLAIM', 'empresa')] = empresa
+        if cliente:
+            refresh[CLAIM_CLIENTE] = cliente
+        data['refresh'] = str(refresh)
+        data['access'] = str(refresh.access_token)
+        data['empresa'] = empresa
+        return data
@@ -0,0 +1,216 @@
+"""
+Cola de tareas en segundo plano respaldada por la base de datos.
+
+Las vistas encolan tareas con ``encolar`` y responden de inmediato; el comando
+``manage.py procesar_tareas`` las toma y ejecuta en un pool de procesos, con
+reintentos y reporte de progreso consultable en ``/api/jobs/{id}/``.
+No requiere un broker externo.
+"""
+import csv
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import auditoria
+from .empresas import usar_empresa
+from .models import OrdenTrabajo, Tarea
+
+# Tipo de tarea -> función que la ejecuta
+REGISTRO = {}
+
+ABANDONADA = 'El worker que ejecutaba la tarea se detuvo sin terminarla.'
+
+
+def registrar(tipo):
+	"""Decorador para registrar la función que ejecuta un tipo de tarea."""
+	def decorador(funcion):
+		REGISTRO[tipo] = funcion
+		return funcion
+	return decorador
+
+
+def encolar(tipo, parametros=None, usuario=None):
+	"""Crea una tarea pendiente y la retorna."""
+	if tipo not in REGISTRO:
+		raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+	return Tarea.objects.create(
+		tipo=tipo,
+		parametros=parametros or {},
+		creado_por=usuario if usuario and usuario.is_authenticated else None,
+		max_intentos=getattr(settings, 'TAREAS_MAX_INTENTOS', 3),
+		disponible_desde=timezone.now(),
+	)
+
+
+class ReservaPerdida(Exception):
+	"""Otro worker retomó la tarea porque su reserva venció."""
+
+
+def disponibles(ahora):
+	"""
+	Condición de las tareas que un worker puede tomar: las pendientes ya
+	disponibles y las en ejecución sin latido hace más de TAREAS_LEASE_SEGUNDOS,
+	cuyo worker se detuvo (proceso terminado, pool roto) sin cerrarlas.
+	"""
+	vencimiento = ahora - timedelta(seconds=getattr(settings, 'TAREAS_LEASE_SEGUNDOS', 3600))
+	return (
+		Q(estado='PEN', disponible_desde__lte=ahora)
+		| Q(estado='EJE', fecha_latido__lt=vencimiento)
+		| Q(estado='EJE', fecha_latido__isnull=True, fecha_inicio__lt=vencimiento)
+	)
+
+
+def reservada(tarea):
+	"""
+	Queryset de la tarea mientras siga reservada por quien la cargó: cada
+	reserva incrementa ``intentos``, así que otro worker que la retome la cambia.
+	"""
+	return Tarea.objects.filter(pk=tarea.pk, estado='EJE', intentos=tarea.intentos)
+
+
+def tomar_siguiente():
+	"""
+	Reserva la siguiente tarea pendiente (o abandonada) y retorna su id (o None).
+	La reserva es un UPDATE condicionado al estado, por lo que dos workers
+	nunca toman la misma tarea aunque compitan por ella.
+	"""
+	ahora = timezone.now()
+	candidatas = Tarea.objects.filter(disponibles(ahora)).order_by(
+		'disponible_desde', 'pk'
+	).values_list('pk', flat=True)[:10]
+	for tarea_id in candidatas:
+		tomada = Tarea.objects.filter(disponibles(ahora), pk=tarea_id).update(
+			estado='EJE', fecha_inicio=ahora, fecha_latido=ahora, intentos=F('intentos') + 1
+		)
+		if tomada:
+			return tarea_id
+	return None
+
+
+def liberar(tarea_ids):
+	"""Devuelve a la cola las tareas en ejecución de un worker que se detuvo."""
+	return Tarea.objects.filter(pk__in=tarea_ids, estado='EJE').update(
+		estado='PEN', disponible_desde=timezone.now(), error=ABANDONADA
+	)
+
+
+def reportar_progreso(tarea, progreso):
+	"""
+	Actualiza el progreso (0-100) de una tarea en ejecución y renueva su
+	reserva. Si otro worker ya la retomó lanza ReservaPerdida para detenerla.
+	"""
+	tarea.progreso = max(0, min(100, int(progreso)))
+	if not reservada(tarea).update(progreso=tarea.progreso, fecha_latido=timezone.now()):
+		raise ReservaPerdida(f'La tarea {tarea.pk} fue retomada por otro worker.')
+
+
+def cerrar(tarea, **campos):
+	"""
+	Guarda el estado final de la tarea solo si sigue reservada por este
+	worker, para no pisar el de quien la retomó. Retorna el estado vigente.
+	"""
+	if reservada(tarea).update(**campos):
+		return campos['estado']
+	return Tarea.objects.values_list('estado', flat=True).get(pk=tarea.pk)
+
+
+def ejecutar_tarea(tarea_id):
+	"""
+	Ejecuta una tarea ya reservada. Se invoca dentro de los procesos del pool,
+	así que solo recibe el id y carga el resto desde la base de datos.
+	"""
+	close_old_connections()
+	tarea = Tarea.objects.get(pk=tarea_id)
+	if tarea.intentos > tarea.max_intentos:
+		# Retomada tras agotar sus intentos: cada ejecución detuvo a su worker
+		return cerrar(tarea, estado='ERR', error=tarea.error or ABANDONADA, fecha_fin=timezone.now())
+	try:
+		funcion = REGISTRO.get(tarea.tipo)
+		if funcion is None:
+			raise ValueError(f'Tipo de tarea desconocido: {tarea.tipo}')
+		# La tarea solo ve los datos de la empresa que la encoló
+		with usar_empresa(tarea.empresa_id):
+			resultado = funcion(tarea, **tarea.parametros)
+	except ReservaPerdida:
+		# El worker que la retomó es quien decide su estado
+		estado = Tarea.objects.values_list('estado', flat=True).get(pk=tarea.pk)
+	except Exception:
+		error = traceback.format_exc()
+		if tarea.intentos < tarea.max_intentos:
+			# Reintento con espera exponencial
+			espera = getattr(settings, 'TAREAS_REINTENTO_SEGUNDOS', 30) * 2 ** (tarea.intentos - 1)
+			estado = cerrar(
+				tarea, estado='PEN', error=error, disponible_desde=timezone.now() + timedelta(seconds=espera)
+			)
+		else:
+			estado = cerrar(tarea, estado='ERR', error=error, fecha_fin=timezone.now())
+	else:
+		estado = cerrar(tarea, estado='FIN', progreso=100, resultado=resultado, fecha_fin=timezone.now())
+	finally:
+		# Los procesos del pool no pasan por atexit: la auditoría se escribe aquí
+		auditoria.vaciar()
+		close_old_connections()
+	return estado
+
+
+@registrar('estadisticas_ordenes')
+def estadisticas_ordenes(tarea):
+	"""Recalcula los totales de órdenes por estado y prioridad."""
+	por_estado = OrdenTrabajo.objects.values('estado').annotate(
+		cantidad=Count('id'), costo_estimado=Sum('costo_estimado'), costo_real=Sum('costo_real')
+	).order_by('estado')
+	reportar_progreso(tarea, 50)
+	por_prioridad = OrdenTrabajo.objects.values('prioridad').annotate(
+		cantidad=Count('id')
+	).order_by('prioridad')
+	return {
+		'por_estado': [
+			{
+				'estado': fila['estado'],
+				'cantidad': fila['cantidad'],
+				'costo_estimado': str(fila['costo_estimado'] or 0),
+				'costo_real': str(fila['costo_real'] or 0),
+			}
+			for fila in por_estado
+		],
+		'por_prioridad': list(por_prioridad),
+	}
+
+
+@registrar('exportar_ordenes')
+def exportar_ordenes(tarea, estado=None):
+	"""Exporta las órdenes de trabajo (opcionalmente filtradas por estado) a un CSV."""
+	columnas = [
+		'codigo', 'equipo__codigo', 'tecnico__rut', 'estado', 'prioridad',
+		'fecha_solicitud', 'fecha_programada', 'fecha_inicio', 'fecha_fin',
+		'costo_estimado', 'costo_real',
+	]
+	ordenes = OrdenTrabajo.objects.order_by('pk')
+	if estado:
+		ordenes = ordenes.filter(estado=estado)
+	total = ordenes.count()
+
+	directorio = Path(getattr(settings, 'TAREAS_DIRECTORIO', settings.BASE_DIR / 'exportaciones'))
+	directorio.mkdir(parents=True, exist_ok=True)
+	archivo = directorio / f'ordenes_{tarea.pk}.csv'
+	with open(archivo, 'w', newline='', encoding='utf-8') as salida:
+		escritor = csv.writer(salida)
+		escritor.writerow(columnas)
+		for i, fila in enumerate(ordenes.values_list(*columnas).iterator(chunk_size=2000), start=1):
+			escritor.writerow(fila)
+			if i % 2000 == 0:
+				reportar_progreso(tarea, i * 100 // total)
+	return {'archivo': str(archivo), 'filas': total}
+
+
+@registrar('duplicados_equipos')
+def duplicados_equipos(tarea, umbral=None, ventana=None):
+	"""Busca equipos duplicados en el inventario de la empresa (ver api/duplicados.py)."""
+	from .duplicados import buscar_duplicados
+
+	return buscar_duplicados(umbral=umbral, ventana=ventana)
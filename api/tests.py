@@ -1,8 +1,42 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from .models import Cliente
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.models import F, Q
+from django.conf import settings
+from django.test import AsyncRequestFactory, TransactionTestCase, override_settings
+from django.utils import timezone
+from .analitica import analizar_costos
+from .empresas import usar_empresa
+from .archivo import archivar_ordenes
+from .eventos import BrokerLocal, flujo_sse, obtener_broker
+from .idempotencia import calcular_huella
+from .presupuesto import PresupuestoExcedido, verificar_presupuesto
+from .models import (
+    Cliente, ClaveIdempotencia, Empresa, Equipo, OrdenTrabajo, OrdenTrabajoArchivada, PlanMantencion, RegistroAuditoria,
+    Secuencia, Tarea, Tecnico
+)
+from . import auditoria, duplicados, geo, secuencias
+from .rut import separar_rut
+from .tareas import ejecutar_tarea, encolar, liberar, registrar, reportar_progreso, tomar_siguiente
+from .urls import router
+from .views import EquipoViewSet, eventos_ordenes
 
 class ClienteTests(TestCase):
     def setUp(self):
@@ -56,4 +90,1279 @@ class ClienteTests(TestCase):
         }
         response = self.client.post('/api/clientes/', nuevo_cliente, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Cliente.objects.count(), 2)
\ No newline at end of file
+        self.assertEqual(Cliente.objects.count(), 2)
+
+
+class ArchivoOrdenesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        self.equipo = Equipo.objects.create(
+            cliente=cliente, codigo='EQ-001', nombre='Compresor', marca='Atlas',
+            modelo='GA-11', numero_serie='SN-001', fecha_instalacion=date(2020, 1, 1),
+            ubicacion='Planta 1'
+        )
+        hace_un_anio = timezone.now() - timedelta(days=365)
+        self.cerrada = OrdenTrabajo.objects.create(
+            equipo=self.equipo, codigo='OT-001', descripcion='Cambio de filtros',
+            fecha_programada=date(2024, 1, 1), estado='FIN',
+            fecha_inicio=hace_un_anio, fecha_fin=hace_un_anio
+        )
+        self.activa = OrdenTrabajo.objects.create(
+            equipo=self.equipo, codigo='OT-002', descripcion='Revisión general',
+            fecha_programada=date.today()
+        )
+
+    def test_archivar_mueve_solo_ordenes_cerradas_antiguas(self):
+        self.assertEqual(archivar_ordenes(dias=180, lote=1), 1)
+        self.assertFalse(OrdenTrabajo.objects.filter(pk=self.cerrada.pk).exists())
+        archivada = OrdenTrabajoArchivada.objects.get(pk=self.cerrada.pk)
+        self.assertEqual(archivada.codigo, 'OT-001')
+        self.assertEqual(archivada.fecha_solicitud, self.cerrada.fecha_solicitud)
+        self.assertTrue(OrdenTrabajo.objects.filter(pk=self.activa.pk).exists())
+
+    def test_listado_incluye_archivo_solo_si_se_solicita(self):
+        archivar_ordenes(dias=180)
+        response = self.client.get('/api/ordenes/')
+        self.assertEqual([o['codigo'] for o in response.data['results']], ['OT-002'])
+
+        response = self.client.get('/api/ordenes/', {'incluir_archivo': '1', 'ordering': 'fecha_solicitud'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([o['codigo'] for o in response.data['results']], ['OT-001', 'OT-002'])
+
+        response = self.client.get('/api/ordenes/', {'incluir_archivo': '1', 'estado': 'FIN'})
+        self.assertEqual([o['codigo'] for o in response.data['results']], ['OT-001'])
+
+    def test_detalle_busca_en_archivo(self):
+        archivar_ordenes(dias=180)
+        response = self.client.get(f'/api/ordenes/{self.cerrada.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['codigo'], 'OT-001')
+
+        # Las órdenes archivadas no se pueden modificar
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(f'/api/ordenes/{self.cerrada.pk}/', {'observaciones': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_codigo_archivado_no_se_reutiliza(self):
+        archivar_ordenes(dias=180)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/ordenes/', {
+            'equipo': self.equipo.pk, 'codigo': 'OT-001', 'descripcion': 'Otra', 'fecha_programada': '2030-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('codigo', response.data)
+
+        # Una orden que ya repite el código (datos anteriores) se omite sin detener el archivo
+        hace_un_anio = timezone.now() - timedelta(days=365)
+        repetida = OrdenTrabajo.objects.create(
+            equipo=self.equipo, codigo='OT-001', descripcion='Repetida', fecha_programada=date(2024, 1, 1),
+            estado='FIN', fecha_inicio=hace_un_anio, fecha_fin=hace_un_anio
+        )
+        OrdenTrabajo.objects.filter(pk=self.activa.pk).update(estado='CAN', fecha_fin=hace_un_anio)
+        errores = StringIO()
+        call_command('archivar_ordenes', dias=180, lote=1, stdout=StringIO(), stderr=errores)
+        self.assertTrue(OrdenTrabajoArchivada.objects.filter(pk=self.activa.pk).exists())
+        self.assertTrue(OrdenTrabajo.objects.filter(pk=repetida.pk).exists())
+        self.assertIn('OT-001', errores.getvalue())
+
+
+@registrar('prueba_fallida')
+def tarea_fallida(tarea):
+    raise RuntimeError('fallo de prueba')
+
+
+@registrar('prueba_retomada')
+def tarea_retomada(tarea):
+    if tarea.intentos == 1:
+        vencida = timezone.now() - timedelta(minutes=11)
+        # Un latido renueva la reserva: nadie la retoma
+        Tarea.objects.filter(pk=tarea.pk).update(fecha_latido=vencida)
+        reportar_progreso(tarea, 30)
+        assert tomar_siguiente() is None
+        # Sin latido vence y otro worker la toma: el progreso siguiente la detiene
+        Tarea.objects.filter(pk=tarea.pk).update(fecha_latido=vencida)
+        assert tomar_siguiente() == tarea.pk
+        reportar_progreso(tarea, 60)
+    return {'intento': tarea.intentos}
+
+
+class TareasTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def test_encolar_desde_api_y_consultar_resultado(self):
+        response = self.client.post('/api/ordenes/estadisticas/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        tarea_id = response.data['id']
+        self.assertEqual(response['Location'], f'/api/jobs/{tarea_id}/')
+
+        call_command('procesar_tareas', procesos=0, una_vez=True, stdout=StringIO())
+
+        response = self.client.get(f'/api/jobs/{tarea_id}/')
+        self.assertEqual(response.data['estado'], 'FIN')
+        self.assertEqual(response.data['progreso'], 100)
+        self.assertIn('por_estado', response.data['resultado'])
+
+    @override_settings(TAREAS_MAX_INTENTOS=2, TAREAS_REINTENTO_SEGUNDOS=0)
+    def test_reintentos_hasta_fallar(self):
+        tarea = encolar('prueba_fallida', usuario=self.user)
+        call_command('procesar_tareas', procesos=0, una_vez=True, stdout=StringIO())
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, 'ERR')
+        self.assertEqual(tarea.intentos, 2)
+        self.assertIn('fallo de prueba', tarea.error)
+
+    @override_settings(TAREAS_LEASE_SEGUNDOS=600, TAREAS_MAX_INTENTOS=2)
+    def test_tarea_abandonada_se_retoma_al_vencer_el_lease(self):
+        tarea = encolar('estadisticas_ordenes', usuario=self.user)
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+        # El worker murió: mientras el lease está vigente nadie la toma
+        self.assertIsNone(tomar_siguiente())
+        Tarea.objects.filter(pk=tarea.pk).update(fecha_latido=timezone.now() - timedelta(minutes=11))
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ('EJE', 2))
+
+        # Retomada después de agotar sus intentos, falla sin ejecutarse
+        Tarea.objects.filter(pk=tarea.pk).update(fecha_latido=timezone.now() - timedelta(minutes=11))
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+        self.assertEqual(ejecutar_tarea(tarea.pk), 'ERR')
+        tarea.refresh_from_db()
+        self.assertIsNone(tarea.resultado)
+        self.assertIn('se detuvo', tarea.error)
+
+    @override_settings(TAREAS_LEASE_SEGUNDOS=600)
+    def test_progreso_renueva_la_reserva_y_el_worker_retomado_no_cierra(self):
+        tarea = encolar('prueba_retomada', usuario=self.user)
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+        # La primera ejecución reporta progreso tras vencer su reserva y otro worker la retoma
+        self.assertEqual(ejecutar_tarea(tarea.pk), 'EJE')
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos, tarea.progreso), ('EJE', 2, 30))
+        self.assertEqual(ejecutar_tarea(tarea.pk), 'FIN')
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.resultado), ('FIN', {'intento': 2}))
+
+    def test_liberar_devuelve_a_la_cola_las_tareas_de_un_pool_roto(self):
+        tarea = encolar('estadisticas_ordenes', usuario=self.user)
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+        self.assertEqual(liberar([tarea.pk]), 1)
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+
+    def test_tareas_de_otro_usuario_no_visibles(self):
+        otro = User.objects.create_user(username='otro', password='testpassword')
+        tarea = encolar('estadisticas_ordenes', usuario=otro)
+        response = self.client.get(f'/api/jobs/{tarea.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AnalisisCostosTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        equipos = [
+            Equipo.objects.create(
+                cliente=self.cliente, codigo=f'EQ-{tipo}', nombre='Equipo', tipo=tipo, marca='Marca',
+                modelo='M1', numero_serie=f'SN-{tipo}', fecha_instalacion=date(2020, 1, 1), ubicacion='Planta'
+            )
+            for tipo in ('MAQ', 'VEH')
+        ]
+        # Errores de estimación: MAQ +10% y +30%, VEH -20%; una orden sin costo real
+        for i, (equipo, estimado, real) in enumerate([
+            (equipos[0], 100, 110), (equipos[0], 100, 130), (equipos[1], 200, 160), (equipos[1], 50, None),
+        ]):
+            OrdenTrabajo.objects.create(
+                equipo=equipo, codigo=f'OT-{i}', descripcion='Mantención', fecha_programada=date.today(),
+                costo_estimado=estimado, costo_real=real
+            )
+
+    def test_distribucion_y_grupos(self):
+        resultado = analizar_costos({})
+        self.assertEqual(resultado['ordenes'], 3)
+        self.assertEqual(resultado['costo_real_total'], 400.0)
+        self.assertAlmostEqual(resultado['error_pct']['percentiles']['p50'], 10.0)
+        por_tipo = {g['grupo']: g for g in resultado['por_tipo_equipo']}
+        self.assertEqual(por_tipo['MAQ']['cantidad'], 2)
+        self.assertAlmostEqual(por_tipo['MAQ']['promedio'], 20.0)
+        self.assertAlmostEqual(por_tipo['VEH']['promedio'], -20.0)
+        self.assertEqual(resultado['por_tecnico'][0]['grupo'], None)
+
+    def test_endpoint_filtra_y_valida(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/ordenes/analisis_costos/', {'tipo': 'VEH'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ordenes'], 1)
+
+        response = self.client.get('/api/ordenes/analisis_costos/', {'cliente': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.cliente = Cliente.objects.create(
+            rut='76.086.428-5', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        self.nuevo = {
+            'razon_social': 'Empresa Nueva', 'giro': 'Desarrollo', 'direccion': 'Av Siempre Viva',
+            'telefono': '123456789', 'email': 'nueva@empresa.com'
+        }
+
+    def test_rut_numero_se_calcula_al_guardar(self):
+        self.assertEqual(self.cliente.rut_numero, 76086428)
+
+    def test_crear_cliente_valida_digito_verificador(self):
+        response = self.client.post('/api/clientes/', {**self.nuevo, 'rut': '12345678-9'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/api/clientes/', {**self.nuevo, 'rut': '12.345.678-5'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['rut'], '12345678-5')
+
+    def test_crear_cliente_rechaza_rut_duplicado_con_otro_formato(self):
+        response = self.client.post('/api/clientes/', {**self.nuevo, 'rut': '760864285'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_buscar_por_rut(self):
+        response = self.client.get('/api/clientes/por-rut/76086428-5/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.cliente.pk)
+
+        response = self.client.get('/api/clientes/por-rut/11.111.111-1/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/tecnicos/por-rut/11111111-2/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_buscar_por_rut_repetido_entrega_el_mas_antiguo(self):
+        # Registros anteriores a la validación que guardaron el mismo RUT con otro formato
+        Cliente.objects.bulk_create([
+            Cliente(rut=rut, rut_numero=76086428, razon_social='Duplicado', giro='-', direccion='-', telefono='-',
+                    email=f'{i}@empresa.com')
+            for i, rut in enumerate(['76086428-5', '760864285'])
+        ])
+        self.assertEqual(Cliente.objects.filter(rut_numero=76086428).count(), 3)
+        response = self.client.get('/api/clientes/por-rut/76.086.428-5/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.cliente.pk)
+
+
+TASAS_PRUEBA = {
+    'usuario': '10/min',
+    'cliente_jwt': '10/min',
+    'anonimo': '5/min',
+}
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': TASAS_PRUEBA})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        caches['throttle'].clear()
+
+    def test_limite_anonimo_con_encabezados(self):
+        response = self.client.get('/api/clientes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-RateLimit-Limit'], '5')
+        self.assertEqual(response['X-RateLimit-Remaining'], '3')
+
+        self.client.get('/api/clientes/')
+        response = self.client.get('/api/clientes/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_busqueda_cuesta_mas_que_listado(self):
+        response = self.client.get('/api/clientes/', {'search': 'empresa'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+
+    def test_limite_por_usuario_independiente_de_ip(self):
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=user)
+        for _ in range(5):
+            self.assertEqual(self.client.get('/api/clientes/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/clientes/').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # Los anónimos de la misma IP tienen su propio contador
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get('/api/clientes/').status_code, status.HTTP_200_OK)
+
+    def test_limite_compartido_por_los_usuarios_de_una_integracion(self):
+        def cliente_api(username, **datos):
+            User.objects.create_user(username=username, password='testpassword')
+            response = APIClient().post(
+                '/api/token/', {'username': username, 'password': 'testpassword', **datos}, format='json'
+            )
+            self.assertEqual(AccessToken(response.data['access']).get('client_id'), datos.get('client_id'))
+            api = APIClient()
+            api.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+            return api
+
+        # Pedir los tokens consume el límite anónimo
+        uno, dos = cliente_api('uno', client_id='erp'), cliente_api('dos', client_id='erp')
+        caches['throttle'].clear()
+        otro = cliente_api('otro')
+        caches['throttle'].clear()
+        # Cada listado cuesta 2: entre ambos usuarios agotan las 10 unidades de la integración
+        for api in (uno, uno, uno, dos, dos):
+            self.assertEqual(api.get('/api/clientes/').status_code, status.HTTP_200_OK)
+        response = dos.get('/api/clientes/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Un usuario sin client_id solo tiene su propio límite
+        self.assertEqual(otro.get('/api/clientes/').status_code, status.HTTP_200_OK)
+
+
+class EventosOrdenesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        self.equipo = Equipo.objects.create(
+            cliente=cliente, codigo='EQ-001', nombre='Compresor', marca='Atlas',
+            modelo='GA-11', numero_serie='SN-001', fecha_instalacion=date(2020, 1, 1),
+            ubicacion='Planta 1'
+        )
+
+    def test_cambio_estado_publica_eventos(self):
+        broker = obtener_broker()
+        inicio = broker.ultimo_id
+        with self.captureOnCommitCallbacks(execute=True):
+            orden = OrdenTrabajo.objects.create(
+                equipo=self.equipo, codigo='OT-001', descripcion='Revisión', fecha_programada=date.today()
+            )
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/ordenes/{orden.pk}/cambiar_estado/', {'estado': 'PRO'}, format='json')
+
+        eventos = [e for e in broker._historial if e['id'] > inicio]
+        self.assertEqual([e['tipo'] for e in eventos], ['creada', 'cambio_estado'])
+        self.assertEqual(eventos[1]['estado_anterior'], 'PEN')
+        self.assertEqual(eventos[1]['cliente'], self.equipo.cliente_id)
+
+    async def test_flujo_solo_entrega_eventos_de_la_empresa_del_token(self):
+        empresa_b = await Empresa.objects.acreate(nombre='B', slug='b')
+        usuario_b = await sync_to_async(User.objects.create_user)(username='usuario-b')
+        await empresa_b.usuarios.aadd(usuario_b)
+        token = AccessToken.for_user(usuario_b)
+        token['empresa'] = empresa_b.pk
+
+        broker = obtener_broker()
+        inicio = broker.ultimo_id
+        broker.publicar({'tipo': 'creada', 'empresa': self.equipo.empresa_id})
+        broker.publicar({'tipo': 'creada', 'empresa': empresa_b.pk})
+        fabrica = AsyncRequestFactory()
+        response = await eventos_ordenes(
+            fabrica.get(f'/api/ordenes/eventos/?desde={inicio}', headers={'Authorization': f'Bearer {token}'})
+        )
+        flujo = response.streaming_content
+        await anext(flujo)
+        self.assertTrue((await anext(flujo)).startswith(f'id: {inicio + 2}\n'.encode()))
+        await flujo.aclose()
+
+        # Sin credenciales, o con un token inválido, no hay flujo
+        response = await eventos_ordenes(fabrica.get('/api/ordenes/eventos/'))
+        self.assertEqual(response.status_code, 401)
+        response = await eventos_ordenes(fabrica.get('/api/ordenes/eventos/', headers={'Authorization': 'Bearer x'}))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_flujo_filtra_y_retoma_desde_id(self):
+        broker = BrokerLocal(historial=10, cola_maxima=10)
+        broker.publicar({'tipo': 'creada', 'tecnico': 1})
+        broker.publicar({'tipo': 'creada', 'tecnico': 2})
+        flujo = flujo_sse(broker, {'tecnico': {'2'}}, desde=0)
+        self.assertEqual(await anext(flujo), 'retry: 3000\n\n')
+        self.assertTrue((await anext(flujo)).startswith('id: 2\n'))
+
+        broker.publicar({'tipo': 'actualizada', 'tecnico': 1})
+        broker.publicar({'tipo': 'actualizada', 'tecnico': 2})
+        self.assertTrue((await anext(flujo)).startswith('id: 4\n'))
+        await flujo.aclose()
+        self.assertFalse(broker._suscripciones)
+
+    async def test_flujo_pide_reiniciar_si_se_desborda(self):
+        broker = BrokerLocal(historial=2, cola_maxima=2)
+        flujo = flujo_sse(broker, {})
+        await anext(flujo)
+        for _ in range(3):
+            broker.publicar({'tipo': 'creada'})
+        self.assertIn('event: reiniciar', await anext(flujo))
+
+        # El historial ya no cubre el id pedido
+        flujo = flujo_sse(broker, {}, desde=0)
+        await anext(flujo)
+        self.assertIn('event: reiniciar', await anext(flujo))
+
+    async def test_flujo_pide_reiniciar_con_id_de_antes_de_reiniciar_el_proceso(self):
+        # Tras reiniciar el proceso los ids parten de nuevo: el id 50 ya no existe
+        broker = BrokerLocal(historial=10, cola_maxima=10)
+        broker.publicar({'tipo': 'creada'})
+        flujo = flujo_sse(broker, {}, desde=50)
+        await anext(flujo)
+        self.assertIn('event: reiniciar', await anext(flujo))
+
+        flujo = flujo_sse(broker, {}, desde=1)
+        await anext(flujo)
+        broker.publicar({'tipo': 'creada'})
+        self.assertTrue((await anext(flujo)).startswith('id: 2\n'))
+        await flujo.aclose()
+
+
+class ArranqueTests(TestCase):
+    def test_perfil_api_no_carga_admin_ni_api_navegable(self):
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings_api'}
+        salida = subprocess.run(
+            [sys.executable, '-m', 'config.arranque'], cwd=settings.BASE_DIR,
+            env=entorno, capture_output=True, text=True, check=True,
+        )
+        medicion = json.loads(salida.stdout.strip().splitlines()[-1])
+        apps = [app['app'] for app in medicion['apps']]
+        self.assertIn('api.apps.ApiConfig', apps)
+        self.assertNotIn('django.contrib.admin', apps)
+        self.assertGreater(medicion['rss_kb'], 0)
+
+    def test_perfil_api_hereda_el_middleware(self):
+        from config import settings as completo, settings_api
+        self.assertEqual(settings_api.MIDDLEWARE, [
+            middleware for middleware in completo.MIDDLEWARE
+            if middleware not in settings_api.MIDDLEWARE_SOLO_NAVEGADOR
+        ])
+        self.assertIn('api.presupuesto.PresupuestoMiddleware', settings_api.MIDDLEWARE)
+        self.assertNotIn('django.contrib.sessions.middleware.SessionMiddleware', settings_api.MIDDLEWARE)
+
+    def test_precargar_no_importa_numpy_por_defecto(self):
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings_api'}
+        codigo = 'import sys, django; django.setup(); from config.arranque import precargar; precargar(); print("numpy" in sys.modules)'
+        salida = subprocess.run(
+            [sys.executable, '-c', codigo], cwd=settings.BASE_DIR,
+            env=entorno, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(salida.stdout.strip().splitlines()[-1], 'False')
+
+
+class IdempotenciaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        self.equipo = Equipo.objects.create(
+            cliente=cliente, codigo='EQ-001', nombre='Compresor', marca='Atlas',
+            modelo='GA-11', numero_serie='SN-001', fecha_instalacion=date(2020, 1, 1),
+            ubicacion='Planta 1'
+        )
+        self.orden = {
+            'equipo': self.equipo.pk, 'codigo': 'OT-001', 'descripcion': 'Revisión',
+            'fecha_programada': '2030-01-01'
+        }
+
+    def test_reintento_devuelve_respuesta_guardada(self):
+        primera = self.client.post('/api/ordenes/', self.orden, format='json', HTTP_IDEMPOTENCY_KEY='clave-1')
+        self.assertEqual(primera.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(2):
+            # Solo se resuelve la empresa y se consulta la clave; no se toca OrdenTrabajo
+            segunda = self.client.post('/api/ordenes/', self.orden, format='json', HTTP_IDEMPOTENCY_KEY='clave-1')
+        self.assertEqual(segunda.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda.data, primera.data)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(OrdenTrabajo.objects.count(), 1)
+
+    def test_misma_clave_con_otro_contenido(self):
+        self.client.post('/api/ordenes/', self.orden, format='json', HTTP_IDEMPOTENCY_KEY='clave-1')
+        response = self.client.post(
+            '/api/ordenes/', {**self.orden, 'codigo': 'OT-002'}, format='json', HTTP_IDEMPOTENCY_KEY='clave-1'
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    @override_settings(IDEMPOTENCIA_ESPERA_SEGUNDOS=0)
+    def test_peticion_en_curso_no_se_ejecuta_dos_veces(self):
+        orden = OrdenTrabajo.objects.create(
+            equipo=self.equipo, codigo='OT-001', descripcion='Revisión', fecha_programada=date.today()
+        )
+        url = f'/api/ordenes/{orden.pk}/cambiar_estado/'
+        # Simula una primera petición que todavía no termina
+        with usar_empresa(orden.empresa_id):
+            huella = calcular_huella(SimpleNamespace(method='POST', path=url, data={'estado': 'PRO'}))
+        ClaveIdempotencia.objects.create(
+            usuario=self.user, clave='clave-2', huella=huella,
+            expira=timezone.now() + timedelta(hours=1)
+        )
+        response = self.client.post(url, {'estado': 'PRO'}, format='json', HTTP_IDEMPOTENCY_KEY='clave-2')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, 'PEN')
+
+        # Si el worker de la primera murió, la reserva se libera al vencer el bloqueo
+        ClaveIdempotencia.objects.filter(clave='clave-2').update(
+            fecha_creacion=timezone.now() - timedelta(seconds=settings.IDEMPOTENCIA_BLOQUEO_SEGUNDOS + 1)
+        )
+        response = self.client.post(url, {'estado': 'PRO'}, format='json', HTTP_IDEMPOTENCY_KEY='clave-2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        orden.refresh_from_db()
+        self.assertEqual(orden.estado, 'PRO')
+        self.assertEqual(ClaveIdempotencia.objects.get(clave='clave-2').estado, 'FIN')
+
+
+@override_settings(SECUENCIA_BLOQUE=10)
+class CodigosGeneradosTests(TransactionTestCase):
+    def setUp(self):
+        secuencias._bloques.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+
+    def test_codigos_de_orden_por_anio(self):
+        equipo = self.client.post('/api/equipos/', {
+            'cliente': self.cliente.pk, 'nombre': 'Compresor', 'tipo': 'MAQ', 'marca': 'Atlas',
+            'modelo': 'GA-11', 'numero_serie': 'SN-001', 'fecha_instalacion': '2020-01-01', 'ubicacion': 'Planta 1'
+        }, format='json').data
+        self.assertEqual(equipo['codigo'], f'EQ-{self.cliente.pk}-00001')
+
+        anio = timezone.now().year
+        codigos = [
+            self.client.post('/api/ordenes/', {
+                'equipo': equipo['id'], 'descripcion': 'Revisión', 'fecha_programada': '2030-01-01'
+            }, format='json').data['codigo']
+            for _ in range(2)
+        ]
+        self.assertEqual(codigos, [f'OT-{anio}-000001', f'OT-{anio}-000002'])
+
+    def test_bloques_no_se_solapan_entre_procesos(self):
+        primeros = [secuencias.siguiente_numero('prueba')]
+        with self.assertNumQueries(0):
+            # Los números siguientes salen del bloque en memoria
+            primeros += [secuencias.siguiente_numero('prueba') for _ in range(2)]
+        # Otro proceso no ve el bloque en memoria y reserva el siguiente
+        secuencias._bloques.clear()
+        self.assertEqual(primeros, [1, 2, 3])
+        self.assertEqual(secuencias.siguiente_numero('prueba'), 11)
+        self.assertEqual(Secuencia.objects.get(nombre='prueba').siguiente, 21)
+
+    def test_codigo_generado_evita_codigos_manuales(self):
+        equipo = Equipo.objects.create(
+            cliente=self.cliente, codigo='EQ-001', nombre='Compresor', marca='Atlas',
+            modelo='GA-11', numero_serie='SN-001', fecha_instalacion=date(2020, 1, 1), ubicacion='Planta 1'
+        )
+        anio = timezone.now().year
+        OrdenTrabajo.objects.create(
+            equipo=equipo, codigo=f'OT-{anio}-000001', descripcion='Manual', fecha_programada=date.today()
+        )
+        response = self.client.post('/api/ordenes/', {
+            'equipo': equipo.pk, 'descripcion': 'Revisión', 'fecha_programada': '2030-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['codigo'], f'OT-{anio}-000002')
+
+
+class CercaniaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        # Santiago centro, Providencia (~6 km) y Valparaíso (~100 km)
+        santiago = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Santiago', giro='Pruebas', direccion='Alameda 100',
+            latitud=-33.4489, longitud=-70.6693, telefono='999999999', email='stgo@empresa.com'
+        )
+        valparaiso = Cliente.objects.create(
+            rut='22222222-2', razon_social='Empresa Valparaíso', giro='Pruebas', direccion='Errázuriz 50',
+            latitud=-33.0472, longitud=-71.6127, telefono='999999999', email='valpo@empresa.com'
+        )
+        self.centro = self.crear_equipo(santiago, 'EQ-001')
+        self.providencia = self.crear_equipo(santiago, 'EQ-002', latitud=-33.4263, longitud=-70.6100)
+        self.puerto = self.crear_equipo(valparaiso, 'EQ-003')
+        self.sin_ubicacion = self.crear_equipo(
+            Cliente.objects.create(
+                rut='33333333-3', razon_social='Sin Ubicación', giro='Pruebas', direccion='S/N',
+                telefono='999999999', email='sn@empresa.com'
+            ), 'EQ-004'
+        )
+        usuario = User.objects.create_user(username='tecnico', password='testpassword')
+        self.tecnico = Tecnico.objects.create(
+            usuario=usuario, rut='44444444-4', especialidad='MEC', telefono='999999999',
+            fecha_contratacion=date(2020, 1, 1)
+        )
+
+    def crear_equipo(self, cliente, codigo, **coordenadas):
+        return Equipo.objects.create(
+            cliente=cliente, codigo=codigo, nombre='Compresor', marca='Atlas', modelo='GA-11',
+            numero_serie=f'SN-{codigo}', fecha_instalacion=date(2020, 1, 1), ubicacion='Planta 1', **coordenadas
+        )
+
+    def crear_orden(self, equipo, codigo, prioridad='MED', estado='PEN'):
+        return OrdenTrabajo.objects.create(
+            equipo=equipo, tecnico=self.tecnico, codigo=codigo, descripcion='Revisión',
+            fecha_programada=date.today(), prioridad=prioridad, estado=estado
+        )
+
+    def test_equipos_cercanos_ordenados_por_distancia(self):
+        response = self.client.get('/api/equipos/', {'cerca': '-33.4489,-70.6693', 'radio': '10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resultados = response.data['results']
+        # El equipo sin coordenadas propias usa las de su cliente
+        self.assertEqual([e['codigo'] for e in resultados], ['EQ-001', 'EQ-002'])
+        self.assertEqual(resultados[0]['distancia_km'], 0)
+        self.assertAlmostEqual(resultados[1]['distancia_km'], 6.0, delta=0.5)
+
+        response = self.client.get('/api/equipos/', {'cerca': '-33.4489,-70.6693', 'radio': '150'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertNotIn('distancia_km', self.client.get('/api/equipos/').data['results'][0])
+
+    def test_cerca_invalido(self):
+        for parametros in ({'cerca': 'abc'}, {'cerca': '95,0'}, {'cerca': '0,0', 'radio': '-1'}):
+            response = self.client.get('/api/equipos/', parametros)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordenes_cercanas(self):
+        self.crear_orden(self.providencia, 'OT-001')
+        self.crear_orden(self.puerto, 'OT-002')
+        response = self.client.get('/api/ordenes/', {'cerca': '-33.43,-70.61', 'radio': '5'})
+        self.assertEqual([o['codigo'] for o in response.data['results']], ['OT-001'])
+
+    def test_rutas_agrupan_ordenes_pendientes(self):
+        self.crear_orden(self.centro, 'OT-001')
+        self.crear_orden(self.providencia, 'OT-002', prioridad='URG')
+        self.crear_orden(self.puerto, 'OT-003')
+        self.crear_orden(self.sin_ubicacion, 'OT-004')
+        self.crear_orden(self.centro, 'OT-005', estado='FIN')
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(f'/api/tecnicos/{self.tecnico.pk}/rutas/', {'radio': '10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lotes = [[o['codigo'] for o in lote['ordenes']] for lote in response.data['lotes']]
+        # El lote de Santiago parte por la orden urgente
+        self.assertEqual(lotes, [['OT-002', 'OT-001'], ['OT-003']])
+        self.assertEqual([o['codigo'] for o in response.data['sin_ubicacion']], ['OT-004'])
+
+        response = self.client.get(f'/api/tecnicos/{self.tecnico.pk}/rutas/', {'radio': '2'})
+        self.assertEqual(len(response.data['lotes']), 3)
+
+    def test_agrupacion_equivale_a_comparar_todos_los_pares(self):
+        import random
+        generador = random.Random(7)
+        puntos = [(i, -33.5 + generador.random() * 0.5, -70.8 + generador.random() * 0.5) for i in range(300)]
+        grupos = geo.agrupar_por_cercania(puntos, 2)
+
+        # Referencia: enlace simple comparando todos los pares
+        padre = list(range(len(puntos)))
+
+        def raiz(i):
+            while padre[i] != i:
+                i = padre[i]
+            return i
+
+        for i, a in enumerate(puntos):
+            for j, b in enumerate(puntos[:i]):
+                if geo.haversine_km(a[1], a[2], b[1], b[2]) <= 2:
+                    padre[raiz(i)] = raiz(j)
+        esperado = {frozenset(p for p in range(len(puntos)) if raiz(p) == raiz(i)) for i in range(len(puntos))}
+        self.assertEqual({frozenset(p[0] for p in grupo) for grupo in grupos}, esperado)
+
+
+class AuditoriaTests(TestCase):
+    def setUp(self):
+        auditoria.vaciar()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        self.equipo = Equipo.objects.create(
+            cliente=cliente, codigo='EQ-001', nombre='Compresor', marca='Atlas',
+            modelo='GA-11', numero_serie='SN-001', fecha_instalacion=date(2020, 1, 1),
+            ubicacion='Planta 1'
+        )
+        self.orden = OrdenTrabajo.objects.create(
+            equipo=self.equipo, codigo='OT-001', descripcion='Revisión', fecha_programada=date.today()
+        )
+
+    def registros(self, **filtros):
+        return list(RegistroAuditoria.objects.filter(**filtros).order_by('id'))
+
+    def test_registra_solo_campos_modificados_y_usuario(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/ordenes/{self.orden.pk}/cambiar_estado/', {'estado': 'PRO'}, format='json')
+            self.client.patch(
+                f'/api/ordenes/{self.orden.pk}/', {'costo_real': '1500.00', 'descripcion': 'Revisión'}, format='json'
+            )
+        # Los registros llegan al búfer al confirmarse la transacción y se
+        # escriben en bloque al terminar la siguiente petición
+        self.assertFalse(RegistroAuditoria.objects.exists())
+        self.client.get('/api/auditoria/')
+        cambios = self.registros(modelo='ordentrabajo', objeto_id=self.orden.pk)
+        self.assertEqual([r.accion for r in cambios], ['M', 'M'])
+        self.assertEqual(cambios[0].cambios, {'estado': ['PEN', 'PRO']})
+        self.assertEqual(cambios[1].cambios, {'costo_real': [None, '1500.00']})
+        self.assertEqual({r.usuario_id for r in cambios}, {self.user.pk})
+
+    def test_creacion_eliminacion_y_transaccion_revertida(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orden.save()
+            self.equipo.nombre = 'Compresor 2'
+            try:
+                with transaction.atomic():
+                    self.equipo.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.orden.delete()
+        auditoria.vaciar()
+        # Las creaciones del setUp ocurrieron fuera de captureOnCommitCallbacks
+        registros = self.registros()
+        self.assertEqual([(r.modelo, r.accion) for r in registros], [('ordentrabajo', 'E')])
+        self.assertEqual(registros[0].cambios['codigo'], ['OT-001', None])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/clientes/', {
+                'rut': '22222222-2', 'razon_social': 'Nueva', 'giro': 'Pruebas', 'direccion': 'Calle 1',
+                'telefono': '999999999', 'email': 'nueva@empresa.com'
+            }, format='json')
+        auditoria.vaciar()
+        creacion = self.registros(modelo='cliente', objeto_id=response.data['id'])[0]
+        self.assertEqual(creacion.accion, 'C')
+        self.assertEqual(creacion.cambios['razon_social'], [None, 'Nueva'])
+
+    def test_guardar_no_agrega_consultas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            # Solo el UPDATE: el cliente del evento SSE sale del equipo ya cargado
+            with self.assertNumQueries(1):
+                self.orden.estado = 'PRO'
+                self.orden.save(update_fields=['estado'])
+            # Sin el equipo cargado se consulta su cliente
+            orden = OrdenTrabajo.objects.get(pk=self.orden.pk)
+            with self.assertNumQueries(2):
+                orden.save(update_fields=['estado'])
+        with self.assertNumQueries(1):
+            self.assertEqual(auditoria.vaciar(), 1)
+        with self.assertRaises(ValueError):
+            RegistroAuditoria.objects.get().save()
+
+    def test_fusion_y_archivo_quedan_registrados(self):
+        copia = Equipo.objects.create(
+            cliente=self.equipo.cliente, codigo='EQ-002', nombre='Compresor', marca='Atlas',
+            modelo='GA-11', numero_serie='SN 001', fecha_instalacion=date(2020, 1, 1), ubicacion='Planta 1'
+        )
+        orden = OrdenTrabajo.objects.create(
+            equipo=copia, codigo='OT-002', descripcion='Revisión', fecha_programada=date.today()
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            duplicados.fusionar_equipos(self.equipo.pk, [copia.pk])
+        auditoria.vaciar()
+        registro = RegistroAuditoria.objects.get(modelo='ordentrabajo', objeto_id=orden.pk, accion='M')
+        self.assertEqual(registro.cambios, {'equipo': [copia.pk, self.equipo.pk]})
+
+        OrdenTrabajo.objects.filter(pk=orden.pk).update(estado='FIN', fecha_fin=timezone.now() - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archivar_ordenes(dias=0), 1)
+        auditoria.vaciar()
+        registros = self.registros(modelo='ordentrabajo', objeto_id=orden.pk)
+        self.assertEqual(registros[-1].cambios, {'archivada': [False, True]})
+        self.assertNotIn('E', [r.accion for r in registros])
+
+    def test_ejecutar_tarea_escribe_la_auditoria_pendiente(self):
+        # Los procesos del pool terminan sin atexit: la tarea vacía el búfer
+        tarea = encolar('estadisticas_ordenes', usuario=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipo.nombre = 'Compresor 2'
+            self.equipo.save()
+        self.assertFalse(RegistroAuditoria.objects.exists())
+        self.assertEqual(tomar_siguiente(), tarea.pk)
+        ejecutar_tarea(tarea.pk)
+        self.assertEqual(self.registros(modelo='equipo')[0].cambios, {'nombre': ['Compresor', 'Compresor 2']})
+
+    def test_consulta_por_objeto_y_rango_de_fechas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/ordenes/{self.orden.pk}/cambiar_estado/', {'estado': 'PRO'}, format='json')
+            self.client.delete(f'/api/ordenes/{self.orden.pk}/')
+        auditoria.vaciar()
+
+        response = self.client.get(f'/api/ordenes/{self.orden.pk}/historial/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['accion'] for r in response.data['results']], ['E', 'M'])
+
+        ahora = timezone.now()
+        response = self.client.get('/api/auditoria/', {
+            'modelo': 'ordentrabajo', 'objeto_id': self.orden.pk,
+            'fecha__gte': (ahora - timedelta(minutes=1)).isoformat(), 'fecha__lte': ahora.isoformat(),
+        })
+        self.assertEqual(response.data['count'], 2)
+        response = self.client.get('/api/auditoria/', {'fecha__gte': (ahora + timedelta(minutes=1)).isoformat()})
+        self.assertEqual(response.data['count'], 0)
+
+        # Solo el staff consulta la auditoría
+        self.client.force_authenticate(user=User.objects.create_user(username='otro', password='x'))
+        self.assertEqual(self.client.get('/api/auditoria/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DuplicadosEquiposTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.cliente = Cliente.objects.create(
+            rut='11111111-1', razon_social='Empresa Test', giro='Pruebas',
+            direccion='Calle Falsa 123', telefono='999999999', email='test@empresa.com'
+        )
+        self.original = self.crear_equipo('EQ-001', 'SN-1001', 'Atlas Copco', 'GA-11')
+        self.copia = self.crear_equipo('EQ-002', 'sn 1001', 'ATLAS COPCO', 'ga11')
+        self.sin_prefijo = self.crear_equipo('EQ-003', '1001', 'Atlas Copco', 'GA 11')
+        # Serie correlativa del mismo modelo: es otra unidad
+        self.correlativo = self.crear_equipo('EQ-004', 'SN-1002', 'Atlas Copco', 'GA-11')
+        # Mismos dígitos pero otra marca y modelo
+        self.otra_marca = self.crear_equipo('EQ-005', 'X-1001', 'Siemens', 'S7-300')
+
+    def crear_equipo(self, codigo, serie, marca, modelo):
+        return Equipo.objects.create(
+            cliente=self.cliente, codigo=codigo, nombre='Compresor', marca=marca, modelo=modelo,
+            numero_serie=serie, fecha_instalacion=date(2020, 1, 1), ubicacion='Planta 1'
+        )
+
+    def test_detecta_variantes_de_formato(self):
+        resultado = duplicados.buscar_duplicados()
+        self.assertEqual(resultado['equipos'], 5)
+        self.assertEqual(
+            [(g['conservar'], g['duplicados']) for g in resultado['grupos']],
+            [(self.original.pk, [self.copia.pk, self.sin_prefijo.pk])]
+        )
+
+    def test_comparaciones_acotadas_por_la_ventana(self):
+        Equipo.objects.bulk_create([
+            Equipo(
+                cliente=self.cliente, codigo=f'EQ-M{i}', nombre='Compresor', marca='Atlas', modelo='GA',
+                numero_serie=f'LOTE-{i % 7}-A{i}', fecha_instalacion=date(2020, 1, 1), ubicacion='Planta 1'
+            )
+            for i in range(300)
+        ])
+        resultado = duplicados.buscar_duplicados(ventana=5)
+        # Cada equipo se compara a lo más con 5 vecinos por cada clave de bloqueo
+        self.assertLessEqual(resultado['comparaciones'], 2 * 5 * resultado['equipos'])
+        self.assertEqual(len(resultado['grupos']), 1)
+
+    def test_fusionar_mueve_ordenes_y_planes(self):
+        orden = OrdenTrabajo.objects.create(
+            equipo=self.copia, codigo='OT-001', descripcion='Revisión', fecha_programada=date.today()
+        )
+        plan = PlanMantencion.objects.create(
+            equipo=self.sin_prefijo, nombre='Plan', descripcion='-', frecuencia='MEN',
+            duracion_estimada=2, procedimiento='-'
+        )
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post(
+            f'/api/equipos/{self.original.pk}/fusionar/',
+            {'duplicados': [self.copia.pk, self.sin_prefijo.pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, {'ordenes': 1, 'ordenes_archivadas': 0, 'planes': 1, 'planes_fusionados': 0, 'eliminados': 2}
+        )
+        orden.refresh_from_db()
+        plan.refresh_from_db()
+        self.assertEqual((orden.equipo_id, plan.equipo_id), (self.original.pk, self.original.pk))
+        self.assertFalse(Equipo.objects.filter(pk__in=[self.copia.pk, self.sin_prefijo.pk]).exists())
+
+    def test_fusionar_funde_planes_con_el_mismo_nombre(self):
+        def plan(equipo, nombre):
+            return PlanMantencion.objects.create(
+                equipo=equipo, nombre=nombre, descripcion='-', frecuencia='MEN', duracion_estimada=2, procedimiento='-'
+            )
+
+        conservado = plan(self.original, 'Mensual')
+        repetido, otro_repetido = plan(self.copia, 'Mensual'), plan(self.sin_prefijo, 'Mensual')
+        # Sin plan en el equipo conservado, queda el más antiguo de los duplicados
+        solo_copia, solo_sin_prefijo = plan(self.copia, 'Anual'), plan(self.sin_prefijo, 'Anual')
+        orden = OrdenTrabajo.objects.create(
+            equipo=self.copia, plan_mantencion=repetido, codigo='OT-001', descripcion='-', fecha_programada=date.today()
+        )
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post(
+            f'/api/equipos/{self.original.pk}/fusionar/',
+            {'duplicados': [self.copia.pk, self.sin_prefijo.pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['planes'], response.data['planes_fusionados']), (1, 3))
+        self.assertEqual(
+            sorted(PlanMantencion.objects.values_list('pk', 'equipo_id')),
+            [(conservado.pk, self.original.pk), (solo_copia.pk, self.original.pk)]
+        )
+        orden.refresh_from_db()
+        self.assertEqual((orden.equipo_id, orden.plan_mantencion_id), (self.original.pk, conservado.pk))
+        eliminados = [repetido.pk, otro_repetido.pk, solo_sin_prefijo.pk]
+        self.assertFalse(PlanMantencion.objects.filter(pk__in=eliminados).exists())
+
+    def test_fusion_con_equipo_inexistente_no_cambia_nada(self):
+        OrdenTrabajo.objects.create(
+            equipo=self.copia, codigo='OT-001', descripcion='Revisión', fecha_programada=date.today()
+        )
+        with self.assertRaises(Equipo.DoesNotExist):
+            duplicados.fusionar_equipos(self.original.pk, [self.copia.pk, 999999])
+        self.assertTrue(OrdenTrabajo.objects.filter(equipo=self.copia).exists())
+
+        # Solo el staff puede fusionar o buscar duplicados
+        self.client.force_authenticate(user=User.objects.create_user(username='otro', password='x'))
+        response = self.client.post(f'/api/equipos/{self.original.pk}/fusionar/', {'duplicados': [self.copia.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_busqueda_en_segundo_plano(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post('/api/equipos/duplicados/', {'umbral': 0.9}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        call_command('procesar_tareas', procesos=0, una_vez=True, stdout=StringIO())
+        tarea = Tarea.objects.get(pk=response.data['id'])
+        self.assertEqual(tarea.estado, 'FIN')
+        self.assertEqual(tarea.resultado['grupos'][0]['conservar'], self.original.pk)
+
+
+class EmpresasTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.empresas, self.clientes, self.equipos = [], [], []
+        for slug in ('norte', 'sur'):
+            empresa = Empresa.objects.create(nombre=slug.capitalize(), slug=slug)
+            usuario = User.objects.create_user(username=f'admin-{slug}', password='testpassword', is_staff=True)
+            empresa.usuarios.add(usuario)
+            # El mismo RUT y el mismo número de serie pueden repetirse entre empresas
+            cliente = Cliente.objects.create(
+                empresa=empresa, rut='11111111-1', razon_social=f'Cliente {slug}', giro='Pruebas',
+                direccion='Calle Falsa 123', telefono='999999999', email=f'{slug}@empresa.com'
+            )
+            equipo = Equipo.objects.create(
+                empresa=empresa, cliente=cliente, codigo='EQ-001', nombre='Compresor', marca='Atlas',
+                modelo='GA-11', numero_serie='SN-001', fecha_instalacion=date(2020, 1, 1), ubicacion='Planta 1'
+            )
+            OrdenTrabajo.objects.create(
+                empresa=empresa, equipo=equipo, codigo='OT-001', descripcion='Revisión',
+                fecha_programada=date.today(), costo_estimado=100, costo_real=100 if slug == 'norte' else 150
+            )
+            self.empresas.append(empresa)
+            self.clientes.append(cliente)
+            self.equipos.append(equipo)
+
+    def cliente_api(self, username, empresa=None):
+        datos = {'username': username, 'password': 'testpassword'}
+        if empresa:
+            datos['empresa'] = empresa
+        response = APIClient().post('/api/token/', datos, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        return api
+
+    def test_cada_empresa_ve_solo_sus_datos(self):
+        norte = self.cliente_api('admin-norte')
+        response = norte.get('/api/clientes/')
+        self.assertEqual([c['id'] for c in response.data['results']], [self.clientes[0].pk])
+        response = norte.get('/api/clientes/por-rut/11.111.111-1/')
+        self.assertEqual(response.data['id'], self.clientes[0].pk)
+
+        ajeno = self.clientes[1].pk
+        self.assertEqual(norte.get(f'/api/clientes/{ajeno}/').status_code, status.HTTP_404_NOT_FOUND)
+        response = norte.patch(f'/api/clientes/{ajeno}/', {'giro': 'Otro'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(norte.get(f'/api/equipos/{self.equipos[1].pk}/').status_code, status.HTTP_404_NOT_FOUND)
+        response = norte.get('/api/ordenes/', {'incluir_archivo': 1})
+        self.assertEqual(response.data['count'], 1)
+        response = norte.get('/api/usuarios/')
+        self.assertEqual([u['username'] for u in response.data['results']], ['admin-norte'])
+
+    def test_escrituras_quedan_en_la_empresa_del_token(self):
+        norte = self.cliente_api('admin-norte')
+        # Un equipo de otra empresa no se puede referenciar
+        response = norte.post('/api/ordenes/', {
+            'equipo': self.equipos[1].pk, 'descripcion': 'Revisión', 'fecha_programada': '2030-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('equipo', response.data)
+
+        # Unicidad por empresa
+        datos = {
+            'cliente': self.clientes[0].pk, 'codigo': 'EQ-001', 'nombre': 'Bomba', 'marca': 'KSB',
+            'modelo': 'X', 'numero_serie': 'SN-002', 'fecha_instalacion': '2021-01-01', 'ubicacion': 'Planta 2'
+        }
+        response = norte.post('/api/equipos/', datos, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('codigo', response.data)
+        response = norte.post('/api/equipos/', {**datos, 'codigo': 'EQ-002'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Equipo.objects.get(pk=response.data['id']).empresa, self.empresas[0])
+
+    def test_token_con_empresa_ajena_se_rechaza(self):
+        response = APIClient().post(
+            '/api/token/', {'username': 'admin-norte', 'password': 'testpassword', 'empresa': 'sur'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Un usuario de varias empresas elige con cuál trabajar
+        self.empresas[1].usuarios.add(User.objects.get(username='admin-norte'))
+        response = self.cliente_api('admin-norte', empresa='sur').get('/api/clientes/')
+        self.assertEqual([c['id'] for c in response.data['results']], [self.clientes[1].pk])
+
+    def test_cache_y_tareas_separadas_por_empresa(self):
+        norte, sur = self.cliente_api('admin-norte'), self.cliente_api('admin-sur')
+        self.assertEqual(norte.get('/api/ordenes/analisis_costos/').data['error_pct']['promedio'], 0.0)
+        # Con la caché compartida entre empresas, sur recibiría el resultado de norte
+        self.assertEqual(sur.get('/api/ordenes/analisis_costos/').data['error_pct']['promedio'], 50.0)
+
+        tarea_id = norte.post('/api/ordenes/estadisticas/').data['id']
+        call_command('procesar_tareas', procesos=0, una_vez=True, stdout=StringIO())
+        response = norte.get(f'/api/jobs/{tarea_id}/')
+        self.assertEqual(response.data['resultado']['por_estado'][0]['cantidad'], 1)
+        self.assertEqual(sur.get(f'/api/jobs/{tarea_id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_usuario_sin_empresa_usa_la_por_defecto(self):
+        usuario = User.objects.create_user(username='sin-empresa', password='testpassword')
+        api = self.cliente_api('sin-empresa')
+        self.assertEqual(api.get('/api/clientes/').data['count'], 0)
+        response = api.post('/api/clientes/', {
+            'rut': '11111111-1', 'razon_social': 'Cliente principal', 'giro': 'Pruebas',
+            'direccion': 'Calle 1', 'telefono': '1', 'email': 'p@empresa.com'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Cliente.objects.get(pk=response.data['id']).empresa.slug, settings.EMPRESA_POR_DEFECTO)
+
+        with override_settings(EMPRESA_POR_DEFECTO=None):
+            api = APIClient()
+            api.force_authenticate(user=usuario)
+            self.assertEqual(api.get('/api/clientes/').status_code, status.HTTP_403_FORBIDDEN)
+            response = api.post('/api/clientes/', {'rut': '22222222-2'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(APIClient().get('/api/clientes/').data['count'], 0)
+
+    def test_empresa_inactiva_no_cae_en_la_por_defecto(self):
+        Cliente.objects.create(
+            rut='22222222-2', razon_social='Cliente principal', giro='Pruebas',
+            direccion='Calle 1', telefono='1', email='p@empresa.com'
+        )
+        self.empresas[0].activo = False
+        self.empresas[0].save()
+        api = APIClient()
+        api.force_authenticate(user=User.objects.get(username='admin-norte'))
+        self.assertEqual(api.get('/api/clientes/').status_code, status.HTTP_403_FORBIDDEN)
+        response = APIClient().post(
+            '/api/token/', {'username': 'admin-norte', 'password': 'testpassword'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Un claim de empresa que no es un número se rechaza como token inválido
+        token = AccessToken.for_user(User.objects.get(username='admin-sur'))
+        token['empresa'] = 'sur'
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(api.get('/api/clientes/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_deja_de_valer_al_perder_la_empresa(self):
+        tokens = {}
+        for slug in ('norte', 'sur'):
+            tokens[slug] = APIClient().post(
+                '/api/token/', {'username': f'admin-{slug}', 'password': 'testpassword'}, format='json'
+            ).data
+
+        def estado(access):
+            api = APIClient()
+            api.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+            return api.get('/api/clientes/').status_code
+
+        self.assertEqual(estado(tokens['norte']['access']), status.HTTP_200_OK)
+        # Usuario quitado de la empresa: ni el token vigente ni uno renovado sirven
+        self.empresas[0].usuarios.remove(User.objects.get(username='admin-norte'))
+        self.assertEqual(estado(tokens['norte']['access']), status.HTTP_403_FORBIDDEN)
+        renovado = APIClient().post('/api/token/refresh/', {'refresh': tokens['norte']['refresh']}, format='json')
+        self.assertEqual(estado(renovado.data['access']), status.HTTP_403_FORBIDDEN)
+
+        # Empresa desactivada
+        self.empresas[1].activo = False
+        self.empresas[1].save()
+        self.assertEqual(estado(tokens['sur']['access']), status.HTTP_403_FORBIDDEN)
+
+
+class GeneradorDatosTests(TestCase):
+    opciones = {
+        'clientes': 3, 'equipos_por_cliente': 4, 'tecnicos': 3, 'planes_por_equipo': 2,
+        'ordenes': 300, 'semilla': 7, 'fecha_base': '2026-01-15',
+    }
+
+    def generar(self, **opciones):
+        call_command('generar_datos', **{**self.opciones, **opciones}, stdout=StringIO())
+        return Empresa.objects.get(slug=opciones['empresa'])
+
+    def filas(self, empresa):
+        return list(OrdenTrabajo.objects.filter(empresa=empresa).order_by('codigo').values_list(
+            'codigo', 'estado', 'prioridad', 'fecha_solicitud', 'fecha_fin', 'costo_estimado', 'costo_real',
+            'equipo__codigo', 'equipo__cliente__rut', 'tecnico__rut', 'plan_mantencion__nombre'
+        ))
+
+    def test_datos_deterministas_y_consistentes(self):
+        empresa = self.generar(empresa='uno')
+        self.assertEqual(Cliente.objects.filter(empresa=empresa).count(), 3)
+        self.assertEqual(Equipo.objects.filter(empresa=empresa).count(), 12)
+        self.assertEqual(PlanMantencion.objects.filter(empresa=empresa).count(), 24)
+        self.assertEqual(empresa.usuarios.count(), 3)
+        self.assertEqual(
+            set(Equipo.objects.filter(empresa=empresa).values_list('tipo', flat=True)),
+            {tipo for tipo, _ in Equipo.TIPO_EQUIPO_CHOICES}
+        )
+        for rut in Cliente.objects.filter(empresa=empresa).values_list('rut', flat=True):
+            separar_rut(rut)
+        self.assertEqual(self.filas(empresa), self.filas(self.generar(empresa='dos')))
+
+        ordenes = OrdenTrabajo.objects.filter(empresa=empresa)
+        limite = datetime(2026, 1, 15, 18, tzinfo=dt_timezone.utc)
+        self.assertEqual(ordenes.count(), 300)
+        self.assertGreater(ordenes.values('fecha_solicitud').distinct().count(), 250)
+        self.assertFalse(ordenes.filter(fecha_solicitud__gt=limite).exists())
+        self.assertFalse(ordenes.filter(estado='FIN').filter(Q(fecha_fin=None) | Q(costo_real=None)).exists())
+        self.assertFalse(ordenes.filter(fecha_fin__lt=F('fecha_inicio')).exists())
+        self.assertFalse(ordenes.filter(fecha_inicio__lt=F('fecha_solicitud')).exists())
+        # auto_now_add vuelve a funcionar después de generar
+        self.assertTrue(OrdenTrabajo._meta.get_field('fecha_solicitud').auto_now_add)
+
+    def test_fixture_reproduce_la_especificacion(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'datos.json')
+            self.generar(empresa='uno', guardar=ruta)
+            with open(ruta, encoding='utf-8') as archivo:
+                self.assertEqual(json.load(archivo)['semilla'], 7)
+            call_command('generar_datos', fixture=ruta, empresa='dos', stdout=StringIO())
+            self.assertEqual(
+                self.filas(Empresa.objects.get(slug='uno')), self.filas(Empresa.objects.get(slug='dos'))
+            )
+
+            # El mismo prefijo no se puede generar dos veces en una empresa
+            with self.assertRaises(CommandError):
+                call_command('generar_datos', fixture=ruta, empresa='dos', stdout=StringIO())
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                json.dump({'ordenes': 10, 'desconocida': 1}, archivo)
+            with self.assertRaises(CommandError):
+                call_command('generar_datos', fixture=ruta, stdout=StringIO())
+
+    def test_prefijos_no_chocan_en_la_misma_empresa(self):
+        # Antes los anagramas usaban el mismo rango de RUT
+        empresa = self.generar(empresa='uno', prefijo='GEN')
+        self.generar(empresa='uno', prefijo='NEG')
+        self.assertEqual(Cliente.objects.filter(empresa=empresa).count(), 6)
+        self.assertEqual(Tecnico.objects.filter(empresa=empresa).count(), 6)
+
+        with patch('api.generador.RUT_TRAMOS', 1):
+            self.generar(empresa='tres', prefijo='A')
+            with self.assertRaisesMessage(CommandError, 'ya están en uso'):
+                self.generar(empresa='tres', prefijo='B')
+        with self.assertRaisesMessage(CommandError, 'no puede superar'):
+            self.generar(empresa='dos', clientes=100001)
+
+        # Un choque que no se detecta antes de insertar también termina en CommandError
+        User.objects.create_user(username='x-uno-tec-0')
+        with self.assertRaisesMessage(CommandError, 'chocan con datos existentes'):
+            self.generar(empresa='uno', prefijo='X')
+
+
+@override_settings(PRESUPUESTO_FACTOR_MS=5)
+class PresupuestoTests(TestCase):
+    # Los tiempos tienen holgura en los tests; la cantidad de consultas es exacta
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generar_datos', empresa='principal', clientes=3, equipos_por_cliente=8, tecnicos=4,
+            planes_por_equipo=1, ordenes=60, semilla=3, stdout=StringIO()
+        )
+        cls.admin = User.objects.create_superuser(username='admin', password='x')
+        archivar_ordenes(dias=0)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(self.admin)
+
+    @verificar_presupuesto()
+    def test_endpoints_dentro_del_presupuesto(self):
+        orden = OrdenTrabajo.objects.first()
+        for url in [
+            '/api/clientes/', '/api/equipos/', '/api/tecnicos/', '/api/planes/', '/api/ordenes/',
+            '/api/ordenes/?incluir_archivo=1', f'/api/ordenes/{orden.pk}/', '/api/usuarios/',
+            '/admin/api/equipo/', '/admin/api/planmantencion/', '/admin/api/ordentrabajo/',
+            '/admin/api/ordentrabajoarchivada/', f'/admin/api/ordentrabajo/{orden.pk}/change/',
+            '/admin/api/ordentrabajo/add/',
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('X-Consultas', response)
+
+    def test_n_mas_uno_falla_en_modo_estricto(self):
+        # Sin select_related cada equipo consulta su cliente
+        with patch.object(EquipoViewSet, 'queryset', Equipo.objects.all()):
+            with self.assertLogs('api.presupuesto', 'WARNING') as logs:
+                with self.assertRaises(PresupuestoExcedido) as error:
+                    with verificar_presupuesto():
+                        self.client.get('/api/equipos/')
+        self.assertIn('EquipoViewSet.list', str(error.exception))
+        self.assertIn('consulta repetida 20 veces', str(error.exception))
+        # La pila señala la vista y el serializer que dispararon la consulta
+        self.assertIn('to_representation', logs.output[0])
+        self.assertIn('empresas.py', logs.output[0])
+
+        # Sin configurarlo no se mide: el runner de tests desactiva DEBUG
+        with patch.object(EquipoViewSet, 'queryset', Equipo.objects.all()), override_settings(PRESUPUESTO_ACTIVO=None):
+            self.assertNotIn('X-Consultas', self.client.get('/api/equipos/'))
+
+    async def test_mide_tambien_bajo_asgi(self):
+        with verificar_presupuesto():
+            response = await self.async_client.get('/api/clientes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Consultas']), 0)
+
+        # En modo estricto una petición ASGI que excede su presupuesto también falla
+        with patch.object(EquipoViewSet, 'queryset', Equipo.objects.all()):
+            with self.assertLogs('api.presupuesto', 'WARNING'), self.assertRaises(PresupuestoExcedido):
+                with verificar_presupuesto():
+                    await self.async_client.get('/api/equipos/')
+
+    def test_acciones_y_paginas_declaran_presupuesto(self):
+        for prefijo, viewset, basename in router.registry:
+            for ruta in router.get_routes(viewset):
+                for accion in ruta.mapping.values():
+                    if hasattr(viewset, accion):
+                        self.assertIn(accion, viewset.presupuesto, f'{viewset.__name__}.{accion}')
+        for model_admin in admin.site._registry.values():
+            if model_admin.opts.app_label == 'api':
+                self.assertEqual(
+                    set(model_admin.presupuesto), {'changelist', 'add', 'change', 'delete', 'history'},
+                    type(model_admin).__name__
+                )
+
+    def test_decorador_acota_el_bloque_y_guarda_perfil(self):
+        with self.assertRaises(PresupuestoExcedido):
+            with self.assertLogs('api.presupuesto', 'WARNING'):
+                with verificar_presupuesto(consultas=1):
+                    list(Cliente.objects.all())
+                    list(Equipo.objects.all())
+
+        with tempfile.TemporaryDirectory() as directorio, override_settings(PRESUPUESTO_PERFILES=directorio):
+            with verificar_presupuesto():
+                response = self.client.get('/api/ordenes/', HTTP_X_PERFIL='1')
+            ruta = os.path.join(directorio, response['X-Perfil'])
+            self.assertTrue(response['X-Perfil'].startswith('OrdenTrabajoViewSet.list-'))
+            # El archivo .prof es el formato estándar de cProfile
+            self.assertTrue(pstats.Stats(ruta).total_calls > 0)
@@ -0,0 +1,192 @@
+"""
+Limitación de tasa ponderada por costo.
+
+Cada petición consume unidades según lo pesada que sea (una búsqueda o una
+exportación cuesta más que un GET de detalle). Los contadores usan una
+ventana deslizante aproximada con dos ventanas fijas, por lo que cada
+verificación es una lectura múltiple y un incremento en la caché
+``THROTTLE_CACHE``, sin guardar el historial de peticiones.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Claim del token JWT que identifica a la integración que hace las peticiones
+CLAIM_CLIENTE = 'client_id'
+
+COSTOS_POR_DEFECTO = {
+	'detalle': 1,
+	'listado': 2,
+	'busqueda': 3,
+	'pagina_profunda': 3,
+	'escritura': 2,
+}
+
+
+def calcular_costo(request, view):
+	"""
+	Unidades que consume una petición. Las vistas pueden fijar el costo de sus
+	acciones con el atributo ``costos_throttle``; el resto se estima según el tipo.
+	"""
+	accion = getattr(view, 'action', None)
+	costo = getattr(view, 'costos_throttle', {}).get(accion)
+	if costo is not None:
+		return costo
+
+	costos = {**COSTOS_POR_DEFECTO, **getattr(settings, 'THROTTLE_COSTOS', {})}
+	if request.method not in SAFE_METHODS:
+		return costos['escritura']
+	if accion != 'list':
+		return costos['detalle']
+
+	costo = costos['listado']
+	if request.query_params.get(api_settings.SEARCH_PARAM):
+		costo += costos['busqueda']
+	pagina = request.query_params.get('page', '')
+	if pagina.isdigit() and int(pagina) > getattr(settings, 'THROTTLE_PAGINA_PROFUNDA', 10):
+		costo += costos['pagina_profunda']
+	return costo
+
+
+class ThrottlePonderado(SimpleRateThrottle):
+	"""Throttle base con costo por petición y ventana deslizante."""
+
+	def __init__(self):
+		self.cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+		super().__init__()
+
+	def get_rate(self):
+		# Se lee en cada instancia (y no al importar) para respetar cambios de configuración
+		return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+	def allow_request(self, request, view):
+		if self.rate is None:
+			return True
+		self.key = self.get_cache_key(request, view)
+		if self.key is None:
+			return True
+
+		self.now = time.time()
+		ventana = int(self.now // self.duration)
+		clave_actual = f'{self.key}:{ventana}'
+		clave_anterior = f'{self.key}:{ventana - 1}'
+		contadores = self.cache.get_many([clave_actual, clave_anterior])
+		actual = contadores.get(clave_actual, 0)
+		anterior = contadores.get(clave_anterior, 0)
+
+		# La ventana anterior pesa según cuánto de ella sigue dentro del intervalo
+		transcurrido = (self.now % self.duration) / self.duration
+		consumido = anterior * (1 - transcurrido) + actual
+		costo = calcular_costo(request, view)
+
+		permitido = consumido + costo <= self.num_requests
+		if permitido:
+			if not self.cache.add(clave_actual, costo, self.duration * 2):
+				try:
+					self.cache.incr(clave_actual, costo)
+				except ValueError:
+					# La clave expiró entre add() e incr()
+					self.cache.set(clave_actual, costo, self.duration * 2)
+			consumido += costo
+			self.espera = 0
+		else:
+			self.espera = self.calcular_espera(anterior, actual, costo, transcurrido)
+
+		self.registrar_estado(request, max(0, self.num_requests - consumido))
+		return permitido
+
+	def calcular_espera(self, anterior, actual, costo, transcurrido):
+		"""Segundos hasta que la petición cabría en la ventana deslizante."""
+		fin_ventana = (1 - transcurrido) * self.duration
+		exceso = anterior * (1 - transcurrido) + actual + costo - self.num_requests
+		# Mientras dure la ventana actual, solo se diluye el peso de la anterior
+		if anterior and exceso * self.duration / anterior <= fin_ventana:
+			return exceso * self.duration / anterior
+		# Después, la ventana actual pasa a ser la anterior y se diluye a su vez
+		exceso = actual + costo - self.num_requests
+		return fin_ventana + max(0, exceso) * self.duration / max(actual, 1)
+
+	def wait(self):
+		return self.espera
+
+	def registrar_estado(self, request, restante):
+		"""Guarda el estado más restrictivo para los encabezados X-RateLimit-*."""
+		estado = {
+			'limite': self.num_requests,
+			'restante': int(restante),
+			'reinicio': int(self.duration - self.now % self.duration),
+		}
+		anterior = getattr(request._request, 'limite_tasa', None)
+		if anterior is None or estado['restante'] < anterior['restante']:
+			request._request.limite_tasa = estado
+
+
+class ThrottleUsuario(ThrottlePonderado):
+	"""Límite por usuario autenticado."""
+	scope = 'usuario'
+
+	def get_cache_key(self, request, view):
+		if not request.user or not request.user.is_authenticated:
+			return None
+		return f'throttle_{self.scope}_{request.user.pk}'
+
+
+class ThrottleClienteJWT(ThrottlePonderado):
+	"""
+	Límite por integración: agrupa todas las peticiones cuyo token JWT trae el
+	mismo claim ``client_id`` (se pide al obtener el token en /api/token/),
+	aunque usen distintos usuarios. Cada empresa tiene sus propios contadores.
+	"""
+	scope = 'cliente_jwt'
+
+	def get_cache_key(self, request, view):
+		token = request.auth
+		if token is None or not hasattr(token, 'get'):
+			return None
+		cliente = token.get(CLAIM_CLIENTE)
+		if not cliente:
+			return None
+		empresa = token.get(getattr(settings, 'EMPRESA_CLAIM', 'empresa'))
+		return f'throttle_{self.scope}_{empresa}_{cliente}'
+
+
+class ThrottleAnonimo(ThrottlePonderado):
+	"""Límite por dirección IP para peticiones anónimas."""
+	scope = 'anonimo'
+
+	def get_cache_key(self, request, view):
+		if request.user and request.user.is_authenticated:
+			return None
+		return f'throttle_{self.scope}_{self.get_ident(request)}'
+
+
+class EncabezadosLimiteMiddleware:
+	"""Agrega los encabezados X-RateLimit-* calculados por los throttles."""
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(self.get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		return self.agregar_encabezados(request, self.get_response(request))
+
+	async def __acall__(self, request):
+		return self.agregar_encabezados(request, await self.get_response(request))
+
+	def agregar_encabezados(self, request, response):
+		estado = getattr(request, 'limite_tasa', None)
+		if estado is not None:
+			response['X-RateLimit-Limit'] = estado['limite']
+			response['X-RateLimit-Remaining'] = estado['restante']
+			response['X-RateLimit-Reset'] = estado['reinicio']
+		return response
@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
 	ClienteViewSet, EquipoViewSet, TecnicoViewSet,
-	PlanMantencionViewSet, OrdenTrabajoViewSet, UserViewSet
+	PlanMantencionViewSet, OrdenTrabajoViewSet, TareaViewSet, UserViewSet,
+	RegistroAuditoriaViewSet, eventos_ordenes
 )
 
 # Crear el router y registrar los ViewSets
@@ -13,8 +14,12 @@ router.register(r'tecnicos', TecnicoViewSet, basename='tecnico')
 router.register(r'planes', PlanMantencionViewSet, basename='plan-mantencion')
 router.register(r'ordenes', OrdenTrabajoViewSet, basename='orden-trabajo')
 router.register(r'usuarios', UserViewSet, basename='usuario')
+router.register(r'jobs', TareaViewSet, basename='job')
+router.register(r'auditoria', RegistroAuditoriaViewSet, basename='auditoria')
 
 # Las URLs son generadas automáticamente por el router
 urlpatterns = [
+	# Debe ir antes del router para no confundirse con /ordenes/{id}/
+	path('ordenes/eventos/', eventos_ordenes, name='orden-trabajo-eventos'),
 	path('', include(router.urls)),
 ]
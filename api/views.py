@@ -1,16 +1,89 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
-from .models import Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import prefetch_related_objects
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+from .rut import separar_rut
+from .archivo import unir_con_archivo
+from .eventos import CAMPOS_FILTRO, flujo_sse, obtener_broker
+from .duplicados import fusionar_equipos
+from .empresas import SIN_EMPRESA, EmpresaMixin, empresa_por_defecto_id, resolver_empresa
+from .geo import FiltroCercania, agrupar_por_cercania, ordenar_recorrido, parsear_radio
+from .idempotencia import IdempotenciaMixin
+from .presupuesto import PRESUPUESTO_CRUD, PRESUPUESTO_LECTURA
+from .models import (
+	Cliente, Equipo, Tecnico, PlanMantencion, OrdenTrabajo, OrdenTrabajoArchivada, RegistroAuditoria, Tarea
+)
 from .serializers import (
 	ClienteSerializer, EquipoSerializer, TecnicoSerializer, 
-	PlanMantencionSerializer, OrdenTrabajoSerializer, UserSerializer
+	PlanMantencionSerializer, OrdenTrabajoSerializer, UserSerializer, TareaSerializer,
+	RegistroAuditoriaSerializer
 )
+from .tareas import encolar
+
+# Relaciones que OrdenTrabajoSerializer recorre por cada orden
+RELACIONES_ORDEN = ('equipo', 'tecnico__usuario', 'plan_mantencion')
+
+
+def respuesta_tarea(tarea):
+	"""Respuesta 202 con la tarea encolada y la URL para consultar su avance."""
+	return Response(
+		TareaSerializer(tarea).data,
+		status=status.HTTP_202_ACCEPTED,
+		headers={'Location': f'/api/jobs/{tarea.pk}/'}
+	)
+
+
+class PorRutMixin:
+	"""Agrega la búsqueda exacta por RUT usando el índice de rut_numero."""
+
+	@action(detail=False, methods=['get'], url_path=r'por-rut/(?P<rut>[0-9kK.\-]+)')
+	def por_rut(self, request, rut=None):
+		"""Endpoint para obtener un registro por su RUT, en cualquier formato."""
+		try:
+			numero, _ = separar_rut(rut)
+		except ValueError as exc:
+			return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+		# rut_numero no es único: los registros antiguos pueden repetir el RUT con
+		# otro formato. Se entrega siempre el más antiguo
+		instancia = self.get_queryset().filter(rut_numero=numero).order_by('pk').first()
+		if instancia is None:
+			raise Http404
+		self.check_object_permissions(request, instancia)
+		serializer = self.get_serializer(instancia)
+		return Response(serializer.data)
+
 
+class HistorialMixin:
+	"""Agrega el historial de cambios de un objeto desde el registro de auditoría."""
 
-class ClienteViewSet(viewsets.ModelViewSet):
+	@action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+	def historial(self, request, pk=None):
+		"""Endpoint para obtener los cambios de un registro, del más reciente al más antiguo."""
+		try:
+			objeto_id = int(pk)
+		except ValueError:
+			raise Http404
+		# Se consulta por id para incluir también los objetos ya eliminados
+		queryset = RegistroAuditoria.objects.filter(
+			modelo=self.get_queryset().model._meta.model_name, objeto_id=objeto_id
+		)
+		page = self.paginate_queryset(queryset)
+		if page is not None:
+			return self.get_paginated_response(RegistroAuditoriaSerializer(page, many=True).data)
+		return Response(RegistroAuditoriaSerializer(queryset, many=True).data)
+
+
+class ClienteViewSet(EmpresaMixin, PorRutMixin, HistorialMixin, IdempotenciaMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet para gestionar clientes.
 	- GET /api/clientes/ : Listar todos los clientes
@@ -18,6 +91,8 @@ class ClienteViewSet(viewsets.ModelViewSet):
 	- GET /api/clientes/{id}/ : Obtener detalles de un cliente
 	- PUT /api/clientes/{id}/ : Actualizar cliente (requiere autenticación)
 	- DELETE /api/clientes/{id}/ : Eliminar cliente (requiere autenticación)
+	- GET /api/clientes/{id}/historial/ : Historial de cambios (solo staff)
+	- GET /api/clientes/por-rut/{rut}/ : Obtener un cliente por RUT
 	"""
 	queryset = Cliente.objects.all()
 	serializer_class = ClienteSerializer
@@ -26,9 +101,10 @@ class ClienteViewSet(viewsets.ModelViewSet):
 	search_fields = ['razon_social', 'rut', 'email']
 	ordering_fields = ['razon_social', 'fecha_registro']
 	ordering = ['razon_social']
+	presupuesto = {**PRESUPUESTO_CRUD, 'por_rut': (8, 200)}
 
 
-class EquipoViewSet(viewsets.ModelViewSet):
+class EquipoViewSet(EmpresaMixin, HistorialMixin, IdempotenciaMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet para gestionar equipos.
 	- GET /api/equipos/ : Listar todos los equipos
@@ -36,10 +112,19 @@ class EquipoViewSet(viewsets.ModelViewSet):
 	- GET /api/equipos/{id}/ : Obtener detalles de un equipo
 	- PUT /api/equipos/{id}/ : Actualizar equipo (requiere autenticación)
 	- DELETE /api/equipos/{id}/ : Eliminar equipo (requiere autenticación)
+	- GET /api/equipos/{id}/historial/ : Historial de cambios (solo staff)
+	- GET /api/equipos/?cerca=lat,lon&radio=km : Equipos dentro del radio, del más cercano al más lejano
+	- POST /api/equipos/duplicados/ : Encolar la búsqueda de equipos duplicados (solo staff)
+	- POST /api/equipos/{id}/fusionar/ : Fusionar equipos duplicados en este (solo staff)
 	"""
-	queryset = Equipo.objects.all()
+	queryset = Equipo.objects.select_related('cliente')
 	serializer_class = EquipoSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly]
+	filter_backends = [*api_settings.DEFAULT_FILTER_BACKENDS, FiltroCercania]
+	# Un equipo sin coordenadas se ubica en las de su cliente
+	campos_cercania = [('latitud', 'longitud'), ('cliente__latitud', 'cliente__longitud')]
+	costos_throttle = {'duplicados': 20}
+	presupuesto = {**PRESUPUESTO_CRUD, 'ficha_tecnica': (8, 200), 'duplicados': (8, 200), 'fusionar': (25, 1000)}
 	filterset_fields = ['cliente', 'tipo', 'activo']
 	search_fields = ['codigo', 'nombre', 'marca', 'numero_serie']
 	ordering_fields = ['codigo', 'fecha_instalacion']
@@ -61,8 +146,49 @@ class EquipoViewSet(viewsets.ModelViewSet):
 			'ubicacion': equipo.ubicacion,
 		})
 
+	@action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+	def duplicados(self, request):
+		"""Endpoint para buscar equipos duplicados en segundo plano."""
+		parametros = {}
+		try:
+			if request.data.get('umbral') is not None:
+				parametros['umbral'] = float(request.data['umbral'])
+				if not 0 < parametros['umbral'] <= 1:
+					raise ValueError
+			if request.data.get('ventana') is not None:
+				parametros['ventana'] = int(request.data['ventana'])
+				if parametros['ventana'] < 1:
+					raise ValueError
+		except (TypeError, ValueError):
+			return Response(
+				{'error': 'umbral debe estar entre 0 y 1 y ventana debe ser un entero positivo.'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		return respuesta_tarea(encolar('duplicados_equipos', parametros, request.user))
 
-class TecnicoViewSet(viewsets.ModelViewSet):
+	@action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+	def fusionar(self, request, pk=None):
+		"""
+		Endpoint para fusionar equipos duplicados en este: sus órdenes y planes
+		pasan a este equipo y los duplicados se eliminan, todo en una transacción.
+		"""
+		equipo = self.get_object()
+		duplicados = request.data.get('duplicados')
+		if not isinstance(duplicados, list) or not all(isinstance(d, int) for d in duplicados):
+			return Response(
+				{'error': 'duplicados debe ser una lista de ids de equipos.'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		try:
+			resultado = fusionar_equipos(equipo.pk, duplicados)
+		except ValueError as exc:
+			return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+		except Equipo.DoesNotExist as exc:
+			return Response({'error': str(exc)}, status=status.HTTP_404_NOT_FOUND)
+		return Response(resultado)
+
+
+class TecnicoViewSet(EmpresaMixin, PorRutMixin, HistorialMixin, IdempotenciaMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet para gestionar técnicos.
 	- GET /api/tecnicos/ : Listar todos los técnicos
@@ -70,17 +196,67 @@ class TecnicoViewSet(viewsets.ModelViewSet):
 	- GET /api/tecnicos/{id}/ : Obtener detalles de un técnico
 	- PUT /api/tecnicos/{id}/ : Actualizar técnico (requiere autenticación)
 	- DELETE /api/tecnicos/{id}/ : Eliminar técnico (requiere autenticación)
+	- GET /api/tecnicos/{id}/historial/ : Historial de cambios (solo staff)
+	- GET /api/tecnicos/por-rut/{rut}/ : Obtener un técnico por RUT
+	- GET /api/tecnicos/{id}/rutas/?radio=km : Órdenes pendientes agrupadas en rutas por cercanía
 	"""
-	queryset = Tecnico.objects.all()
+	queryset = Tecnico.objects.select_related('usuario')
 	serializer_class = TecnicoSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly]
 	filterset_fields = ['especialidad', 'activo']
 	search_fields = ['usuario__last_name', 'usuario__first_name', 'rut']
 	ordering_fields = ['usuario__last_name', 'fecha_contratacion']
 	ordering = ['usuario__last_name']
+	costos_throttle = {'rutas': 5}
+	presupuesto = {**PRESUPUESTO_CRUD, 'por_rut': (8, 200), 'rutas': (8, 500)}
+
+	@action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+	def rutas(self, request, pk=None):
+		"""
+		Endpoint para agrupar las órdenes pendientes y en proceso del técnico en
+		lotes cercanos entre sí. Cada lote parte por su orden más prioritaria y
+		sigue por vecino más cercano. Las órdenes sin coordenadas se listan aparte.
+		"""
+		tecnico = self.get_object()
+		try:
+			radio = parsear_radio(request.query_params.get('radio'))
+		except ValueError as exc:
+			return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+		filas = tecnico.ordenes_trabajo.filter(estado__in=['PEN', 'PRO']).values_list(
+			'pk', 'codigo', 'prioridad', 'fecha_programada',
+			'equipo__latitud', 'equipo__longitud', 'equipo__cliente__latitud', 'equipo__cliente__longitud',
+		)
+		rango = {'URG': 0, 'ALT': 1, 'MED': 2, 'BAJ': 3}
+		ordenes, puntos, sin_ubicacion = {}, [], []
+		for pk, codigo, prioridad, fecha, lat, lon, lat_cliente, lon_cliente in filas:
+			if lat is None:
+				lat, lon = lat_cliente, lon_cliente
+			if lat is None:
+				sin_ubicacion.append({'id': pk, 'codigo': codigo})
+				continue
+			ordenes[pk] = {'id': pk, 'codigo': codigo, 'prioridad': prioridad, 'fecha_programada': fecha}
+			puntos.append((pk, lat, lon))
+
+		lotes = []
+		for grupo in agrupar_por_cercania(puntos, radio):
+			grupo.sort(key=lambda p: (rango.get(ordenes[p[0]]['prioridad'], 4), ordenes[p[0]]['fecha_programada']))
+			recorrido = ordenar_recorrido(grupo)
+			lotes.append({
+				'centro': {
+					'latitud': round(sum(p[1] for p in grupo) / len(grupo), 6),
+					'longitud': round(sum(p[2] for p in grupo) / len(grupo), 6),
+				},
+				'ordenes': [
+					{**ordenes[pk], 'latitud': lat, 'longitud': lon} for pk, lat, lon in recorrido
+				],
+			})
+		# Primero los lotes con las órdenes más urgentes y, a igual urgencia, los más grandes
+		lotes.sort(key=lambda l: (rango.get(l['ordenes'][0]['prioridad'], 4), -len(l['ordenes'])))
+		return Response({'radio_km': radio, 'lotes': lotes, 'sin_ubicacion': sin_ubicacion})
 
 
-class PlanMantencionViewSet(viewsets.ModelViewSet):
+class PlanMantencionViewSet(EmpresaMixin, HistorialMixin, IdempotenciaMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet para gestionar planes de mantención.
 	- GET /api/planes/ : Listar todos los planes
@@ -88,33 +264,89 @@ class PlanMantencionViewSet(viewsets.ModelViewSet):
 	- GET /api/planes/{id}/ : Obtener detalles de un plan
 	- PUT /api/planes/{id}/ : Actualizar plan (requiere autenticación)
 	- DELETE /api/planes/{id}/ : Eliminar plan (requiere autenticación)
+	- GET /api/planes/{id}/historial/ : Historial de cambios (solo staff)
 	"""
-	queryset = PlanMantencion.objects.all()
+	queryset = PlanMantencion.objects.select_related('equipo')
 	serializer_class = PlanMantencionSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly]
 	filterset_fields = ['equipo', 'frecuencia', 'activo']
 	search_fields = ['nombre', 'equipo__codigo']
 	ordering_fields = ['nombre', 'frecuencia']
 	ordering = ['nombre']
+	presupuesto = PRESUPUESTO_CRUD
 
 
-class OrdenTrabajoViewSet(viewsets.ModelViewSet):
+class OrdenTrabajoViewSet(EmpresaMixin, HistorialMixin, IdempotenciaMixin, viewsets.ModelViewSet):
 	"""
 	ViewSet para gestionar órdenes de trabajo.
-	- GET /api/ordenes/ : Listar todas las órdenes
+	- GET /api/ordenes/ : Listar las órdenes activas (?incluir_archivo=1 incluye las archivadas)
 	- POST /api/ordenes/ : Crear nueva orden (requiere autenticación)
-	- GET /api/ordenes/{id}/ : Obtener detalles de una orden
+	- GET /api/ordenes/{id}/ : Obtener detalles de una orden (busca también en el archivo)
 	- PUT /api/ordenes/{id}/ : Actualizar orden (requiere autenticación)
 	- DELETE /api/ordenes/{id}/ : Eliminar orden (requiere autenticación)
+	- GET /api/ordenes/{id}/historial/ : Historial de cambios (solo staff)
 	- GET /api/ordenes/{id}/cambiar_estado/ : Cambiar estado de la orden
+	- POST /api/ordenes/exportar/ : Encolar la exportación de órdenes a CSV
+	- POST /api/ordenes/estadisticas/ : Encolar el cálculo de estadísticas
+	- GET /api/ordenes/analisis_costos/ : Análisis de precisión de costos estimados
+	- GET /api/ordenes/?cerca=lat,lon&radio=km : Órdenes cuyo equipo está dentro del radio
 	"""
-	queryset = OrdenTrabajo.objects.all()
+	queryset = OrdenTrabajo.objects.select_related(*RELACIONES_ORDEN)
 	serializer_class = OrdenTrabajoSerializer
 	permission_classes = [IsAuthenticatedOrReadOnly]
+	filter_backends = [*api_settings.DEFAULT_FILTER_BACKENDS, FiltroCercania]
+	campos_cercania = [('equipo__latitud', 'equipo__longitud'), ('equipo__cliente__latitud', 'equipo__cliente__longitud')]
 	filterset_fields = ['equipo', 'tecnico', 'estado', 'prioridad']
 	search_fields = ['codigo', 'descripcion', 'equipo__codigo']
 	ordering_fields = ['fecha_solicitud', 'fecha_programada', 'prioridad']
 	ordering = ['-fecha_solicitud']
+	# Unidades de limitación de tasa para las acciones más pesadas
+	costos_throttle = {'exportar': 20, 'estadisticas': 10, 'analisis_costos': 10}
+	presupuesto = {
+		**PRESUPUESTO_CRUD,
+		# Con ?incluir_archivo=1: conteo del UNION y carga de las relaciones por página
+		'list': (10, 400),
+		'cambiar_estado': (10, 300), 'exportar': (8, 200), 'estadisticas': (8, 200), 'analisis_costos': (10, 1000),
+	}
+
+	def incluir_archivo(self):
+		"""Indica si la consulta debe abarcar también las órdenes archivadas."""
+		return self.request.query_params.get('incluir_archivo') in ('1', 'true', 'True')
+
+	def list(self, request, *args, **kwargs):
+		if not self.incluir_archivo():
+			return super().list(request, *args, **kwargs)
+
+		# Los filtros se aplican por separado a cada tabla antes de combinarlas
+		activas = self.filter_queryset(self.get_queryset())
+		archivadas = self.filter_queryset(OrdenTrabajoArchivada.objects.all())
+		queryset = unir_con_archivo(activas, archivadas)
+
+		# select_related no se aplica a un UNION: las relaciones se cargan por página
+		page = self.paginate_queryset(queryset)
+		if page is not None:
+			prefetch_related_objects(page, *RELACIONES_ORDEN)
+			serializer = self.get_serializer(page, many=True)
+			return self.get_paginated_response(serializer.data)
+		ordenes = list(queryset)
+		prefetch_related_objects(ordenes, *RELACIONES_ORDEN)
+		serializer = self.get_serializer(ordenes, many=True)
+		return Response(serializer.data)
+
+	def get_object(self):
+		try:
+			return super().get_object()
+		except Http404:
+			# Las órdenes archivadas son de solo lectura
+			if self.request.method not in SAFE_METHODS:
+				raise
+			lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+			orden = get_object_or_404(
+				OrdenTrabajoArchivada.objects.select_related(*RELACIONES_ORDEN),
+				**{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+			)
+			self.check_object_permissions(self.request, orden)
+			return orden
 
 	@action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
 	def cambiar_estado(self, request, pk=None):
@@ -136,16 +368,149 @@ class OrdenTrabajoViewSet(viewsets.ModelViewSet):
 		serializer = self.get_serializer(orden)
 		return Response(serializer.data, status=status.HTTP_200_OK)
 
+	@action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+	def exportar(self, request):
+		"""Endpoint para exportar órdenes a CSV en segundo plano."""
+		estado = request.data.get('estado')
+		estados_validos = [choice[0] for choice in OrdenTrabajo.ESTADO_CHOICES]
+		if estado and estado not in estados_validos:
+			return Response(
+				{'error': f'Estado inválido. Estados válidos: {estados_validos}'},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		return respuesta_tarea(encolar('exportar_ordenes', {'estado': estado}, request.user))
+
+	@action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+	def estadisticas(self, request):
+		"""Endpoint para recalcular las estadísticas de órdenes en segundo plano."""
+		return respuesta_tarea(encolar('estadisticas_ordenes', usuario=request.user))
+
+	@action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+	def analisis_costos(self, request):
+		"""
+		Endpoint para analizar el error entre costo estimado y real.
+		Acepta los filtros desde, hasta, cliente, tipo, tecnico y frecuencia.
+		"""
+		# NumPy se importa recién al primer análisis (o en la precarga del maestro)
+		from .analitica import FILTROS, analizar_costos_cacheado
+
+		filtros = {nombre: request.query_params.get(nombre) for nombre in FILTROS}
+		try:
+			resultado = analizar_costos_cacheado(filtros)
+		except (ValueError, DjangoValidationError) as exc:
+			return Response({'error': f'Filtro inválido: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+		return Response(resultado)
+
+
+class TareaViewSet(EmpresaMixin, viewsets.ReadOnlyModelViewSet):
+	"""
+	ViewSet para consultar tareas en segundo plano (solo lectura).
+	- GET /api/jobs/ : Listar las tareas del usuario
+	- GET /api/jobs/{id}/ : Consultar estado, progreso y resultado de una tarea
+	"""
+	serializer_class = TareaSerializer
+	permission_classes = [IsAuthenticated]
+	filterset_fields = ['tipo', 'estado']
+	ordering_fields = ['fecha_creacion']
+	ordering = ['-fecha_creacion']
+	presupuesto = PRESUPUESTO_LECTURA
+
+	queryset = Tarea.objects.all()
+
+	def get_queryset(self):
+		# Cada usuario ve solo sus tareas; el staff ve todas las de su empresa
+		queryset = super().get_queryset()
+		if self.request.user.is_staff:
+			return queryset
+		return queryset.filter(creado_por=self.request.user)
+
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class RegistroAuditoriaViewSet(EmpresaMixin, viewsets.ReadOnlyModelViewSet):
+	"""
+	ViewSet para consultar el registro de auditoría (solo lectura, solo staff).
+	- GET /api/auditoria/ : Listar cambios (filtros modelo, objeto_id, accion, usuario, fecha__gte, fecha__lte)
+	- GET /api/auditoria/{id}/ : Obtener un registro de cambio
+	"""
+	queryset = RegistroAuditoria.objects.all()
+	serializer_class = RegistroAuditoriaSerializer
+	permission_classes = [IsAdminUser]
+	filterset_fields = {
+		'modelo': ['exact'],
+		'objeto_id': ['exact'],
+		'accion': ['exact'],
+		'usuario': ['exact'],
+		'fecha': ['gte', 'lte'],
+	}
+	ordering_fields = ['fecha']
+	ordering = ['-fecha', '-id']
+	presupuesto = PRESUPUESTO_LECTURA
+
+
+class UserViewSet(EmpresaMixin, viewsets.ReadOnlyModelViewSet):
 	"""
 	ViewSet para gestionar usuarios (solo lectura).
-	- GET /api/usuarios/ : Listar todos los usuarios
+	- GET /api/usuarios/ : Listar los usuarios de la empresa
 	- GET /api/usuarios/{id}/ : Obtener detalles de un usuario
 	"""
 	queryset = User.objects.all()
 	serializer_class = UserSerializer
 	permission_classes = [IsAuthenticated]
+	campo_empresa = 'empresas'
 	search_fields = ['username', 'email', 'first_name', 'last_name']
 	ordering_fields = ['username', 'date_joined']
 	ordering = ['username']
+	presupuesto = PRESUPUESTO_LECTURA
+
+	def get_queryset(self):
+		queryset = super().get_queryset()
+		if self.empresa_id and self.empresa_id == empresa_por_defecto_id():
+			# Los usuarios sin empresa asignada trabajan en la empresa por defecto
+			queryset = queryset | User.objects.filter(empresas=None)
+		return queryset.distinct()
+
+
+def empresa_autenticada(request):
+	"""
+	Autentica una petición que no pasa por DRF (token JWT o sesión) y retorna
+	la empresa del usuario, SIN_EMPRESA si no tiene, o None si es anónimo.
+	"""
+	request = Request(request, authenticators=[clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+	if not request.user.is_authenticated:
+		return None
+	return resolver_empresa(request) or SIN_EMPRESA
+
+
+@require_GET
+async def eventos_ordenes(request):
+	"""
+	Flujo Server-Sent Events con los cambios de órdenes de trabajo (requiere ASGI).
+	- GET /api/ordenes/eventos/ : Creaciones, actualizaciones y cambios de estado
+	Filtros opcionales: tecnico, equipo, cliente y estado (varios valores separados por coma).
+	El encabezado Last-Event-ID (o ?desde=) retoma el flujo desde el último evento recibido.
+	Requiere autenticación; solo se reciben los eventos de la empresa del usuario.
+	"""
+	try:
+		empresa = await sync_to_async(empresa_autenticada)(request)
+	except AuthenticationFailed as exc:
+		return JsonResponse({'error': str(exc.detail)}, status=401)
+	if empresa is None:
+		return JsonResponse({'error': 'Se requiere autenticación.'}, status=401)
+	if not empresa:
+		return JsonResponse({'error': 'El usuario no pertenece a ninguna empresa.'}, status=403)
+	filtros = {
+		campo: set(request.GET[campo].split(','))
+		for campo in CAMPOS_FILTRO if request.GET.get(campo)
+	}
+	filtros['empresa'] = {str(empresa)}
+	desde = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+	try:
+		desde = int(desde) if desde else None
+	except ValueError:
+		return JsonResponse({'error': 'El id de evento debe ser un número.'}, status=400)
+
+	response = StreamingHttpResponse(
+		flujo_sse(obtener_broker(), filtros, desde), content_type='text/event-stream'
+	)
+	response['Cache-Control'] = 'no-cache'
+	response['X-Accel-Buffering'] = 'no'
+	return response
@@ -0,0 +1,109 @@
+"""
+Utilidades de arranque de los workers.
+
+- ``medir_arranque`` configura Django instrumentando cada app instalada y
+  reporta el tiempo y la memoria residente (RSS) que agrega cada una.
+  Se ejecuta en un proceso limpio con ``python -m config.arranque``.
+- ``precargar`` deja importado todo lo que los workers usarán y congela los
+  objetos en el recolector de basura. Llamada en el proceso maestro antes de
+  forkear (por ejemplo ``gunicorn --preload``), permite que los workers
+  compartan esas páginas de memoria por copy-on-write.
+"""
+
+import gc
+import importlib
+import json
+import os
+import sys
+import time
+
+
+def rss_kb():
+    """Memoria residente actual del proceso en KB."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        # Sin /proc (macOS, Windows) se usa el máximo residente
+        import resource
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo // 1024 if sys.platform == 'darwin' else maximo
+
+
+def _instrumentar_apps(mediciones):
+    """
+    Envuelve la creación, la carga de modelos y el ready() de cada AppConfig
+    para acumular en ``mediciones`` el tiempo y la memoria de cada fase.
+    """
+    from django.apps.config import AppConfig
+
+    crear_original = AppConfig.create.__func__
+
+    def medir(etiqueta, fase, funcion, *args):
+        inicio, memoria = time.perf_counter(), rss_kb()
+        resultado = funcion(*args)
+        fila = mediciones.setdefault(etiqueta, {'app': etiqueta, 'ms': 0.0, 'rss_kb': 0})
+        fila[f'{fase}_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        fila['ms'] = round(fila['ms'] + fila[f'{fase}_ms'], 2)
+        fila['rss_kb'] += rss_kb() - memoria
+        return resultado
+
+    def crear(cls, entry):
+        app_config = medir(entry, 'config', crear_original, cls, entry)
+        import_models, ready = app_config.import_models, app_config.ready
+        app_config.import_models = lambda: medir(entry, 'modelos', import_models)
+        app_config.ready = lambda: medir(entry, 'ready', ready)
+        return app_config
+
+    AppConfig.create = classmethod(crear)
+
+
+def medir_arranque():
+    """Configura Django desde cero y retorna el detalle de tiempo y memoria."""
+    inicio, memoria = time.perf_counter(), rss_kb()
+    mediciones = {}
+    _instrumentar_apps(mediciones)
+
+    import django
+    django.setup()
+    setup_ms = (time.perf_counter() - inicio) * 1000
+
+    # Las URLs importan vistas, serializers y el resto de la pila de DRF
+    inicio_urls, memoria_urls = time.perf_counter(), rss_kb()
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    urls_ms = (time.perf_counter() - inicio_urls) * 1000
+
+    from django.conf import settings
+    return {
+        'settings': settings.SETTINGS_MODULE,
+        'setup_ms': round(setup_ms, 2),
+        'urls_ms': round(urls_ms, 2),
+        'urls_rss_kb': rss_kb() - memoria_urls,
+        'total_ms': round(setup_ms + urls_ms, 2),
+        'rss_inicial_kb': memoria,
+        'rss_kb': rss_kb(),
+        'modulos': len(sys.modules),
+        'apps': list(mediciones.values()),
+    }
+
+
+def precargar():
+    """
+    Importa URLs, vistas y los módulos de PRECARGAR_MODULOS, y congela el
+    heap actual con gc.freeze() para que el recolector no escriba en esas
+    páginas en los workers (lo que rompería el copy-on-write).
+    """
+    from django.conf import settings
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    for modulo in getattr(settings, 'PRECARGAR_MODULOS', []):
+        importlib.import_module(modulo)
+    gc.collect()
+    gc.freeze()
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    print(json.dumps(medir_arranque()))
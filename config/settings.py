@@ -56,6 +56,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.throttling.EncabezadosLimiteMiddleware',
+    'api.auditoria.AuditoriaMiddleware',
+    'api.presupuesto.PresupuestoMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -78,6 +81,13 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 
+# Módulos pesados que se importan en el proceso maestro antes de forkear
+# los workers (ver config/arranque.py), para compartirlos por copy-on-write.
+# Vacío por defecto: precargar 'api.analitica' (numpy) solo conviene si los
+# workers atienden el análisis de costos; si no, agrega memoria a cada proceso
+PRECARGAR_MODULOS = []
+
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
@@ -108,8 +118,97 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Limitación de tasa ponderada por costo (ver api/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ThrottleUsuario',
+        'api.throttling.ThrottleClienteJWT',
+        'api.throttling.ThrottleAnonimo',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'usuario': '1200/min',
+        'cliente_jwt': '3000/min',
+        'anonimo': '300/min',
+    },
+}
+
+# Caché
+# La caché 'throttle' guarda solo los contadores de limitación de tasa.
+# LocMemCache es por proceso: con varios workers conviene apuntarla a un
+# backend compartido (por ejemplo Memcached) para que el límite sea global.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
 }
 
+THROTTLE_CACHE = 'throttle'
+THROTTLE_PAGINA_PROFUNDA = 10  # Páginas posteriores a esta cuestan más
+THROTTLE_COSTOS = {
+    'detalle': 1,
+    'listado': 2,
+    'busqueda': 3,
+    'pagina_profunda': 3,
+    'escritura': 2,
+}
+
+# Archivo de órdenes de trabajo cerradas (ver api/archivo.py)
+ORDENES_ARCHIVO_DIAS = 180  # Antigüedad mínima desde el cierre para archivar
+ORDENES_ARCHIVO_LOTE = 500  # Órdenes movidas por transacción
+
+# Cola de tareas en segundo plano (ver api/tareas.py y manage.py procesar_tareas)
+TAREAS_MAX_INTENTOS = 3
+TAREAS_REINTENTO_SEGUNDOS = 30  # Espera base, se duplica en cada reintento
+TAREAS_LEASE_SEGUNDOS = 3600  # Una tarea en ejecución sin reportar progreso por más tiempo se considera abandonada y se retoma
+TAREAS_DIRECTORIO = BASE_DIR / 'exportaciones'
+
+# Análisis de costos (ver api/analitica.py)
+ANALITICA_CACHE_SEGUNDOS = 600
+
+# Registro de auditoría (ver api/auditoria.py)
+AUDITORIA_LOTE = 500  # Registros acumulados antes de escribirlos en bloque
+
+# Detección de equipos duplicados (ver api/duplicados.py)
+DUPLICADOS_UMBRAL = 0.85  # Similitud mínima (0 a 1) para proponer una fusión
+DUPLICADOS_VENTANA = 20  # Vecinos comparados por equipo en los bloques grandes
+
+# Búsqueda por cercanía y rutas de técnicos (ver api/geo.py)
+CERCANIA_RADIO_KM = 10
+CERCANIA_RADIO_MAXIMO_KM = 500
+
+# Encabezado Idempotency-Key en escrituras (ver api/idempotencia.py)
+IDEMPOTENCIA_HORAS = 24  # Tiempo que se recuerda cada clave
+IDEMPOTENCIA_ESPERA_SEGUNDOS = 10  # Espera de un duplicado mientras la primera petición sigue en curso
+IDEMPOTENCIA_BLOQUEO_SEGUNDOS = 120  # Una clave en proceso por más tiempo se considera abandonada y se puede reservar de nuevo
+
+# Códigos generados en el servidor cuando el cliente no envía 'codigo'
+# (ver api/secuencias.py). El prefijo admite {anio} y {cliente}.
+CODIGOS_FORMATO = {
+    'orden': {'prefijo': 'OT-{anio}-', 'digitos': 6},
+    'equipo': {'prefijo': 'EQ-{cliente}-', 'digitos': 5},
+}
+SECUENCIA_BLOQUE = 50  # Números que cada proceso reserva por transacción
+
+# Eventos de órdenes por Server-Sent Events (ver api/eventos.py).
+# BrokerLocal reparte eventos dentro de un proceso; con varios workers ASGI
+# se debe apuntar a un broker que los comparta entre procesos.
+EVENTOS_BROKER = 'api.eventos.BrokerLocal'
+EVENTOS_HISTORIAL = 1000  # Eventos guardados para retomar con Last-Event-ID
+EVENTOS_COLA_MAXIMA = 100  # Eventos sin consumir antes de pedir reconexión
+EVENTOS_KEEPALIVE_SEGUNDOS = 15
+
+# Presupuestos de consultas y tiempo por endpoint (ver api/presupuesto.py).
+# Cada acción y página del admin declara el suyo; el resto usa el por defecto.
+PRESUPUESTO_ACTIVO = None  # Medir cada petición y registrar los excesos (None: según DEBUG)
+PRESUPUESTO_ESTRICTO = False  # En CI: un exceso lanza PresupuestoExcedido y falla el test
+PRESUPUESTO_POR_DEFECTO = (20, 1000)  # (consultas, ms)
+PRESUPUESTO_REPETICIONES = 3  # Veces que se tolera la misma consulta en una petición
+PRESUPUESTO_FACTOR_MS = 1  # Multiplica los tiempos, para máquinas de CI más lentas
+PRESUPUESTO_PERFILES = None  # Directorio para los perfiles .prof pedidos con X-Perfil
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -146,3 +245,12 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+# Empresas (multi-tenant, ver api/empresas.py). Los usuarios sin empresa y los
+# datos anteriores quedan en EMPRESA_POR_DEFECTO; con None no ven datos.
+EMPRESA_POR_DEFECTO = 'principal'
+EMPRESA_CLAIM = 'empresa'  # Claim del token JWT con el id de la empresa
+
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.TokenEmpresaSerializer',
+}
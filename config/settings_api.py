@@ -0,0 +1,53 @@
+"""
+Perfil liviano de Django solo para la API.
+
+Parte de config.settings y deja fuera lo que un worker de la API no usa: el
+admin, la API navegable, sesiones, mensajes y archivos estáticos. Así cada
+worker importa menos módulos al arrancar y ocupa menos memoria residente.
+
+Uso:
+    DJANGO_SETTINGS_MODULE=config.settings_api gunicorn --preload config.wsgi
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'api.apps.ApiConfig',
+]
+
+# Se deriva de config.settings para que un middleware nuevo no se olvide aquí.
+# Solo se quitan los que dependen de sesiones, cookies o páginas HTML
+MIDDLEWARE_SOLO_NAVEGADOR = {
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+}
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in MIDDLEWARE_SOLO_NAVEGADOR]  # noqa: F405
+
+ROOT_URLCONF = 'config.urls_api'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': False,
+        'OPTIONS': {},
+    },
+]
+
+# Solo JSON y solo JWT: sin API navegable ni autenticación por sesión
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+}
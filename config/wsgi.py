@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Deja todo importado y congelado antes de que el servidor forkee los workers
+from config.arranque import precargar  # noqa: E402
+
+precargar()
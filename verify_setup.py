@@ -2,10 +2,51 @@
 # -*- coding: utf-8 -*-
 """Script de prueba para verificar que todo funciona correctamente."""
 
+import json
 import os
+import statistics
+import subprocess
 import sys
 import django
 
+PERFILES = ['config.settings', 'config.settings_api']
+
+
+def medir_perfil(perfil):
+    """Mide el arranque de un perfil en un proceso limpio (ver config/arranque.py)."""
+    entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': perfil}
+    salida = subprocess.run(
+        [sys.executable, '-m', 'config.arranque'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=entorno, capture_output=True, text=True, check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def benchmark_arranque(repeticiones):
+    """Compara el tiempo de arranque y la memoria de cada perfil de settings."""
+    print(f"Midiendo arranque ({repeticiones} repeticiones por perfil)...")
+    for perfil in PERFILES:
+        mediciones = [medir_perfil(perfil) for _ in range(repeticiones)]
+        ultima = mediciones[-1]
+        print(f"\n[{perfil}]")
+        print(f"  django.setup(): {statistics.median(m['setup_ms'] for m in mediciones):8.1f} ms (mediana)")
+        print(f"  URLs y vistas:  {statistics.median(m['urls_ms'] for m in mediciones):8.1f} ms (mediana)")
+        print(f"  Total:          {statistics.median(m['total_ms'] for m in mediciones):8.1f} ms (mediana)")
+        print(f"  RSS final:      {ultima['rss_kb'] / 1024:8.1f} MB ({ultima['modulos']} módulos cargados)")
+        print("  Por app:")
+        for app in sorted(ultima['apps'], key=lambda a: a['ms'], reverse=True):
+            print(f"    {app['app']:<40} {app['ms']:8.1f} ms {app['rss_kb']:8d} KB")
+        print(f"    {'(URLs, vistas y serializers)':<40} {ultima['urls_ms']:8.1f} ms {ultima['urls_rss_kb']:8d} KB")
+
+
+# Benchmark de arranque: python verify_setup.py --arranque [repeticiones]
+if '--arranque' in sys.argv:
+    posicion = sys.argv.index('--arranque') + 1
+    repeticiones = int(sys.argv[posicion]) if len(sys.argv) > posicion else 5
+    benchmark_arranque(repeticiones)
+    sys.exit(0)
+
 # Configurar Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 sys.path.insert(0, os.path.dirname(__file__))